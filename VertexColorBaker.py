@@ -1,10 +1,25 @@
-# from mathutils.bvhtree import BVHTree  # BVH
+from mathutils.bvhtree import BVHTree  # BVH
 from bpy.props import FloatVectorProperty, FloatProperty
 from bpy.types import Operator, Panel
 from mathutils import Vector, Color
+from multiprocessing import shared_memory
+import multiprocessing
 import numpy as np
+import contextlib
+import tracemalloc
+import functools
+import hashlib
 import bmesh
+import json
+import time
 import bpy
+import sys
+import os
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 
 bl_info = {
@@ -49,9 +64,36 @@ class BAKETOOLS_PT_vertex_color_baker(Panel):
 
         box = layout.box()
         box.label(text="AO设置", icon='LIGHT')
+        box.prop(props, "ao_engine")
+        if props.ao_engine == 'PARALLEL':
+            box.prop(props, "ao_workers")
         box.prop(props, "ao_strength", text="AO强度")
         box.prop(props, "ao_samples")
+        box.prop(props, "ao_sampler")
+        row = box.row(align=True)
+        row.prop(props, "use_fixed_seed")
+        sub = row.row(align=True)
+        sub.enabled = props.use_fixed_seed
+        sub.prop(props, "ao_seed")
         box.prop(props, "ao_distance")
+        box.prop(props, "blur_iterations")
+        row = box.row(align=True)
+        row.prop(props, "use_sparse_bake")
+        sub = row.row(align=True)
+        sub.enabled = props.use_sparse_bake
+        sub.prop(props, "sparse_cell_ratio")
+        box.prop(props, "use_adaptive")
+        if props.use_adaptive:
+            col = box.column(align=True)
+            col.prop(props, "adaptive_batch")
+            col.prop(props, "adaptive_threshold")
+
+        box = layout.box()
+        box.label(text="遮挡物", icon='MOD_MASK')
+        box.prop(props, "use_occluder_culling")
+        col = box.column(align=True)
+        col.prop(props, "occluder_include")
+        col.prop(props, "occluder_exclude")
 
         box = layout.box()
         box.label(text="描边设置", icon='EDGESEL')
@@ -61,14 +103,101 @@ class BAKETOOLS_PT_vertex_color_baker(Panel):
         box = layout.box()
         box.label(text="其他设置", icon='SETTINGS')
         box.prop(props, "color_layer_name")
+        box.prop(props, "output_layout")
+        if props.output_layout == 'PACKED':
+            row = box.row(align=True)
+            row.prop(props, "channel_r", text="")
+            row.prop(props, "channel_g", text="")
+            row.prop(props, "channel_b", text="")
+            row.prop(props, "channel_a", text="")
+        if props.output_layout in {'BLEND', 'PACKED'}:
+            row = box.row(align=True)
+            row.prop(props, "color_domain", text="")
+            row.prop(props, "color_type", text="")
+        box.prop(props, "bake_mode")
+        if props.bake_mode == 'STREAM':
+            box.prop(props, "memory_limit_mb")
+        box.prop(props, "use_bake_cache")
+        box.prop(props, "use_profiling")
         box.prop(props, "autoJump")
 
         layout.operator(
             OBJECT_OT_bake_ao_edge_vertex_colors.bl_idname, icon='BRUSH_DATA')
 
+        box = layout.box()
+        box.label(text="逐帧烘焙", icon='RENDER_ANIMATION')
+        box.prop(props, "anim_use_scene_range")
+        if not props.anim_use_scene_range:
+            row = box.row(align=True)
+            row.prop(props, "anim_frame_start")
+            row.prop(props, "anim_frame_end")
+        box.prop(props, "anim_output")
+        if props.anim_output == 'FILE':
+            box.prop(props, "anim_directory")
+        box.operator("object.bake_ao_animation", icon='RENDER_ANIMATION')
+        layout.operator("object.transfer_vertex_colors", icon='MOD_DECIM')
+
+        # 上次烘焙的统计
+        if _bake_stats:
+            box = layout.box()
+            box.label(text="上次烘焙", icon='TIME')
+            col = box.column(align=True)
+            col.label(text=f"顶点: {_bake_stats['vertices']}  用时: {_bake_stats['seconds']:.2f}s")
+            if 'frames' in _bake_stats:
+                col.label(text=f"帧: {_bake_stats['frames']}  帧/秒: {_bake_stats['frames_per_second']:.2f}")
+            col.label(text=f"平均射线/顶点: {_bake_stats['avg_rays']:.1f} / {_bake_stats['max_rays']}")
+            col.label(text=f"对象: {len(_bake_stats['objects'])}  重算顶点: {_bake_stats['recomputed']}")
+            if _bake_stats['sampled'] < _bake_stats['recomputed']:
+                col.label(text=f"稀疏采样: {_bake_stats['sampled']} 个代表顶点")
+            if 'occluders_kept' in _bake_stats:
+                col.label(text=f"遮挡物: 保留 {_bake_stats['occluders_kept']}  "
+                               f"剔除 {_bake_stats['occluders_culled']}")
+            # 按用时从长到短列出对象
+            objects = sorted(_bake_stats['objects'], key=lambda item: item['seconds'], reverse=True)
+            col = box.column(align=True)
+            for item in objects[:STATS_MAX_ROWS]:
+                row = col.row()
+                row.label(text=item['name'])
+                row.label(text=f"{item['seconds']:.2f}s")
+                row.label(text=CACHE_STATE_LABELS.get(item['cache'], "-"))
+            if len(objects) > STATS_MAX_ROWS:
+                col.label(text=f"... 其余 {len(objects) - STATS_MAX_ROWS} 个对象见控制台")
+
+            profile = _bake_stats.get('profile')
+            if profile:
+                col = box.column(align=True)
+                col.label(text="各阶段用时", icon='SORTTIME')
+                busy = max(profile['seconds'], 1e-9)
+                for name, seconds in sorted(profile['stages'].items(), key=lambda item: item[1], reverse=True):
+                    row = col.row()
+                    row.label(text=name)
+                    row.label(text=f"{seconds:.2f}s")
+                    row.label(text=f"{seconds / busy * 100:.0f}%")
+                col.label(text=f"射线: {profile['rays']}  射线/秒: {profile['rays_per_second']:.0f}")
+                text = f"内存峰值: Python {profile['peak_python_mb']:.0f} MB"
+                if profile['rss_start_mb'] is not None and profile['rss_end_mb'] is not None:
+                    text += f"  常驻内存变化 {profile['rss_end_mb'] - profile['rss_start_mb']:+.0f} MB"
+                col.label(text=text)
+                if profile['process_peak_rss_mb'] is not None:
+                    col.label(text=f"Blender 进程峰值（本次会话）: {profile['process_peak_rss_mb']:.0f} MB")
+
         layout.separator()
         layout.operator("object.convert_vertex_color_blackwhite",
                         icon='IMAGE_RGB_ALPHA')
+        layout.operator("object.blur_vertex_colors", icon='SMOOTHCURVE')
+
+
+# 通道打包时每个通道可选的内容
+CHANNEL_ITEMS = [
+    ('AO', "AO", "可见度，1 为完全无遮挡"),
+    ('EDGE', "描边", "描边强度"),
+    ('THICKNESS', "厚度", "沿 -法线 半球测得的平均厚度 / AO距离"),
+    ('BENT_X', "弯曲法线 X", "未被遮挡方向的平均方向（物体空间），编码为 0.5 + 0.5 * X"),
+    ('BENT_Y', "弯曲法线 Y", "未被遮挡方向的平均方向（物体空间），编码为 0.5 + 0.5 * Y"),
+    ('BENT_Z', "弯曲法线 Z", "未被遮挡方向的平均方向（物体空间），编码为 0.5 + 0.5 * Z"),
+    ('ONE', "1", "常数 1"),
+    ('ZERO', "0", "常数 0"),
+]
 
 
 class VertexColorBakerProps(bpy.types.PropertyGroup):
@@ -79,12 +208,151 @@ class VertexColorBakerProps(bpy.types.PropertyGroup):
         description="存储烘焙结果的顶点颜色层名称"
     )
     
+    bake_mode: bpy.props.EnumProperty(
+        name="烘焙模式",
+        items=[
+            ('NUMPY', "向量化 (NumPy)", "用 foreach_get/foreach_set 批量读写，描边和混色以数组运算完成"),
+            ('STREAM', "分块 (低内存)", "按内存上限分块读取和计算，不构建 BMesh，遮挡物用 BVHTree.FromObject（适合上千万顶点的扫描模型）"),
+            ('BMESH', "BMesh (旧)", "逐顶点、逐loop的 BMesh 循环（旧方式，较慢）"),
+        ],
+        default='NUMPY',
+        description="网格数据的读写与计算方式"
+    )
+
+    output_layout: bpy.props.EnumProperty(
+        name="输出方式",
+        items=[
+            ('BLEND', "红底混色", "红色底色减去AO与描边（原方式）"),
+            ('PACKED', "通道打包", "AO、描边、厚度、弯曲法线按通道设置打包进颜色层的 RGBA"),
+            ('SEPARATE', "独立属性", "AO、描边、厚度、弯曲法线分别写为独立的点属性"),
+            ('AO_ONLY', "仅AO (单通道)", "只把AO写为一个单通道 FLOAT 点属性，内存最小（视口不能直接作为颜色显示）"),
+        ],
+        default='BLEND',
+        description="烘焙结果写入网格的方式（打包与独立属性仅向量化模式）"
+    )
+
+    color_domain: bpy.props.EnumProperty(
+        name="颜色域",
+        items=[
+            ('CORNER', "面拐 (Corner)", "每个面角存一份颜色（原方式），同一顶点的值重复 4~6 次"),
+            ('POINT', "顶点 (Point)", "每个顶点存一份颜色，内存和导出体积更小"),
+        ],
+        default='CORNER',
+        description="颜色属性的存储域（仅向量化模式）"
+    )
+
+    color_type: bpy.props.EnumProperty(
+        name="颜色精度",
+        items=[
+            ('FLOAT_COLOR', "浮点 (32位)", "每通道 32 位浮点"),
+            ('BYTE_COLOR', "字节 (8位)", "每通道 8 位，内存为浮点的 1/4"),
+        ],
+        default='FLOAT_COLOR',
+        description="颜色属性的数据类型（仅向量化模式）"
+    )
+
+    channel_r: bpy.props.EnumProperty(name="R", items=CHANNEL_ITEMS, default='AO')
+    channel_g: bpy.props.EnumProperty(name="G", items=CHANNEL_ITEMS, default='THICKNESS')
+    channel_b: bpy.props.EnumProperty(name="B", items=CHANNEL_ITEMS, default='EDGE')
+    channel_a: bpy.props.EnumProperty(name="A", items=CHANNEL_ITEMS, default='ONE')
+
+    anim_use_scene_range: bpy.props.BoolProperty(
+        name="使用场景帧范围",
+        default=True,
+        description="逐帧烘焙使用场景的起止帧"
+    )
+
+    anim_frame_start: bpy.props.IntProperty(
+        name="起始帧",
+        default=1,
+    )
+
+    anim_frame_end: bpy.props.IntProperty(
+        name="结束帧",
+        default=250,
+    )
+
+    anim_output: bpy.props.EnumProperty(
+        name="逐帧输出",
+        items=[
+            ('FILE', "float16 文件", "每个对象一个 (帧数, 顶点数) 的 float16 .npy 文件"),
+            ('ATTRIBUTES', "每帧属性", "每帧一个名为 <颜色层>_AO_<帧号> 的点属性（float32）"),
+        ],
+        default='FILE',
+        description="逐帧AO的保存方式"
+    )
+
+    anim_directory: bpy.props.StringProperty(
+        name="输出目录",
+        default="//vcb_anim/",
+        subtype='DIR_PATH',
+        description="逐帧AO文件的保存目录，// 开头表示相对 .blend 文件"
+    )
+
+    memory_limit_mb: bpy.props.IntProperty(
+        name="内存上限 (MB)",
+        default=2048,
+        min=64,
+        description="分块模式下本插件自身数组的内存上限，决定每块的顶点数（不含 Blender 内部的 BVH）"
+    )
+
+    use_profiling: bpy.props.BoolProperty(
+        name="性能记录",
+        default=False,
+        description="记录各阶段用时、射线/秒和内存（本次烘焙的 Python 内存峰值和常驻内存变化，以及整个会话的进程峰值），"
+                    "显示在面板中，并追加到 .blend 旁的 vertex_color_bake_profile.jsonl"
+    )
+
+    use_occluder_culling: bpy.props.BoolProperty(
+        name="遮挡物剔除",
+        default=True,
+        description="只收集世界包围盒与烘焙目标（向外扩展AO距离）相交的对象作为遮挡物（BVH/多进程引擎）"
+    )
+
+    occluder_include: bpy.props.PointerProperty(
+        name="仅包含集合",
+        type=bpy.types.Collection,
+        description="设置后只有该集合（含子集合）中的对象作为遮挡物，烘焙目标本身始终参与"
+    )
+
+    occluder_exclude: bpy.props.PointerProperty(
+        name="排除集合",
+        type=bpy.types.Collection,
+        description="该集合（含子集合）中的对象不作为遮挡物"
+    )
+
+    use_bake_cache: bpy.props.BoolProperty(
+        name="烘焙缓存",
+        default=True,
+        description="把每个顶点的AO和描边值存入网格属性；再次烘焙时跳过未变化的部分，只重算受影响的顶点（仅向量化模式）。"
+                    "目标自身只移动了顶点时只重算编辑范围附近的顶点；改变拓扑、带修改器或形态键的目标会整体重算"
+    )
+
     autoJump: bpy.props.BoolProperty(
         name="烘焙后自动切换显示模式？",
         default=False,
         description="关闭后，不会在烘焙之后自动切换光照 -- '平面' ， 颜色 -- '属性'"
     )
 
+    ao_engine: bpy.props.EnumProperty(
+        name="AO引擎",
+        items=[
+            ('BVH', "BVH树", "烘焙开始时用求值后的遮挡几何体构建一次BVHTree，所有射线复用"),
+            ('PARALLEL', "多进程", "遮挡三角形放入共享内存，多个进程用 NumPy 并行求交（仅向量化模式）"),
+            ('SCENE', "场景射线", "每条射线调用 scene.ray_cast（旧方式，较慢）"),
+        ],
+        default='BVH',
+        description="AO射线求交方式"
+    )
+
+    ao_workers: bpy.props.IntProperty(
+        name="进程数",
+        default=0,
+        min=0,
+        max=256,
+        description="多进程AO使用的进程数，0 = CPU核心数"
+    )
+
     ao_samples: bpy.props.IntProperty(
         name="AO采样数",
         default=64,
@@ -93,6 +361,66 @@ class VertexColorBakerProps(bpy.types.PropertyGroup):
         description="每个顶点的AO采样次数"
     )
 
+    ao_sampler: bpy.props.EnumProperty(
+        name="采样方式",
+        items=[
+            ('SOBOL', "Sobol", "余弦加权的 Sobol 低差异序列，可渐进使用（推荐）"),
+            ('HAMMERSLEY', "Hammersley", "余弦加权的 Hammersley 点集，需要完整使用全部采样"),
+            ('RANDOM', "随机 (旧)", "法线 + 均匀随机向量（旧方式，分布有偏且可能低于半球）"),
+        ],
+        default='SOBOL',
+        description="AO采样方向的生成方式（仅向量化模式）"
+    )
+
+    use_fixed_seed: bpy.props.BoolProperty(
+        name="固定种子",
+        default=False,
+        description="使用固定随机种子，相同设置的烘焙结果完全一致，便于对比和缓存"
+    )
+
+    ao_seed: bpy.props.IntProperty(
+        name="种子",
+        default=0,
+        min=0,
+        description="固定种子的值"
+    )
+
+    use_adaptive: bpy.props.BoolProperty(
+        name="自适应采样",
+        default=False,
+        description="按批发射射线，估计值足够稳定的顶点提前停止，AO采样数作为上限（仅向量化模式，建议配合 Sobol）"
+    )
+
+    adaptive_batch: bpy.props.IntProperty(
+        name="每批射线",
+        default=8,
+        min=1,
+        max=256,
+        description="自适应采样每一轮给每个顶点发射的射线数"
+    )
+
+    adaptive_threshold: bpy.props.FloatProperty(
+        name="置信阈值",
+        default=0.05,
+        min=0.001,
+        max=0.5,
+        description="AO估计值95%置信区间的半宽度低于该值时停止采样"
+    )
+
+    use_sparse_bake: bpy.props.BoolProperty(
+        name="稀疏烘焙",
+        default=False,
+        description="按体素把相近且朝向相同的顶点聚类，每类只对一个代表顶点发射射线，其余顶点插值（仅向量化模式，适合高密度扫描模型）"
+    )
+
+    sparse_cell_ratio: bpy.props.FloatProperty(
+        name="体素比例",
+        default=0.05,
+        min=0.001,
+        max=1.0,
+        description="聚类体素边长与AO距离的比值，越大射线越少、细节越模糊"
+    )
+
     ao_distance: bpy.props.FloatProperty(
         name="AO距离",
         default=1.0,
@@ -108,6 +436,14 @@ class VertexColorBakerProps(bpy.types.PropertyGroup):
         description="被视为锐边的最小角度"
     )
 
+    blur_iterations: bpy.props.IntProperty(
+        name="AO平滑次数",
+        default=0,
+        min=0,
+        max=100,
+        description="烘焙后对AO值做邻域平均的迭代次数，可用较少的采样数烘焙再去噪（BMesh模式下对整个颜色层模糊）"
+    )
+
     ao_strength: FloatProperty(
         name="AO强度",
         default=0.7,
@@ -131,86 +467,2464 @@ class VertexColorBakerProps(bpy.types.PropertyGroup):
         return Color((r, g, b))
 
 # region  "对顶点颜色进行模糊处理"
-# def blur_vertex_colors(mesh, color_layer_name, iterations=1):
-#
-#     color_layer = mesh.attributes.get(color_layer_name)
-#     if not color_layer:
-#         print(f"颜色层 '{color_layer_name}' 未找到")
-#         return
-
-#     # 获取所有顶点的颜色
-#     colors = [list(color_layer.data[i].color_srgb)
-#               for i in range(len(mesh.vertices))]
-
-#     # 进行模糊处理
-#     for _ in range(iterations):
-#         new_colors = []
-#         for vert in mesh.vertices:
-#             avg_color = [0.0, 0.0, 0.0]
-#             count = 0
-#             for edge in vert.link_edges:
-#                 for v in edge.vertices:
-#                     avg_color[0] += colors[v][0]
-#                     avg_color[1] += colors[v][1]
-#                     avg_color[2] += colors[v][2]
-#                     count += 1
-#             avg_color[0] /= count
-#             avg_color[1] /= count
-#             avg_color[2] /= count
-#             new_colors.append(avg_color)
-#         colors = new_colors
-
-#     # 将模糊后的颜色应用回颜色层
-#     for i, color in enumerate(colors):
-#         color_layer.data[i].color_srgb = color
+def build_vertex_adjacency(mesh):
+    """用边构建顶点邻接表（CSR 格式），返回 (indptr, neighbors)
+
+    顶点 i 的邻居为 neighbors[indptr[i]:indptr[i + 1]]
+    """
+    vert_count = len(mesh.vertices)
+    edge_verts = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edge_verts)
+    edge_verts = edge_verts.reshape(-1, 2)
+
+    # 每条边两个方向各记一次
+    rows = np.concatenate((edge_verts[:, 0], edge_verts[:, 1]))
+    cols = np.concatenate((edge_verts[:, 1], edge_verts[:, 0]))
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(vert_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=vert_count), out=indptr[1:])
+    return indptr, cols[order]
+
+
+def smooth_vertex_values(adjacency, values, iterations=1):
+    """邻域平均: 每次迭代 新值 = 0.5 * 自身 + 0.5 * 邻居平均，孤立顶点保持不变
+
+    values 为 (N,) 或 (N, C) 数组，返回新数组
+    """
+    indptr, neighbors = adjacency
+    degree = np.diff(indptr)
+    rows = np.repeat(np.arange(len(degree)), degree)
+    has_neighbors = degree > 0
+    inv_degree = np.divide(1.0, degree, out=np.zeros(len(degree)), where=has_neighbors)
+
+    result = np.array(values, dtype=np.float64)
+    flat = result.reshape(len(degree), -1)
+    for _ in range(iterations):
+        averaged = np.empty_like(flat)
+        for c in range(flat.shape[1]):
+            sums = np.bincount(rows, weights=flat[neighbors, c], minlength=len(degree))
+            averaged[:, c] = np.where(has_neighbors, 0.5 * flat[:, c] + 0.5 * sums * inv_degree, flat[:, c])
+        flat = averaged
+    return flat.reshape(result.shape)
+
+
+def blur_vertex_colors(mesh, color_layer_name, iterations=1):
+    """对颜色属性做邻域平均模糊，一次读取、一次写回
+
+    CORNER 域的颜色先按顶点取平均，模糊后每个角使用其顶点的颜色
+    """
+    color_layer = mesh.color_attributes.get(color_layer_name)
+    if not color_layer:
+        print(f"颜色层 '{color_layer_name}' 未找到")
+        return False
+
+    colors = np.empty(len(color_layer.data) * 4, dtype=np.float32)
+    color_layer.data.foreach_get("color", colors)
+    colors = colors.reshape(-1, 4)
+
+    vert_count = len(mesh.vertices)
+    if color_layer.domain == 'CORNER':
+        loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loop_verts)
+        counts = np.maximum(np.bincount(loop_verts, minlength=vert_count), 1)
+        vert_colors = np.stack([np.bincount(loop_verts, weights=colors[:, c], minlength=vert_count)
+                                for c in range(4)], axis=1) / counts[:, None]
+    else:
+        vert_colors = colors
+
+    vert_colors = smooth_vertex_values(build_vertex_adjacency(mesh), vert_colors, iterations)
+    if color_layer.domain == 'CORNER':
+        vert_colors = vert_colors[loop_verts]
+    color_layer.data.foreach_set("color", vert_colors.astype(np.float32).ravel())
+    mesh.update()
+    return True
 # endregion
 
 
-def bake_vertex_colors(context, obj, props):
-    """主烘焙函数"""
+# 可以产生网格的对象类型
+OCCLUDER_TYPES = {'MESH', 'CURVE', 'SURFACE', 'META', 'FONT'}
+
+
+def iter_occluder_instances(depsgraph, accept=None):
+    """遍历求值后场景中可作为遮挡物的可见实例，accept(inst, 世界包围盒最小点, 最大点) 为真时才返回"""
+    for inst in depsgraph.object_instances:
+        obj_eval = inst.object
+        if obj_eval.type not in OCCLUDER_TYPES:
+            continue
+        if not inst.is_instance and not obj_eval.original.visible_get():
+            continue
+
+        if accept is not None:
+            matrix = np.array(inst.matrix_world, dtype=np.float64)
+            corners = np.array(obj_eval.bound_box, dtype=np.float64) @ matrix[:3, :3].T + matrix[:3, 3]
+            if not accept(inst, corners.min(axis=0), corners.max(axis=0)):
+                continue
+        yield inst
+
+
+def gather_occluder_triangles(depsgraph, records=None, accept=None, ranges=None):
+    """收集求值后场景中所有可见几何体的世界空间三角形
+
+    返回 (verts, tris)：verts 为 (N, 3) float64 顶点坐标，tris 为 (M, 3) int32 顶点索引
+    传入 records 列表时，为每个遮挡物追加 (名称, 几何哈希, 包围盒最小点, 包围盒最大点)
+    传入 ranges 列表时，按 records 的顺序为每个遮挡物追加 (顶点起, 顶点止, 三角形起, 三角形止)
+    传入 accept(inst, 世界包围盒最小点, 最大点) 时，在转换网格之前用它筛选遮挡物
+    """
+    verts_list = []
+    tris_list = []
+    offset = 0
+    tri_offset = 0
+    for inst in iter_occluder_instances(depsgraph, accept):
+        obj_eval = inst.object
+        try:
+            mesh = obj_eval.to_mesh()
+        except RuntimeError:
+            continue
+        if mesh is None:
+            continue
+
+        try:
+            vert_count = len(mesh.vertices)
+            tri_count = len(mesh.loop_triangles)
+            if vert_count == 0 or tri_count == 0:
+                continue
+
+            co = np.empty(vert_count * 3, dtype=np.float64)
+            mesh.vertices.foreach_get("co", co)
+            tris = np.empty(tri_count * 3, dtype=np.int32)
+            mesh.loop_triangles.foreach_get("vertices", tris)
+        finally:
+            obj_eval.to_mesh_clear()
+
+        # 变换到世界空间
+        matrix = np.array(inst.matrix_world, dtype=np.float64)
+        if records is not None:
+            digest = hash_arrays(co, tris, matrix)
+        co = co.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+        if records is not None:
+            key = obj_eval.name
+            if inst.is_instance:
+                key += "|" + ",".join(str(i) for i in inst.persistent_id)
+            records.append((key, digest, co.min(axis=0).tolist(), co.max(axis=0).tolist()))
+        if ranges is not None:
+            ranges.append((offset, offset + vert_count, tri_offset, tri_offset + tri_count))
+
+        verts_list.append(co)
+        tris_list.append(tris.reshape(-1, 3) + offset)
+        offset += vert_count
+        tri_offset += tri_count
+
+    if not verts_list:
+        return np.empty((0, 3), dtype=np.float64), np.empty((0, 3), dtype=np.int32)
+    return np.concatenate(verts_list), np.concatenate(tris_list)
+
+
+def select_occluders(verts, tris, records, ranges, keys):
+    """从 gather_occluder_triangles 的结果中取出名称在 keys 中的遮挡物，返回新的 (verts, tris)"""
+    verts_list, tris_list = [], []
+    offset = 0
+    for record, (v0, v1, t0, t1) in zip(records, ranges):
+        if record[0] in keys:
+            verts_list.append(verts[v0:v1])
+            tris_list.append(tris[t0:t1] - v0 + offset)
+            offset += v1 - v0
+    if not verts_list:
+        return np.empty((0, 3), dtype=np.float64), np.empty((0, 3), dtype=np.int32)
+    return np.concatenate(verts_list), np.concatenate(tris_list)
+
+
+def make_occluder_filter(props, targets, regions, counts):
+    """创建遮挡物筛选函数，供 gather_occluder_triangles 使用
+
+    regions 为烘焙目标的世界包围盒列表 [(min, max), ...]；
+    排除集合优先，其次烘焙目标本身始终保留，再按包含集合和扩展后的包围盒筛选。
+    保留/剔除的数量累加到 counts["kept"] / counts["culled"]
+    """
+    include = set(props.occluder_include.all_objects) if props.occluder_include else None
+    exclude = set(props.occluder_exclude.all_objects) if props.occluder_exclude else set()
+    target_set = set(targets)
+    margin = props.ao_distance + AO_RAY_OFFSET
+    if regions:
+        region_min = np.array([bmin for bmin, _bmax in regions]) - margin
+        region_max = np.array([bmax for _bmin, bmax in regions]) + margin
+    else:
+        region_min = region_max = np.empty((0, 3))
+
+    def accept(inst, bmin, bmax):
+        # 实例以产生它的对象判断集合归属
+        source = inst.parent.original if inst.is_instance and inst.parent else inst.object.original
+        if source in exclude:
+            keep = False
+        elif source in target_set and not inst.is_instance:
+            keep = True
+        elif include is not None and source not in include:
+            keep = False
+        elif props.use_occluder_culling:
+            keep = bool(np.any(np.all(bmax >= region_min, axis=1) & np.all(bmin <= region_max, axis=1)))
+        else:
+            keep = True
+        counts["kept" if keep else "culled"] += 1
+        return keep
+
+    return accept
+
+
+def build_occluder_bvh(verts, tris):
+    """用遮挡三角形构建一次 BVHTree，没有几何体时返回 None"""
+    if len(tris) == 0:
+        return None
+    return BVHTree.FromPolygons(verts.tolist(), tris.tolist(), all_triangles=True)
+
+
+# region  "射线求交"
+class SceneRayCaster:
+    """通过 scene.ray_cast 求交（旧方式）"""
+    # 每个分块大约发射的射线数
+    rays_per_chunk = 4096
+
+    def __init__(self, context, depsgraph, distance):
+        self.scene = context.scene
+        self.depsgraph = depsgraph
+        self.distance = distance
+
+    def __call__(self, origins, directions):
+        """返回每条射线的命中距离，未命中为 inf"""
+        hit_dist = np.full(len(origins), np.inf)
+        ray_cast = self.scene.ray_cast
+        for i, (origin, direction) in enumerate(zip(origins.tolist(), directions.tolist())):
+            hit, location, *_ = ray_cast(self.depsgraph, origin, direction, distance=self.distance)
+            if hit:
+                hit_dist[i] = (location - Vector(origin)).length
+        return hit_dist
+
+    def close(self):
+        pass
+
+
+class BVHRayCaster:
+    """通过预先构建的 BVHTree 求交"""
+    rays_per_chunk = 16384
+
+    def __init__(self, bvh, distance):
+        self.bvh = bvh
+        self.distance = distance
+
+    def __call__(self, origins, directions):
+        """返回每条射线的命中距离，未命中为 inf"""
+        hit_dist = np.full(len(origins), np.inf)
+        if self.bvh is None:
+            return hit_dist
+        ray_cast = self.bvh.ray_cast
+        distance = self.distance
+        for i, (origin, direction) in enumerate(zip(origins.tolist(), directions.tolist())):
+            location, _normal, _index, dist = ray_cast(origin, direction, distance)
+            if location is not None:
+                hit_dist[i] = dist
+        return hit_dist
+
+    def close(self):
+        pass
+
+
+class ObjectBVHRayCaster:
+    """每个遮挡物用 BVHTree.FromObject 在物体局部空间建树，几何体不复制到 Python
+
+    同一对象的多个实例共用一棵树；射线变换到各实例的局部空间求交，取最近的命中
+    """
+    rays_per_chunk = 16384
+
+    def __init__(self, depsgraph, distance, accept=None):
+        self.distance = distance
+        self.trees = []
+        built = {}
+        for inst in iter_occluder_instances(depsgraph, accept):
+            obj_eval = inst.object
+            bvh = built.get(obj_eval.name)
+            if bvh is None:
+                try:
+                    bvh = BVHTree.FromObject(obj_eval, depsgraph)
+                except (RuntimeError, ValueError):
+                    continue
+                built[obj_eval.name] = bvh
+            matrix = np.array(inst.matrix_world, dtype=np.float64)
+            try:
+                self.trees.append((bvh, np.linalg.inv(matrix)))
+            except np.linalg.LinAlgError:
+                continue
+
+    def __call__(self, origins, directions):
+        """返回每条射线的命中距离，未命中为 inf"""
+        hit_dist = np.full(len(origins), np.inf)
+        for bvh, inverse in self.trees:
+            local_origins = origins @ inverse[:3, :3].T + inverse[:3, 3]
+            local_dirs = directions @ inverse[:3, :3].T
+            # 局部空间的距离 = 世界距离 * scale
+            scale = np.maximum(np.linalg.norm(local_dirs, axis=1), 1e-12)
+            local_dirs /= scale[:, None]
+            limits = np.minimum(hit_dist, self.distance) * scale
+            ray_cast = bvh.ray_cast
+            for i, (origin, direction, limit) in enumerate(
+                    zip(local_origins.tolist(), local_dirs.tolist(), limits.tolist())):
+                location, _normal, _index, dist = ray_cast(origin, direction, limit)
+                if location is not None:
+                    hit_dist[i] = dist / scale[i]
+        return hit_dist
+
+    def close(self):
+        self.trees = []
+
+
+class CombinedRayCaster:
+    """多个求交器取最近的命中；逐帧烘焙时静态遮挡物和变化的遮挡物分开建结构
+
+    不拥有子求交器，close() 不关闭它们
+    """
+
+    def __init__(self, casters):
+        self.casters = [cast for cast in casters if cast is not None]
+        self.rays_per_chunk = min((cast.rays_per_chunk for cast in self.casters), default=16384)
+
+    def __call__(self, origins, directions):
+        hit_dist = np.full(len(origins), np.inf)
+        for cast in self.casters:
+            np.minimum(hit_dist, cast(origins, directions), out=hit_dist)
+        return hit_dist
+
+    def close(self):
+        self.casters = []
+
+
+def make_ray_caster(context, props, depsgraph, bounds=None, occluders=None):
+    """按 props.ao_engine 创建射线求交器
+
+    bounds 为射线起点所在的世界空间范围 (min, max)，多进程引擎只为该范围建立网格
+    occluders 为已收集好的 (verts, tris)，为 None 时从 depsgraph 收集
+    """
+    if props.ao_engine == 'SCENE':
+        return SceneRayCaster(context, depsgraph, props.ao_distance)
+    if occluders is None:
+        occluders = gather_occluder_triangles(depsgraph)
+    if props.ao_engine == 'BVH':
+        bvh = build_occluder_bvh(*occluders)
+        return BVHRayCaster(bvh, props.ao_distance)
+    if props.ao_engine == 'PARALLEL':
+        verts, tris = occluders
+        workers = props.ao_workers or os.cpu_count() or 1
+        return ParallelRayCaster(verts, tris, props.ao_distance, workers, bounds)
+    return SceneRayCaster(context, depsgraph, props.ao_distance)
+# endregion
+
+
+# region  "多进程AO (共享内存 + 均匀网格)"
+# 网格单元数上限
+GRID_MAX_CELLS = 1 << 22
+# 三角形包围盒覆盖的单元数超过该值时放入全局列表，每条射线都要测试
+GRID_MAX_TRI_CELLS = 64
+# 单次 Möller–Trumbore 计算的 射线×三角形 对数上限，用于控制内存
+PAIRS_PER_BLOCK = 1 << 18
+# 射线起点沿法线的偏移量，避免自相交
+AO_RAY_OFFSET = 0.01
+
+
+def build_triangle_grid(tri_min, tri_max, region_min, region_max, distance):
+    """把三角形按包围盒分配到均匀网格（CSR 格式）
+
+    单元边长不小于 distance，因此从某单元出发、长度不超过 distance 的射线
+    只可能命中该单元及其周围 26 个单元中的三角形。
+    返回 (lo, cell, dims, cell_start, cell_tris, big_tris)
+    """
+    extent = np.maximum(region_max - region_min, 1e-6)
+    cell = max(distance, float((np.prod(extent) / GRID_MAX_CELLS) ** (1.0 / 3.0)))
+    while True:
+        # 四周各留一个单元，保证邻域查询不会越界
+        dims = np.ceil(extent / cell).astype(np.int64) + 2
+        if np.prod(dims) <= GRID_MAX_CELLS:
+            break
+        cell *= 1.25
+    lo = region_min - cell
+    hi = lo + dims * cell
+    cell_count = int(np.prod(dims))
+
+    inside = np.all(tri_max >= lo, axis=1) & np.all(tri_min <= hi, axis=1)
+    ids = np.flatnonzero(inside)
+    cmin = np.clip(np.floor((tri_min[ids] - lo) / cell).astype(np.int64), 0, dims - 1)
+    cmax = np.clip(np.floor((tri_max[ids] - lo) / cell).astype(np.int64), 0, dims - 1)
+    span = cmax - cmin + 1
+    count = np.prod(span, axis=1)
+
+    big = count > GRID_MAX_TRI_CELLS
+    big_tris = ids[big].astype(np.int32)
+    ids, cmin, span, count = ids[~big], cmin[~big], span[~big], count[~big]
+
+    # 展开每个三角形覆盖的所有单元
+    first = np.repeat(np.cumsum(count) - count, count)
+    k = np.arange(int(count.sum()), dtype=np.int64) - first
+    sx = np.repeat(span[:, 0], count)
+    sy = np.repeat(span[:, 1], count)
+    cx = np.repeat(cmin[:, 0], count) + k % sx
+    cy = np.repeat(cmin[:, 1], count) + (k // sx) % sy
+    cz = np.repeat(cmin[:, 2], count) + k // (sx * sy)
+    cells = cx + dims[0] * (cy + dims[1] * cz)
+
+    order = np.argsort(cells, kind='stable')
+    cell_tris = np.repeat(ids, count)[order].astype(np.int32)
+    cell_start = np.zeros(cell_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cells, minlength=cell_count), out=cell_start[1:])
+    return lo, cell, dims, cell_start, cell_tris, big_tris
+
+
+def nearest_hits(origins, dirs, v0, e1, e2, max_dist):
+    """Möller–Trumbore 射线/三角形求交（双面），返回每条射线最近命中距离，未命中为 inf
+
+    按分量展开计算（避免对长度为3的最后一维调用 np.cross，速度约快4倍）
+    """
+    result = np.full(len(origins), np.inf, dtype=np.float32)
+    tri_step = min(len(v0), PAIRS_PER_BLOCK)
+    ray_step = max(1, PAIRS_PER_BLOCK // max(tri_step, 1))
+    for t0 in range(0, len(v0), tri_step):
+        ax, ay, az = (v0[t0:t0 + tri_step, i][None] for i in range(3))
+        bx, by, bz = (e1[t0:t0 + tri_step, i][None] for i in range(3))
+        cx, cy, cz = (e2[t0:t0 + tri_step, i][None] for i in range(3))
+        for r0 in range(0, len(origins), ray_step):
+            ox, oy, oz = (origins[r0:r0 + ray_step, i][:, None] for i in range(3))
+            dx, dy, dz = (dirs[r0:r0 + ray_step, i][:, None] for i in range(3))
+            px = dy * cz - dz * cy
+            py = dz * cx - dx * cz
+            pz = dx * cy - dy * cx
+            det = bx * px + by * py + bz * pz
+            valid = np.abs(det) > 1e-12
+            inv_det = 1.0 / np.where(valid, det, 1.0)
+            tx = ox - ax
+            ty = oy - ay
+            tz = oz - az
+            u = (tx * px + ty * py + tz * pz) * inv_det
+            qx = ty * bz - tz * by
+            qy = tz * bx - tx * bz
+            qz = tx * by - ty * bx
+            v = (dx * qx + dy * qy + dz * qz) * inv_det
+            t = (cx * qx + cy * qy + cz * qz) * inv_det
+            valid &= (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t > 1e-6) & (t <= max_dist)
+            hit = np.where(valid, t, np.inf).min(axis=1)
+            np.minimum(result[r0:r0 + ray_step], hit, out=result[r0:r0 + ray_step])
+    return result
+
+
+def intersect_rays_grid(state, origins, dirs):
+    """在网格中求交: 按起点所在单元分组，每组只测试 3x3x3 邻域与全局列表中的三角形"""
+    lo, cell, dims, distance = state["params"]
+    v0, e1, e2 = state["v0"], state["e1"], state["e2"]
+    cell_start, cell_tris, big_tris = state["cell_start"], state["cell_tris"], state["big_tris"]
+
+    ci = np.clip(np.floor((origins - lo) / cell).astype(np.int64), 1, dims - 2)
+    keys = ci[:, 0] + dims[0] * (ci[:, 1] + dims[1] * ci[:, 2])
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    splits = np.flatnonzero(np.diff(sorted_keys)) + 1
+    group_starts = np.concatenate(([0], splits))
+    group_ends = np.concatenate((splits, [len(keys)]))
+
+    offsets = np.array([dx + dims[0] * (dy + dims[1] * dz)
+                        for dz in (-1, 0, 1) for dy in (-1, 0, 1) for dx in (-1, 0, 1)])
+    result = np.full(len(origins), np.inf, dtype=np.float32)
+    for gs, ge in zip(group_starts, group_ends):
+        neighbors = sorted_keys[gs] + offsets
+        parts = [cell_tris[cell_start[c]:cell_start[c + 1]] for c in neighbors]
+        parts.append(big_tris)
+        candidates = np.unique(np.concatenate(parts))
+        if candidates.size == 0:
+            continue
+        ray_ids = order[gs:ge]
+        result[ray_ids] = nearest_hits(origins[ray_ids], dirs[ray_ids],
+                                       v0[candidates], e1[candidates], e2[candidates], distance)
+    return result
+
+
+# 工作进程状态: 共享内存中的三角形/网格数组，以及当前的射线缓冲区
+_WORKER_STATE = {}
+
+
+def _attach_shared(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _parallel_worker_init(spec, params):
+    """进程池初始化: 按名称挂载共享内存中的三角形与网格数组"""
+    _parallel_worker_release()
+    handles = []
+    for key, (name, shape, dtype) in spec.items():
+        shm, array = _attach_shared(name, shape, dtype)
+        handles.append(shm)
+        _WORKER_STATE[key] = array
+    _WORKER_STATE["handles"] = handles
+    _WORKER_STATE["params"] = params
+
+
+def _parallel_worker_release():
+    """释放当前进程对共享内存的挂载"""
+    handles = list(_WORKER_STATE.get("handles", []))
+    if "rays" in _WORKER_STATE:
+        handles.extend(_WORKER_STATE["rays"][1])
+    # 先丢弃数组引用再关闭共享内存
+    _WORKER_STATE.clear()
+    for shm in handles:
+        shm.close()
+
+
+def _parallel_worker_run(task):
+    """处理射线缓冲区中的 [start, end) 区间，结果写回共享的命中距离缓冲区"""
+    ray_spec, start, end = task
+    rays = _WORKER_STATE.get("rays")
+    if rays is None or rays[0] != ray_spec:
+        if rays is not None:
+            stale = _WORKER_STATE.pop("rays")[1]
+            rays = None
+            for shm in stale:
+                shm.close()
+        handles, arrays = [], []
+        for name, shape, dtype in ray_spec:
+            shm, array = _attach_shared(name, shape, dtype)
+            handles.append(shm)
+            arrays.append(array)
+        rays = (ray_spec, handles, arrays)
+        _WORKER_STATE["rays"] = rays
+    origins, dirs, hits = rays[2]
+    hits[start:end] = intersect_rays_grid(_WORKER_STATE, origins[start:end], dirs[start:end])
+
+
+def _fork_context():
+    """工作进程需要直接继承已加载的模块（本文件依赖 bpy，无法在新解释器中导入），
+    因此只使用 fork；不支持 fork 的平台返回 None，退回单进程"""
+    try:
+        return multiprocessing.get_context("fork")
+    except ValueError:
+        return None
+
+
+class ParallelRayCaster:
+    """多进程 NumPy 射线求交
+
+    遮挡三角形（v0, e1, e2）和网格放入共享内存，每批射线的起点/方向写入共享缓冲区，
+    再按区间分给进程池，各进程把命中距离写回共享内存。
+    """
+    # 批次越大，进程池的分发开销占比越小
+    rays_per_chunk = 262144
+
+    def __init__(self, verts, tris, distance, workers, bounds=None):
+        self.distance = distance
+        self.workers = max(1, workers)
+        self.pool = None
+        self._shared = []
+        self._rays = None
+        self.tri_count = len(tris)
+        if self.tri_count == 0:
+            return
+
+        tri_verts = verts[tris]
+        tri_min = tri_verts.min(axis=1)
+        tri_max = tri_verts.max(axis=1)
+        if bounds is None:
+            region_min, region_max = tri_min.min(axis=0), tri_max.max(axis=0)
+        else:
+            region_min = np.asarray(bounds[0], dtype=np.float64) - AO_RAY_OFFSET * 2
+            region_max = np.asarray(bounds[1], dtype=np.float64) + AO_RAY_OFFSET * 2
+        lo, cell, dims, cell_start, cell_tris, big_tris = build_triangle_grid(
+            tri_min, tri_max, region_min, region_max, distance)
+
+        arrays = {
+            "v0": tri_verts[:, 0].astype(np.float32),
+            "e1": (tri_verts[:, 1] - tri_verts[:, 0]).astype(np.float32),
+            "e2": (tri_verts[:, 2] - tri_verts[:, 0]).astype(np.float32),
+            "cell_start": cell_start,
+            "cell_tris": cell_tris,
+            "big_tris": big_tris,
+        }
+        spec = {key: self._share(array) for key, array in arrays.items()}
+        params = (lo.astype(np.float32), np.float32(cell), dims, np.float32(distance))
+
+        context = _fork_context() if self.workers > 1 else None
+        if context is None:
+            self.workers = 1
+            _parallel_worker_init(spec, params)
+        else:
+            self.pool = context.Pool(self.workers, initializer=_parallel_worker_init,
+                                     initargs=(spec, params))
+
+    def _share(self, array, capacity=None):
+        """把数组复制进新的共享内存块，返回 (名称, 形状, 类型)"""
+        shape = array.shape if capacity is None else (capacity,) + array.shape[1:]
+        nbytes = max(int(np.prod(shape)) * array.dtype.itemsize, 1)
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._shared.append(shm)
+        if capacity is None:
+            np.ndarray(shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        return shm.name, shape, array.dtype.str
+
+    def _ray_buffers(self, count):
+        """返回容量足够的射线缓冲区 (spec, origins, dirs, hits)，不够时重新分配"""
+        if self._rays is None or len(self._rays[1]) < count:
+            if self._rays is not None:
+                stale = self._rays[4]
+                self._rays = None
+                for shm in stale:
+                    self._shared.remove(shm)
+                    shm.close()
+                    shm.unlink()
+            before = len(self._shared)
+            spec = (
+                self._share(np.empty((0, 3), dtype=np.float32), count),
+                self._share(np.empty((0, 3), dtype=np.float32), count),
+                self._share(np.empty(0, dtype=np.float32), count),
+            )
+            handles = self._shared[before:]
+            arrays = [np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+                      for (_name, shape, dtype), shm in zip(spec, handles)]
+            self._rays = (spec, *arrays, handles)
+        return self._rays[:4]
+
+    def __call__(self, origins, directions):
+        """返回每条射线的命中距离，未命中为 inf"""
+        count = len(origins)
+        if count == 0 or self.tri_count == 0:
+            return np.full(count, np.inf)
+        spec, ray_origins, ray_dirs, hits = self._ray_buffers(count)
+        ray_origins[:count] = origins
+        ray_dirs[:count] = directions
+
+        step = max(1, -(-count // (self.workers * 4)))
+        tasks = [(spec, start, min(start + step, count)) for start in range(0, count, step)]
+        if self.pool is not None:
+            self.pool.map(_parallel_worker_run, tasks)
+        else:
+            for task in tasks:
+                _parallel_worker_run(task)
+        return hits[:count].astype(np.float64)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        else:
+            _parallel_worker_release()
+        self._rays = None
+        for shm in self._shared:
+            shm.close()
+            shm.unlink()
+        self._shared = []
+# endregion
+
+
+# region  "半球采样"
+def radical_inverse_base2(indices):
+    """以2为底的反演（van der Corput 序列），即 Sobol 序列的第一维"""
+    bits = indices.astype(np.uint32)
+    bits = ((bits << np.uint32(16)) | (bits >> np.uint32(16))).astype(np.uint32)
+    bits = ((bits & np.uint32(0x00FF00FF)) << np.uint32(8)) | ((bits & np.uint32(0xFF00FF00)) >> np.uint32(8))
+    bits = ((bits & np.uint32(0x0F0F0F0F)) << np.uint32(4)) | ((bits & np.uint32(0xF0F0F0F0)) >> np.uint32(4))
+    bits = ((bits & np.uint32(0x33333333)) << np.uint32(2)) | ((bits & np.uint32(0xCCCCCCCC)) >> np.uint32(2))
+    bits = ((bits & np.uint32(0x55555555)) << np.uint32(1)) | ((bits & np.uint32(0xAAAAAAAA)) >> np.uint32(1))
+    return bits.astype(np.float64) / 2.0 ** 32
+
+
+def sobol_second_dimension(indices):
+    """Sobol 序列第二维，方向数 v1 = 2^31, vk = v(k-1) ^ (v(k-1) >> 1)"""
+    remaining = indices.astype(np.uint32)
+    result = np.zeros(len(indices), dtype=np.uint32)
+    direction = np.uint32(1 << 31)
+    while remaining.any():
+        result ^= np.where(remaining & np.uint32(1), direction, np.uint32(0)).astype(np.uint32)
+        direction ^= direction >> np.uint32(1)
+        remaining >>= np.uint32(1)
+    return result.astype(np.float64) / 2.0 ** 32
+
+
+@functools.lru_cache(maxsize=16)
+def hemisphere_table(sampler, samples):
+    """预计算余弦加权的局部半球方向表 (samples, 3)，z 轴为法线方向
+
+    每种采样方式和采样数只计算一次，返回只读数组
+    """
+    indices = np.arange(samples)
+    if sampler == 'HAMMERSLEY':
+        u1 = (indices + 0.5) / samples
+        u2 = radical_inverse_base2(indices)
+    else:
+        u1 = radical_inverse_base2(indices)
+        u2 = sobol_second_dimension(indices)
+
+    # 余弦加权: 在单位圆盘上均匀取点再投影到半球
+    radius = np.sqrt(u1)
+    phi = 2.0 * np.pi * u2
+    table = np.stack((radius * np.cos(phi), radius * np.sin(phi),
+                      np.sqrt(np.maximum(1.0 - u1, 0.0))), axis=1)
+    table.setflags(write=False)
+    return table
+
+
+def tangent_frames(normals, angles):
+    """为每个法线构建正交切线空间 (N, 3, 3)，行依次为 切线、副切线、法线
+
+    使用 Duff 等人的无分支构造，再绕法线旋转 angles，使相邻顶点的采样方向错开
+    """
+    x, y, z = normals[:, 0], normals[:, 1], normals[:, 2]
+    sign = np.where(z >= 0.0, 1.0, -1.0)
+    a = -1.0 / (sign + z)
+    b = x * y * a
+    tangent = np.stack((1.0 + sign * x * x * a, sign * b, -sign * x), axis=1)
+    bitangent = np.stack((b, sign + y * y * a, -y), axis=1)
+
+    cos_a = np.cos(angles)[:, None]
+    sin_a = np.sin(angles)[:, None]
+    return np.stack((cos_a * tangent + sin_a * bitangent,
+                     cos_a * bitangent - sin_a * tangent,
+                     normals), axis=1)
+
+
+class HemisphereSampler:
+    """为顶点生成AO采样方向
+
+    低差异方式共用一张预计算的方向表，每个顶点只多一个随机旋转角；
+    随机数全部来自同一个 numpy Generator，固定种子时结果可复现。
+    """
+
+    def __init__(self, sampler, samples, vert_count, seed=None):
+        self.sampler = sampler
+        self.samples = samples
+        self.rng = np.random.default_rng(seed)
+        if sampler == 'RANDOM':
+            self.table = None
+            self.angles = None
+        else:
+            self.table = hemisphere_table(sampler, samples)
+            self.angles = self.rng.uniform(0.0, 2.0 * np.pi, vert_count)
+
+    def directions(self, vert_ids, normals, first=0, count=None):
+        """返回 (len(vert_ids), count, 3) 的世界空间方向，使用第 first 到 first+count 个采样"""
+        if count is None:
+            count = self.samples - first
+        if self.table is None:
+            # 旧方式: 法线 + [-1, 1] 均匀随机向量，再归一化
+            dirs = normals[:, None, :] + self.rng.uniform(-1.0, 1.0, (len(normals), count, 3))
+            length = np.linalg.norm(dirs, axis=2, keepdims=True)
+            return dirs / np.maximum(length, 1e-12)
+        frames = tangent_frames(normals, self.angles[vert_ids])
+        return np.einsum('sk,nkj->nsj', self.table[first:first + count], frames)
+
+
+def make_sampler(props, vert_count, stream=None):
+    """按 props 创建采样器；分块烘焙时 stream 为块的起始顶点，固定种子下每块结果仍可复现"""
+    seed = props.ao_seed if props.use_fixed_seed else None
+    if seed is not None and stream is not None:
+        seed = [seed, stream]
+    return HemisphereSampler(props.ao_sampler, props.ao_samples, vert_count, seed)
+# endregion
+
+
+# region  "烘焙缓存"
+# 缓存的元数据（JSON 字符串）存放在网格的自定义属性中，逐顶点数值存放在隐藏的点属性中
+CACHE_META_KEY = "vcb_bake_cache"
+CACHE_AO_ATTR = ".vcb_ao"
+CACHE_EDGE_ATTR = ".vcb_edge"
+CACHE_THICKNESS_ATTR = ".vcb_thickness"
+CACHE_BENT_ATTR = ".vcb_bent"
+CACHE_CO_ATTR = ".vcb_co"
+
+# 点属性的数据类型 -> (foreach 字段名, 每个元素的分量数)
+POINT_VALUE_FIELDS = {
+    'FLOAT': ("value", 1),
+    'FLOAT_VECTOR': ("vector", 3),
+}
+
+
+def hash_arrays(*arrays):
+    """对若干 numpy 数组的内容计算哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def hash_values(*values):
+    """对若干可 JSON 序列化的值计算哈希"""
+    return hashlib.blake2b(json.dumps(values).encode(), digest_size=16).hexdigest()
+
+
+def read_face_topology(mesh):
+    """返回 (每个面角的顶点索引, 每个面的面角数)"""
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+    loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    return loop_verts, loop_totals
+
+
+def target_geometry_key(mesh, matrix_world, co):
+    """烘焙目标的几何哈希: 顶点坐标、面拓扑和世界矩阵"""
+    return hash_arrays(co, *read_face_topology(mesh), np.array(matrix_world, dtype=np.float64))
+
+
+def target_topology_key(mesh):
+    """烘焙目标的拓扑哈希（不含顶点坐标）"""
+    return hash_arrays(len(mesh.vertices), *read_face_topology(mesh))
+
+
+def ao_params_key(props):
+    """影响AO和描边结果的参数哈希（不含只影响混色的强度）"""
+    return hash_values(
+        props.ao_samples, round(props.ao_distance, 6), round(props.sharp_angle, 6),
+        props.ao_sampler, props.use_fixed_seed, props.ao_seed,
+        props.use_adaptive, props.adaptive_batch, round(props.adaptive_threshold, 6),
+        props.use_sparse_bake, round(props.sparse_cell_ratio, 6),
+        needs_extra_channels(props),
+    )
+
+
+def blend_params_key(props):
+    """混色参数哈希"""
+    return hash_values(round(props.ao_strength, 6), round(props.edge_strength, 6), props.color_layer_name,
+                       props.blur_iterations, props.output_layout, props.color_domain, props.color_type,
+                       props.channel_r, props.channel_g, props.channel_b, props.channel_a)
+
+
+def _read_point_values(mesh, name, data_type='FLOAT'):
+    attr = mesh.attributes.get(name)
+    if attr is None or attr.domain != 'POINT' or attr.data_type != data_type:
+        return None
+    field, width = POINT_VALUE_FIELDS[data_type]
+    values = np.empty(len(mesh.vertices) * width, dtype=np.float32)
+    attr.data.foreach_get(field, values)
+    values = values.astype(np.float64)
+    return values if width == 1 else values.reshape(-1, width)
+
+
+def _write_point_values(mesh, name, values, data_type='FLOAT'):
+    attr = mesh.attributes.get(name)
+    if attr is not None and (attr.domain != 'POINT' or attr.data_type != data_type):
+        mesh.attributes.remove(attr)
+        attr = None
+    if attr is None:
+        attr = mesh.attributes.new(name, data_type, 'POINT')
+    field, _ = POINT_VALUE_FIELDS[data_type]
+    attr.data.foreach_set(field, values.astype(np.float32).ravel())
+
+
+def load_bake_cache(mesh):
+    """读取缓存，返回 (元数据, ao, edge, 额外通道)；没有缓存或已损坏时返回 None
+
+    额外通道为 {"thickness", "bent"} 字典，缓存中没有时为 None
+    """
+    raw = mesh.get(CACHE_META_KEY)
+    if not raw:
+        return None
+    try:
+        meta = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    ao = _read_point_values(mesh, CACHE_AO_ATTR)
+    edge = _read_point_values(mesh, CACHE_EDGE_ATTR)
+    if ao is None or edge is None:
+        return None
+    thickness = _read_point_values(mesh, CACHE_THICKNESS_ATTR)
+    bent = _read_point_values(mesh, CACHE_BENT_ATTR, 'FLOAT_VECTOR')
+    extra = None
+    if thickness is not None and bent is not None:
+        extra = {"thickness": thickness, "bent": bent}
+    return meta, ao, edge, extra
+
+
+def save_bake_cache(mesh, meta, ao, edge, extra=None, positions=None):
+    """写入缓存的逐顶点数值和元数据，positions 为烘焙时的世界空间顶点坐标"""
+    _write_point_values(mesh, CACHE_AO_ATTR, ao)
+    _write_point_values(mesh, CACHE_EDGE_ATTR, edge)
+    if positions is not None:
+        _write_point_values(mesh, CACHE_CO_ATTR, positions, 'FLOAT_VECTOR')
+    if extra is not None:
+        _write_point_values(mesh, CACHE_THICKNESS_ATTR, extra["thickness"])
+        _write_point_values(mesh, CACHE_BENT_ATTR, extra["bent"], 'FLOAT_VECTOR')
+    mesh[CACHE_META_KEY] = json.dumps(meta)
+
+
+def occluder_records_meta(records):
+    """遮挡物记录转为可存入元数据的字典: 名称 -> [哈希, 最小点, 最大点]"""
+    return {key: [digest, bmin, bmax] for key, digest, bmin, bmax in records}
+
+
+def target_edit_is_local(obj):
+    """没有启用的修改器和形态键时，求值网格就是原网格，移动顶点只影响其附近"""
+    return obj.data.shape_keys is None and not any(mod.show_viewport for mod in obj.modifiers)
+
+
+def edited_region(mesh, old_positions, positions):
+    """目标自身顶点移动后受影响的世界空间范围 (最小点, 最大点)，没有顶点移动时返回 None
+
+    范围是与移动顶点共面的所有顶点在新旧位置下的包围盒（这些顶点的法线和所在三角形都变了）
+    """
+    # 缓存的坐标是 float32，按同样精度比较
+    moved = np.any(old_positions != positions.astype(np.float32), axis=1)
+    if not moved.any():
+        return None
+    loop_verts, loop_totals = read_face_topology(mesh)
+    loop_faces = np.repeat(np.arange(len(loop_totals)), loop_totals)
+    faces = np.zeros(len(loop_totals), dtype=bool)
+    faces[loop_faces[moved[loop_verts]]] = True
+    affected = moved.copy()
+    affected[loop_verts[faces[loop_faces]]] = True
+    points = np.concatenate([old_positions[affected], positions[affected]])
+    return points.min(axis=0).tolist(), points.max(axis=0).tolist()
+
+
+def collect_target_edits(plans, props, occluder_meta):
+    """读取各烘焙目标的缓存，找出拓扑不变、只移动了顶点的目标
+
+    读到的缓存存入 plan["cached"]，编辑范围存入 plan["edit"]。
+    返回 {遮挡物名称: (缓存时的几何哈希, 当前几何哈希, 编辑范围)}，
+    供 dirty_vertices 把这些遮挡物的变化限制在编辑范围内
+    """
+    edits = {}
+    params = ao_params_key(props)
+    for plan in plans:
+        obj = plan["obj"]
+        mesh = obj.data
+        cached = load_bake_cache(mesh)
+        plan["cached"] = cached
+        plan["edit"] = None
+        if cached is None or not target_edit_is_local(obj):
+            continue
+        old_meta = cached[0]
+        old_positions = _read_point_values(mesh, CACHE_CO_ATTR, 'FLOAT_VECTOR')
+        if (old_positions is None or old_meta.get("params") != params
+                or old_meta.get("topology") != target_topology_key(mesh)):
+            continue
+        region = edited_region(mesh, old_positions, plan["positions"])
+        if region is None:
+            continue
+        plan["edit"] = region
+        old = old_meta.get("occluders", {}).get(obj.name)
+        new = occluder_meta.get(obj.name)
+        if old is not None and new is not None:
+            edits[obj.name] = (old[0], new[0], region)
+    return edits
+
+
+def dirty_vertices(positions, old_occluders, new_occluders, distance, edits=None, regions=()):
+    """返回AO可能受遮挡物变化影响的顶点索引
+
+    新增、删除或几何哈希改变的遮挡物，其旧/新包围盒向外扩展 distance 后覆盖到的顶点需要重算；
+    在 edits 中且新旧哈希与之对应的遮挡物只取其编辑范围。regions 为额外需要重算的范围
+    """
+    regions = list(regions)
+    edits = edits or {}
+    for key in old_occluders.keys() | new_occluders.keys():
+        old = old_occluders.get(key)
+        new = new_occluders.get(key)
+        if old is not None and new is not None and old[0] == new[0]:
+            continue
+        edit = edits.get(key)
+        if old is not None and new is not None and edit is not None and (old[0], new[0]) == edit[:2]:
+            regions.append(edit[2])
+            continue
+        for entry in (old, new):
+            if entry is not None:
+                regions.append((entry[1], entry[2]))
+
+    dirty = np.zeros(len(positions), dtype=bool)
+    margin = distance + AO_RAY_OFFSET
+    for bmin, bmax in regions:
+        lo = np.asarray(bmin) - margin
+        hi = np.asarray(bmax) + margin
+        dirty |= np.all((positions >= lo) & (positions <= hi), axis=1)
+    return np.flatnonzero(dirty)
+# endregion
+
+
+# region  "稀疏烘焙 (体素聚类)"
+# 法线量化精度: 各分量按 1/SPARSE_NORMAL_BUCKETS 取整，朝向差别大的顶点不会聚到一起
+SPARSE_NORMAL_BUCKETS = 2
+# 单轴体素数上限，防止体素过小时键值溢出
+SPARSE_MAX_AXIS_CELLS = 1 << 16
+
+
+def cluster_vertices(positions, normals, cell_size, indices=None):
+    """按 (体素, 量化法线) 把顶点聚类，每类选离类中心最近的顶点作代表
+
+    位置和法线都相同的顶点（如UV接缝处拆开的顶点）一定落在同一类。
+    返回字典: indices, labels（每个顶点所属的类）, reps（每类代表的顶点索引）, keys（每类的键, 已排序）,
+    cells, cell_size, origin, strides
+    """
+    if indices is None:
+        indices = np.arange(len(positions))
+    pts = positions[indices]
+    origin = pts.min(axis=0)
+    extent = float((pts.max(axis=0) - origin).max())
+    cell_size = max(cell_size, extent / SPARSE_MAX_AXIS_CELLS, 1e-9)
+
+    # 体素坐标整体 +1，邻居偏移 -1 时仍为非负
+    cells = np.floor((pts - origin) / cell_size).astype(np.int64) + 1
+    dims = cells.max(axis=0) + 2
+    buckets = 2 * SPARSE_NORMAL_BUCKETS + 1
+    quantized = np.rint(normals[indices] * SPARSE_NORMAL_BUCKETS).astype(np.int64) + SPARSE_NORMAL_BUCKETS
+    normal_key = (quantized[:, 0] * buckets + quantized[:, 1]) * buckets + quantized[:, 2]
+    strides = np.array([dims[1] * dims[2], dims[2], 1], dtype=np.int64) * buckets ** 3
+    vert_keys = cells @ strides + normal_key
+    keys, labels = np.unique(vert_keys, return_inverse=True)
+    labels = labels.ravel()
+
+    # 代表顶点: 类中距离类中心最近的顶点
+    counts = np.bincount(labels)
+    centers = np.stack([np.bincount(labels, weights=pts[:, c]) for c in range(3)], axis=1) / counts[:, None]
+    dist = np.einsum('ij,ij->i', pts - centers[labels], pts - centers[labels])
+    order = np.lexsort((dist, labels))
+    first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return {
+        "indices": indices,
+        "labels": labels,
+        "reps": indices[order[first]],
+        "keys": keys,
+        "cells": cells,
+        "cell_size": cell_size,
+        "origin": origin,
+        "strides": strides,
+    }
+
+
+def interpolate_cluster_values(clusters, positions, normals, values):
+    """用代表顶点的值插值其余顶点，结果写回 values（(N,) 或 (N, C)）
+
+    每个顶点取自身所在体素及朝向它一侧的 7 个相邻体素中同朝向的类，
+    按距离平方的倒数和法线夹角加权；代表顶点保留自身的值。
+    """
+    indices, labels, reps, keys = clusters["indices"], clusters["labels"], clusters["reps"], clusters["keys"]
+    pts = positions[indices]
+    vert_normals = normals[indices]
+    cell_size = clusters["cell_size"]
+    local = (pts - clusters["origin"]) / cell_size - (clusters["cells"] - 1)
+    step = np.where(local >= 0.5, 1, -1) * clusters["strides"]
+    own_keys = keys[labels]
+    rep_values = values[reps]
+    rep_positions = positions[reps]
+    rep_normals = normals[reps]
+
+    eps = (0.1 * cell_size) ** 2
+    weighted = np.zeros((len(indices),) + values.shape[1:])
+    weights = np.zeros(len(indices))
+    for corner in range(8):
+        offset = sum(step[:, axis] for axis in range(3) if corner >> axis & 1)
+        if corner == 0:
+            cluster = labels
+            found = np.ones(len(indices), dtype=bool)
+        else:
+            neighbor_keys = own_keys + offset
+            cluster = np.minimum(np.searchsorted(keys, neighbor_keys), len(keys) - 1)
+            found = keys[cluster] == neighbor_keys
+        delta = pts - rep_positions[cluster]
+        facing = np.einsum('ij,ij->i', vert_normals, rep_normals[cluster])
+        w = np.where(found, np.maximum(facing, 0.0) ** 2 / (np.einsum('ij,ij->i', delta, delta) + eps), 0.0)
+        weighted += w.reshape((-1,) + (1,) * (values.ndim - 1)) * rep_values[cluster]
+        weights += w
+
+    weights = weights.reshape((-1,) + (1,) * (values.ndim - 1))
+    result = np.where(weights > 0, weighted / np.maximum(weights, 1e-30), rep_values[labels])
+    values[indices] = result
+    values[reps] = rep_values
+# endregion
+
+
+# region  "向量化烘焙 (NumPy)"
+
+def read_vertex_arrays(mesh):
+    """用 foreach_get 读取顶点坐标和顶点法线，返回两个 (N, 3) 数组"""
+    count = len(mesh.vertices)
+    co = np.empty(count * 3, dtype=np.float64)
+    mesh.vertices.foreach_get("co", co)
+    normals = np.empty(count * 3, dtype=np.float64)
+    mesh.vertex_normals.foreach_get("vector", normals)
+    return co.reshape(-1, 3), normals.reshape(-1, 3)
+
+
+def to_world_space(matrix_world, co, normals):
+    """把顶点坐标和法线变换到世界空间，法线使用逆转置矩阵并归一化"""
+    matrix = np.array(matrix_world, dtype=np.float64)
+    rot = matrix[:3, :3]
+    world_co = co @ rot.T + matrix[:3, 3]
+    try:
+        normal_matrix = np.linalg.inv(rot).T
+    except np.linalg.LinAlgError:
+        normal_matrix = rot
+    world_normals = normals @ normal_matrix.T
+    length = np.linalg.norm(world_normals, axis=1, keepdims=True)
+    return world_co, world_normals / np.maximum(length, 1e-12)
+
+
+def compute_edge_strength(mesh, sharp_angle):
+    """计算每个顶点的描边强度: 相连锐边数 / 相连边数
+
+    锐边为恰好连接两个面、且两面法线夹角大于 sharp_angle（弧度）的边
+    """
+    vert_count = len(mesh.vertices)
+    edge_count = len(mesh.edges)
+    if edge_count == 0:
+        return np.zeros(vert_count)
+
+    edge_verts = np.empty(edge_count * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edge_verts)
+    edge_verts = edge_verts.reshape(-1, 2)
+
+    loop_edges = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("edge_index", loop_edges)
+    loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    loop_faces = np.repeat(np.arange(len(mesh.polygons), dtype=np.int32), loop_totals)
+    face_normals = np.empty(len(mesh.polygons) * 3, dtype=np.float64)
+    mesh.polygon_normals.foreach_get("vector", face_normals)
+    face_normals = face_normals.reshape(-1, 3)
+
+    # 按边排序loop，恰好有两个面的边取前两个loop所在的面
+    faces_per_edge = np.bincount(loop_edges, minlength=edge_count)
+    order = np.argsort(loop_edges, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(faces_per_edge)[:-1]))
+    manifold = np.flatnonzero(faces_per_edge == 2)
+    n0 = face_normals[loop_faces[order[starts[manifold]]]]
+    n1 = face_normals[loop_faces[order[starts[manifold] + 1]]]
+
+    # 退化面（零长度法线）的夹角视为0
+    lengths = np.linalg.norm(n0, axis=1) * np.linalg.norm(n1, axis=1)
+    valid = lengths > 1e-12
+    cos_angle = np.einsum('ij,ij->i', n0, n1) / np.where(valid, lengths, 1.0)
+    angles = np.where(valid, np.arccos(np.clip(cos_angle, -1.0, 1.0)), 0.0)
+
+    sharp_edges = manifold[angles > sharp_angle]
+    edges_per_vert = np.bincount(edge_verts.ravel(), minlength=vert_count)
+    sharp_per_vert = np.bincount(edge_verts[sharp_edges].ravel(), minlength=vert_count)
+    return np.divide(sharp_per_vert, edges_per_vert,
+                     out=np.zeros(vert_count), where=edges_per_vert > 0)
+
+
+# 上次烘焙的统计，供面板显示
+_bake_stats = {}
+
+# 性能记录的日志文件名，写在 .blend 文件旁边
+PROFILE_LOG_NAME = "vertex_color_bake_profile.jsonl"
+
+# 当前烘焙的性能记录器，未开启性能记录时为 None
+_profiler = None
+
+
+def current_rss_mb():
+    """当前进程的常驻内存 (MB)；只在 Linux 上可读，其他平台返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def process_peak_rss_mb():
+    """整个 Blender 进程自启动以来的常驻内存峰值 (MB)，不能用来衡量单次烘焙；Windows 上返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class BakeProfiler:
+    """记录各阶段用时和内存
+
+    生成器阶段只累计 next() 内部的时间，模态烘焙时界面刷新的时间不计入。
+    本次烘焙的内存用 tracemalloc 峰值（NumPy 数组也计入）和烘焙前后常驻内存的变化衡量；
+    ru_maxrss 是整个进程的峰值，只作参考
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.busy = 0.0
+        self.rss_start = current_rss_mb()
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def steps(self, name, steps):
+        """包装生成器，累计其运行时间；name 为 None 时计入总用时"""
+        while True:
+            t0 = time.perf_counter()
+            try:
+                progress = next(steps)
+            except StopIteration as stop:
+                self._count(name, time.perf_counter() - t0)
+                return stop.value
+            self._count(name, time.perf_counter() - t0)
+            yield progress
+
+    def _count(self, name, seconds):
+        if name is None:
+            self.busy += seconds
+        else:
+            self.add(name, seconds)
+
+    def report(self, rays):
+        """汇总为可写入 JSON 的字典"""
+        stages = dict(self.stages)
+        other = self.busy - sum(stages.values())
+        if other > 1e-3:
+            stages["其他"] = other
+        return {
+            "seconds": self.busy,
+            "stages": stages,
+            "rays": rays,
+            "rays_per_second": rays / max(self.busy, 1e-9),
+            "peak_python_mb": tracemalloc.get_traced_memory()[1] / (1024 * 1024),
+            "rss_start_mb": self.rss_start,
+            "rss_end_mb": current_rss_mb(),
+            "process_peak_rss_mb": process_peak_rss_mb(),
+        }
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+
+
+def profile_stage(name):
+    """开启性能记录时计时一段代码，否则什么都不做"""
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.stage(name)
+
+
+def profile_steps(name, steps):
+    """开启性能记录时累计生成器的运行时间，否则原样返回"""
+    if _profiler is None:
+        return steps
+    return _profiler.steps(name, steps)
+
+
+def iter_profiled(props, steps, finish):
+    """按 props.use_profiling 为整个烘焙生成器开启性能记录
+
+    steps 结束后先调用 finish()（更新并打印 _bake_stats），再把性能汇总写入 _bake_stats["profile"] 并追加到日志
+    """
+    global _profiler
+    if not props.use_profiling:
+        yield from steps
+        finish()
+        return
+
+    previous = _profiler
+    profiler = BakeProfiler()
+    _profiler = profiler
+    try:
+        yield from profiler.steps(None, steps)
+        finish()
+        report = profiler.report(_bake_stats.get("rays", 0))
+        _bake_stats["profile"] = report
+        append_profile_log(report, props)
+    finally:
+        profiler.close()
+        _profiler = previous
+
+
+def append_profile_log(report, props):
+    """把一次烘焙的性能记录作为一行 JSON 追加到 .blend 旁的日志，未保存的文件只打印"""
+    stages = sorted(report["stages"].items(), key=lambda item: item[1], reverse=True)
+    print("  性能: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in stages))
+    print(f"  射线/秒: {report['rays_per_second']:.0f}, Python 内存峰值: {report['peak_python_mb']:.1f} MB")
+    if not bpy.data.filepath:
+        print("  .blend 文件未保存，性能记录未写入日志")
+        return
+
+    record = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "blend": bpy.data.filepath,
+        "addon_version": list(bl_info["version"]),
+        "blender": bpy.app.version_string,
+        "settings": {
+            "bake_mode": props.bake_mode,
+            "ao_engine": props.ao_engine,
+            "ao_samples": props.ao_samples,
+            "ao_sampler": props.ao_sampler,
+            "use_adaptive": props.use_adaptive,
+            "use_sparse_bake": props.use_sparse_bake,
+            "output_layout": props.output_layout,
+        },
+        "objects": len(_bake_stats.get("objects", [])),
+        "vertices": _bake_stats.get("vertices", 0),
+        **report,
+    }
+    path = os.path.join(os.path.dirname(bpy.data.filepath), PROFILE_LOG_NAME)
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"  性能日志写入失败: {e}")
+
+# 面板中最多列出的对象数
+STATS_MAX_ROWS = 8
+
+CACHE_STATE_LABELS = {
+    'OFF': "无缓存",
+    'HIT': "无变化，已跳过",
+    'BLEND': "仅重新混色",
+    'PARTIAL': "局部重算",
+    'FULL': "完整烘焙",
+}
+
+
+def needs_extra_channels(props):
+    """输出是否用到厚度或弯曲法线"""
+    if props.output_layout == 'SEPARATE':
+        return True
+    if props.output_layout == 'PACKED':
+        used = {props.channel_r, props.channel_g, props.channel_b, props.channel_a}
+        return bool(used & {'THICKNESS', 'BENT_X', 'BENT_Y', 'BENT_Z'})
+    return False
+
+
+def new_channel_sums(vert_count, distance):
+    """厚度与弯曲法线的累加缓冲区"""
+    return {
+        "bent": np.zeros((vert_count, 3)),
+        "thickness": np.zeros(vert_count),
+        "rays": np.zeros(vert_count),
+        "distance": distance,
+    }
+
+
+def accumulate_channel_rays(cast, positions, normals, ids, dirs, hit_dist, sums):
+    """复用一批AO射线: 未被遮挡的方向累加为弯曲法线，反向（沿 -法线 的半球）再发射一次测厚度
+
+    未命中的内向射线按 AO 距离计。返回新增的射线数
+    """
+    count = dirs.shape[1]
+    unoccluded = ~np.isfinite(hit_dist).reshape(-1, count)
+    sums["bent"][ids] += np.einsum('ns,nsj->nj', unoccluded, dirs)
+    inward = positions[ids] - normals[ids] * AO_RAY_OFFSET
+    back_dist = cast(np.repeat(inward, count, axis=0), -dirs.reshape(-1, 3))
+    sums["thickness"][ids] += np.minimum(back_dist, sums["distance"]).reshape(-1, count).sum(axis=1)
+    sums["rays"][ids] += count
+    return len(ids) * count
+
+
+def resolve_channel_sums(sums, normals, ids):
+    """累加结果转为 (厚度 0~1, 世界空间单位弯曲法线)；完全被遮挡的顶点弯曲法线取顶点法线"""
+    rays = np.maximum(sums["rays"][ids], 1.0)
+    thickness = np.clip(sums["thickness"][ids] / rays / sums["distance"], 0.0, 1.0)
+    bent = sums["bent"][ids]
+    length = np.linalg.norm(bent, axis=1, keepdims=True)
+    bent = np.where(length > 1e-12, bent / np.maximum(length, 1e-12), normals[ids])
+    return thickness, bent
+
+
+def iter_ao_values(cast, positions, normals, sampler, ao, indices=None, sums=None):
+    """分块发射AO射线，把可见度（1 = 完全无遮挡）写入 ao
+
+    indices 为需要计算的顶点索引，默认全部顶点；给出 sums 时同时累加厚度和弯曲法线
+    生成器: 每处理完一块 yield 一次进度 (0~1)，结束时返回射线总数
+    """
+    if indices is None:
+        indices = np.arange(len(positions))
+    vert_count = len(indices)
+    samples = sampler.samples
+    total_rays = vert_count * samples
+    chunk = max(1, cast.rays_per_chunk // samples)
+    for start in range(0, vert_count, chunk):
+        ids = indices[start:start + chunk]
+        origins = positions[ids] + normals[ids] * AO_RAY_OFFSET
+        dirs = sampler.directions(ids, normals[ids])
+        hit_dist = cast(np.repeat(origins, samples, axis=0), dirs.reshape(-1, 3))
+        hits = np.isfinite(hit_dist).reshape(-1, samples).sum(axis=1)
+        ao[ids] = 1.0 - hits / samples
+        if sums is not None:
+            total_rays += accumulate_channel_rays(cast, positions, normals, ids, dirs, hit_dist, sums)
+        yield (start + len(ids)) / vert_count
+    return total_rays
+
+
+def iter_ao_values_adaptive(cast, positions, normals, sampler, batch, threshold, ao, indices=None, sums=None):
+    """自适应AO: 每轮给未收敛的顶点发射 batch 条射线，可见度写入 ao
+
+    用 (命中+1)/(射线+2) 估计遮挡率并计算95%置信区间，半宽度不超过 threshold 时停止；
+    每个顶点至少发射两批，最多 sampler.samples 条。
+    indices 为需要计算的顶点索引，默认全部顶点；给出 sums 时同时累加厚度和弯曲法线
+    生成器: 每轮 yield 一次进度 (0~1)，结束时返回射线总数
+    """
+    if indices is None:
+        indices = np.arange(len(positions))
+    vert_count = len(indices)
+    samples = sampler.samples
+    batch = min(batch, samples)
+    min_rays = min(batch * 2, samples)
+    total_rays = 0
+    chunk = max(1, cast.rays_per_chunk // batch)
+    for start in range(0, vert_count, chunk):
+        ids = indices[start:start + chunk]
+        active = np.arange(len(ids))
+        hits = np.zeros(len(ids))
+        origins = positions[ids] + normals[ids] * AO_RAY_OFFSET
+        done = 0
+        # 同一块内的活动顶点同步推进，已发射的射线数相同
+        while len(active) and done < samples:
+            count = min(batch, samples - done)
+            active_ids = ids[active]
+            dirs = sampler.directions(active_ids, normals[active_ids], first=done, count=count)
+            hit_dist = cast(np.repeat(origins[active], count, axis=0), dirs.reshape(-1, 3))
+            hits[active] += np.isfinite(hit_dist).reshape(-1, count).sum(axis=1)
+            total_rays += len(active) * count
+            if sums is not None:
+                total_rays += accumulate_channel_rays(cast, positions, normals, active_ids, dirs, hit_dist, sums)
+            done += count
+
+            ao[active_ids] = 1.0 - hits[active] / done
+            if done >= min_rays:
+                p = (hits[active] + 1.0) / (done + 2.0)
+                half_width = 1.96 * np.sqrt(p * (1.0 - p) / done)
+                active = active[half_width > threshold]
+            yield (start + len(ids) * done / samples) / vert_count
+        yield (start + len(ids)) / vert_count
+    return total_rays
+
+
+def blend_vertex_colors(ao, edge_str, ao_strength, edge_strength):
+    """红色底色减去AO与描边，返回 (N, 4) RGBA"""
+    darken = (1.0 - ao) * ao_strength + edge_str * edge_strength
+    colors = np.empty((len(ao), 4), dtype=np.float32)
+    colors[:, :3] = np.clip(np.array([1.0, 0.0, 0.0]) - darken[:, None], 0.0, 1.0)
+    colors[:, 3] = 1.0
+    return colors
+
+
+def pack_channels(plan, ao, props):
+    """按 R/G/B/A 通道设置把各项结果打包为 (N, 4) RGBA，弯曲法线编码为 0.5 + 0.5 * 分量（物体空间）"""
+    vert_count = len(ao)
+    sources = {
+        'AO': lambda: ao,
+        'EDGE': lambda: plan["edge"],
+        'THICKNESS': lambda: plan["thickness"],
+        'ONE': lambda: np.ones(vert_count),
+        'ZERO': lambda: np.zeros(vert_count),
+    }
+    for axis, key in enumerate(('BENT_X', 'BENT_Y', 'BENT_Z')):
+        sources[key] = lambda axis=axis: 0.5 + 0.5 * object_space_normals(plan)[:, axis]
+    colors = np.empty((vert_count, 4), dtype=np.float32)
+    for c, key in enumerate((props.channel_r, props.channel_g, props.channel_b, props.channel_a)):
+        colors[:, c] = np.clip(sources[key](), 0.0, 1.0)
+    return colors
+
+
+def object_space_normals(plan):
+    """把世界空间的弯曲法线转回物体空间并归一化"""
+    rot = np.array(plan["obj"].matrix_world, dtype=np.float64)[:3, :3]
+    bent = plan["bent"] @ rot
+    return bent / np.maximum(np.linalg.norm(bent, axis=1, keepdims=True), 1e-12)
+
+
+def write_separate_channels(mesh, layer_name, plan, ao):
+    """每项结果写为独立的点属性: <名称>_AO, _Edge, _Thickness, _BentNormal（物体空间）"""
+    _write_point_values(mesh, f"{layer_name}_AO", ao)
+    _write_point_values(mesh, f"{layer_name}_Edge", plan["edge"])
+    _write_point_values(mesh, f"{layer_name}_Thickness", plan["thickness"])
+    _write_point_values(mesh, f"{layer_name}_BentNormal", object_space_normals(plan), 'FLOAT_VECTOR')
+    mesh.update()
+
+
+def output_exists(mesh, props):
+    """烘焙结果的输出属性是否还在网格上"""
+    name = props.color_layer_name
+    if props.output_layout == 'SEPARATE':
+        name = f"{name}_AO"
+    return mesh.attributes.get(name) is not None
+
+
+def ensure_color_attribute(mesh, layer_name, domain, data_type):
+    """取得指定域和类型的颜色属性，同名但域或类型不同的属性（包括非颜色属性）会被替换"""
+    attr = mesh.attributes.get(layer_name)
+    if attr is not None and (attr.domain != domain or attr.data_type != data_type):
+        mesh.attributes.remove(attr)
+        attr = None
+    if attr is None:
+        attr = mesh.color_attributes.new(layer_name, data_type, domain)
+    return attr
+
+
+def write_vertex_colors(mesh, layer_name, colors, domain='CORNER', data_type='FLOAT_COLOR'):
+    """把每个顶点的颜色 (N, 4) 一次性写入颜色属性
+
+    domain 为 'CORNER'（每个角一份，原方式）或 'POINT'（每个顶点一份）；
+    data_type 为 'FLOAT_COLOR' 或 'BYTE_COLOR'（每通道 8 位）。同名但域或类型不同的属性会被替换
+    """
+    attr = ensure_color_attribute(mesh, layer_name, domain, data_type)
+    if domain == 'CORNER':
+        loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loop_verts)
+        colors = colors[loop_verts]
+    attr.data.foreach_set("color", np.ascontiguousarray(colors, dtype=np.float32).ravel())
+    mesh.update()
+
+
+def scale_progress(steps, offset, scale):
+    """把子生成器的进度映射到 [offset, offset + scale]，并返回子生成器的返回值"""
+    while True:
+        try:
+            progress = next(steps)
+        except StopIteration as stop:
+            return stop.value
+        yield offset + progress * scale
+
+
+def plan_bake_target(obj, channels=False):
+    """读取一个烘焙目标的世界空间顶点数据
+
+    返回字典: obj, co, positions, normals, indices（需要重算的顶点）, ao, edge, cache, meta,
+    以及 channels 为真时的 thickness、bent（世界空间弯曲法线），否则为 None
+    """
+    co, normals = read_vertex_arrays(obj.data)
+    positions, world_normals = to_world_space(obj.matrix_world, co, normals)
+    vert_count = len(co)
+    return {
+        "obj": obj,
+        "co": co,
+        "positions": positions,
+        "normals": world_normals,
+        "indices": np.arange(vert_count),
+        "ao": np.ones(vert_count),
+        "edge": None,
+        "thickness": np.zeros(vert_count) if channels else None,
+        "bent": world_normals.copy() if channels else None,
+        "cache": 'OFF',
+        "meta": None,
+        "rays": 0,
+    }
+
+
+def apply_bake_cache(plan, props, occluder_meta, edits=None):
+    """根据缓存决定需要重算AO的顶点，并在需要时计算描边强度
+
+    edits 为 collect_target_edits 的结果（调用它之后 plan 中已有读到的缓存）；
+    目标只移动了顶点时，只重算编辑范围向外扩展 ao_distance 内的顶点
+    """
+    obj = plan["obj"]
     mesh = obj.data
+    positions = plan["positions"]
+    with profile_stage("缓存"):
+        if occluder_meta is not None:
+            meta = {
+                "target": target_geometry_key(mesh, obj.matrix_world, plan["co"]),
+                "topology": target_topology_key(mesh),
+                "params": ao_params_key(props),
+                "blend": blend_params_key(props),
+                "occluders": occluder_meta,
+            }
+            plan["meta"] = meta
+            plan["cache"] = 'FULL'
+            cached = plan["cached"] if "cached" in plan else load_bake_cache(mesh)
+            edit = plan.get("edit")
+            if cached is not None:
+                old_meta, old_ao, old_edge, old_extra = cached
+                if ((old_meta.get("target") == meta["target"] or edit is not None)
+                        and old_meta.get("params") == meta["params"]
+                        and (plan["thickness"] is None or old_extra is not None)):
+                    indices = dirty_vertices(positions, old_meta.get("occluders", {}), occluder_meta,
+                                             props.ao_distance, edits, [edit] if edit is not None else ())
+                    # 目标被编辑过时面法线变了，描边强度整体重算（开销很小）
+                    plan.update(ao=old_ao, edge=old_edge if edit is None else None, indices=indices,
+                                cache='PARTIAL' if len(indices) else 'BLEND')
+                    if plan["thickness"] is not None:
+                        plan.update(old_extra)
+                    if (not len(indices) and old_meta.get("blend") == meta["blend"]
+                            and output_exists(mesh, props)):
+                        plan["cache"] = 'HIT'
+
+    if plan["edge"] is None:
+        with profile_stage("描边"):
+            plan["edge"] = compute_edge_strength(mesh, np.radians(props.sharp_angle))
+
+
+def finish_bake_target(plan, props):
+    """混色并写回颜色，保存缓存"""
+    if plan["cache"] == 'HIT':
+        return
+    mesh = plan["obj"].data
+    ao = plan["ao"]
+    if props.blur_iterations > 0:
+        # 缓存中保存的是未平滑的AO，平滑只影响混色结果
+        ao = smooth_vertex_values(build_vertex_adjacency(mesh), ao, props.blur_iterations)
+    if props.output_layout == 'SEPARATE':
+        write_separate_channels(mesh, props.color_layer_name, plan, ao)
+    elif props.output_layout == 'AO_ONLY':
+        _write_point_values(mesh, props.color_layer_name, ao)
+        mesh.update()
+    elif props.output_layout == 'PACKED':
+        write_vertex_colors(mesh, props.color_layer_name, pack_channels(plan, ao, props),
+                            props.color_domain, props.color_type)
+    else:
+        colors = blend_vertex_colors(ao, plan["edge"], props.ao_strength, props.edge_strength)
+        write_vertex_colors(mesh, props.color_layer_name, colors, props.color_domain, props.color_type)
+    if plan["meta"] is not None:
+        extra = None
+        if plan["thickness"] is not None:
+            extra = {"thickness": plan["thickness"], "bent": plan["bent"]}
+        save_bake_cache(mesh, plan["meta"], plan["ao"], plan["edge"], extra, plan["positions"])
+
+
+def iter_plan_ao(cast, plan, props, sampler):
+    """计算一个烘焙目标 plan["indices"] 顶点的AO（及需要时的厚度和弯曲法线）
+
+    稀疏模式下只对代表顶点发射射线再插值。结果写入 plan 的 ao/thickness/bent，
+    射线数写入 plan["rays"]，实际发射射线的顶点数写入 plan["sampled"]。
+    生成器: yield 进度 (0~1)
+    """
+    positions, normals = plan["positions"], plan["normals"]
+    clusters = None
+    sampled = plan["indices"]
+    if props.use_sparse_bake:
+        clusters = cluster_vertices(positions, normals,
+                                    props.ao_distance * props.sparse_cell_ratio, plan["indices"])
+        sampled = clusters["reps"]
+    sums = new_channel_sums(len(positions), props.ao_distance) if plan["thickness"] is not None else None
+    if props.use_adaptive:
+        steps = iter_ao_values_adaptive(
+            cast, positions, normals, sampler,
+            props.adaptive_batch, props.adaptive_threshold, plan["ao"], sampled, sums)
+    else:
+        steps = iter_ao_values(cast, positions, normals, sampler, plan["ao"], sampled, sums)
+    plan["rays"] = yield from steps
+    if sums is not None:
+        plan["thickness"][sampled], plan["bent"][sampled] = resolve_channel_sums(sums, normals, sampled)
+    if clusters is not None:
+        interpolate_cluster_values(clusters, positions, normals, plan["ao"])
+        if sums is not None:
+            interpolate_cluster_values(clusters, positions, normals, plan["thickness"])
+            interpolate_cluster_values(clusters, positions, normals, plan["bent"])
+            bent = plan["bent"][plan["indices"]]
+            plan["bent"][plan["indices"]] = bent / np.maximum(
+                np.linalg.norm(bent, axis=1, keepdims=True), 1e-12)
+    plan["sampled"] = len(sampled)
+
+
+def dedupe_bake_targets(objects):
+    """按网格数据去重: 共享同一网格的对象只烘焙第一个
+
+    返回 (要烘焙的对象, 跳过的对象, 变换不同却共享网格的网格名)
+    """
+    groups = {}
+    for obj in objects:
+        groups.setdefault(obj.data, []).append(obj)
+    targets, skipped, conflicts = [], [], []
+    for data, members in groups.items():
+        targets.append(members[0])
+        skipped.extend(members[1:])
+        first = np.array(members[0].matrix_world)
+        if any(not np.allclose(np.array(o.matrix_world), first) for o in members[1:]):
+            conflicts.append(data.name)
+    return targets, skipped, conflicts
+
+
+def iter_bake_objects_numpy(context, objects, props, summary, summary_counts):
+    """向量化批量烘焙: 遮挡结构只构建一次，所有目标共用
+
+    每个目标: 数组读取 → 描边/AO → 混色 → 一次性写回。
+    生成器: AO 计算期间不断 yield 进度 (0~1)；颜色在全部AO完成后才写入，中途关闭生成器不会修改网格。
+    每个对象的用时追加到 summary 列表，遮挡物保留/剔除数写入 summary_counts。
+    """
+    plans = []
+    channels = needs_extra_channels(props)
+    for obj in objects:
+        t0 = time.perf_counter()
+        with profile_stage("读取顶点"):
+            plan = plan_bake_target(obj, channels)
+        plan["seconds"] = time.perf_counter() - t0
+        plans.append(plan)
+
+    # 只收集目标附近的遮挡物
+    depsgraph = context.evaluated_depsgraph_get()
+    regions = [(plan["positions"].min(axis=0), plan["positions"].max(axis=0))
+               for plan in plans if len(plan["positions"])]
+    counts = {"kept": 0, "culled": 0}
+    accept = make_occluder_filter(props, objects, regions, counts)
+    records = [] if props.use_bake_cache else None
+    occluders = None
+    if props.ao_engine != 'SCENE' or records is not None:
+        with profile_stage("收集遮挡物"):
+            occluders = gather_occluder_triangles(depsgraph, records, accept)
+    occluder_meta = occluder_records_meta(records) if records is not None else None
+    summary_counts.update(counts)
+
+    edits = None
+    if occluder_meta is not None:
+        with profile_stage("缓存"):
+            edits = collect_target_edits(plans, props, occluder_meta)
+    for plan in plans:
+        t0 = time.perf_counter()
+        apply_bake_cache(plan, props, occluder_meta, edits)
+        plan["seconds"] += time.perf_counter() - t0
+    yield 0.0
+
+    pending = [plan for plan in plans if len(plan["indices"])]
+    work = sum(len(plan["indices"]) for plan in pending)
+    if pending:
+        subsets = [plan["positions"][plan["indices"]] for plan in pending]
+        bounds = (np.min([sub.min(axis=0) for sub in subsets], axis=0),
+                  np.max([sub.max(axis=0) for sub in subsets], axis=0))
+        with profile_stage("构建求交结构"):
+            cast = make_ray_caster(context, props, depsgraph, bounds, occluders)
+        try:
+            done = 0
+            for plan in pending:
+                t0 = time.perf_counter()
+                sampler = make_sampler(props, len(plan["positions"]))
+                steps = profile_steps("AO射线", iter_plan_ao(cast, plan, props, sampler))
+                yield from scale_progress(steps, done / work, len(plan["indices"]) / work)
+                done += len(plan["indices"])
+                plan["seconds"] += time.perf_counter() - t0
+        finally:
+            cast.close()
+
+    for plan in plans:
+        t0 = time.perf_counter()
+        with profile_stage("混色写回"):
+            finish_bake_target(plan, props)
+        plan["seconds"] += time.perf_counter() - t0
+        summary.append({
+            "name": plan["obj"].name,
+            "vertices": len(plan["positions"]),
+            "seconds": plan["seconds"],
+            "rays": plan["rays"],
+            "recomputed": len(plan["indices"]),
+            "sampled": plan.get("sampled", 0),
+            "cache": plan["cache"],
+        })
+# endregion
+
+
+# region  "分块烘焙 (低内存)"
+# 每条射线在一个分块中的临时内存（起点、方向、局部空间副本、命中距离等），字节
+STREAM_BYTES_PER_RAY = 160
+# 分块的最小顶点数
+STREAM_MIN_WINDOW = 64
+
+
+def estimate_stream_memory(mesh, props):
+    """估计分块烘焙中与分块大小无关的常驻内存（字节）"""
+    vert_count = len(mesh.vertices)
+    # 坐标、法线、AO、描边 (float32) 与描边统计
+    fixed = vert_count * (12 + 12 + 4 + 4 + 16)
+    # 边的两端、每条边的前两个面、面数
+    fixed += len(mesh.edges) * 24
+    # 面法线 (float32)、loop_start、loop_total，以及整份 loop 的边索引
+    fixed += len(mesh.polygons) * 20 + len(mesh.loops) * 4
+    if props.output_layout != 'AO_ONLY':
+        fixed += vert_count * 16
+        if props.color_domain == 'CORNER':
+            fixed += len(mesh.loops) * 20
+    return fixed
+
+
+def stream_window_size(mesh, props):
+    """按内存上限计算每块的顶点数，上限不足以烘焙时抛出 RuntimeError"""
+    limit = props.memory_limit_mb * 1024 * 1024
+    fixed = estimate_stream_memory(mesh, props)
+    per_vertex = props.ao_samples * STREAM_BYTES_PER_RAY + 256
+    window = (limit - fixed) // per_vertex
+    if window < STREAM_MIN_WINDOW:
+        need = (fixed + STREAM_MIN_WINDOW * per_vertex) / (1024 * 1024)
+        raise RuntimeError(f"{mesh.name} 分块烘焙至少需要约 {need:.0f} MB，超过内存上限 {props.memory_limit_mb} MB")
+    return int(min(window, max(len(mesh.vertices), 1)))
+
+
+def compute_edge_strength_windowed(mesh, sharp_angle, window):
+    """compute_edge_strength 的低内存版本: 按面分块，不排序 loop，结果为 float32
+
+    每条边只记录相连的最小、最大面索引，恰好两个面的边即为这两个面
+    """
+    vert_count = len(mesh.vertices)
+    edge_count = len(mesh.edges)
+    if edge_count == 0:
+        return np.zeros(vert_count, dtype=np.float32)
+
+    face_count = len(mesh.polygons)
+    loop_edges = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("edge_index", loop_edges)
+    loop_starts = np.empty(face_count, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_starts)
+    loop_totals = np.empty(face_count, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    face_normals = np.empty(face_count * 3, dtype=np.float32)
+    mesh.polygon_normals.foreach_get("vector", face_normals)
+    face_normals = face_normals.reshape(-1, 3)
+
+    faces_per_edge = np.zeros(edge_count, dtype=np.int32)
+    first_face = np.full(edge_count, face_count, dtype=np.int32)
+    second_face = np.full(edge_count, -1, dtype=np.int32)
+    for start in range(0, face_count, window):
+        end = min(start + window, face_count)
+        faces = np.repeat(np.arange(start, end, dtype=np.int32), loop_totals[start:end])
+        if not len(faces):
+            continue
+        first_loop = loop_starts[start]
+        edges = loop_edges[first_loop:first_loop + len(faces)]
+        faces_per_edge += np.bincount(edges, minlength=edge_count).astype(np.int32)
+        np.minimum.at(first_face, edges, faces)
+        np.maximum.at(second_face, edges, faces)
+    del loop_edges
+
+    manifold = np.flatnonzero(faces_per_edge == 2)
+    n0 = face_normals[first_face[manifold]]
+    n1 = face_normals[second_face[manifold]]
+    lengths = np.linalg.norm(n0, axis=1) * np.linalg.norm(n1, axis=1)
+    valid = lengths > 1e-12
+    cos_angle = np.einsum('ij,ij->i', n0, n1) / np.where(valid, lengths, 1.0)
+    sharp_edges = manifold[valid & (cos_angle < np.cos(sharp_angle))]
+
+    edge_verts = np.empty(edge_count * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edge_verts)
+    edge_verts = edge_verts.reshape(-1, 2)
+    edges_per_vert = np.bincount(edge_verts.ravel(), minlength=vert_count)
+    sharp_per_vert = np.bincount(edge_verts[sharp_edges].ravel(), minlength=vert_count)
+    return np.divide(sharp_per_vert, edges_per_vert, out=np.zeros(vert_count, dtype=np.float32),
+                     where=edges_per_vert > 0, casting='unsafe')
+
+
+def write_stream_colors(mesh, props, ao, edge, window):
+    """逐块混色并写回，只分配一次输出缓冲区"""
+    if props.output_layout == 'AO_ONLY':
+        _write_point_values(mesh, props.color_layer_name, ao)
+        mesh.update()
+        return
+
+    vert_count = len(ao)
+    colors = np.empty((vert_count, 4), dtype=np.float32)
+    for start in range(0, vert_count, window):
+        end = min(start + window, vert_count)
+        colors[start:end] = blend_vertex_colors(ao[start:end], edge[start:end],
+                                                props.ao_strength, props.edge_strength)
+    if props.color_domain == 'CORNER':
+        loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loop_verts)
+        corner_colors = np.empty((len(loop_verts), 4), dtype=np.float32)
+        for start in range(0, len(loop_verts), window):
+            end = min(start + window, len(loop_verts))
+            corner_colors[start:end] = colors[loop_verts[start:end]]
+        del colors, loop_verts
+        colors = corner_colors
+
+    attr = ensure_color_attribute(mesh, props.color_layer_name, props.color_domain, props.color_type)
+    attr.data.foreach_set("color", colors.ravel())
+    mesh.update()
+
+
+def iter_bake_objects_stream(context, objects, props, summary, summary_counts):
+    """分块烘焙: 不构建 BMesh，也不把遮挡物几何体复制到 Python
+
+    坐标和法线一次读入预分配的 float32 缓冲区（RNA 的 foreach_get 只能整体读取），
+    世界空间变换、采样方向和射线缓冲区按块分配，块大小由内存上限决定。
+    只支持红底混色和仅AO输出；缓存、稀疏烘焙和平滑在该模式下不生效。
+    生成器: yield 进度 (0~1)；颜色在全部对象算完后才一起写入（每个对象只保留 AO 和描边两个数组），
+    中途取消时网格都不会被修改
+    """
+    if props.output_layout not in {'BLEND', 'AO_ONLY'}:
+        raise RuntimeError("分块模式只支持“红底混色”和“仅AO”输出")
+    windows = [stream_window_size(obj.data, props) for obj in objects]
+
+    depsgraph = context.evaluated_depsgraph_get()
+    regions = []
+    for obj in objects:
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        corners = np.array(obj.bound_box, dtype=np.float64) @ matrix[:3, :3].T + matrix[:3, 3]
+        regions.append((corners.min(axis=0), corners.max(axis=0)))
+    counts = {"kept": 0, "culled": 0}
+    with profile_stage("构建求交结构"):
+        cast = ObjectBVHRayCaster(depsgraph, props.ao_distance,
+                                  make_occluder_filter(props, objects, regions, counts))
+    summary_counts.update(counts)
+    yield 0.0
+
+    work = max(sum(len(obj.data.vertices) for obj in objects), 1)
+    done = 0
+    pending = []
+    try:
+        for obj, window in zip(objects, windows):
+            t0 = time.perf_counter()
+            mesh = obj.data
+            vert_count = len(mesh.vertices)
+            with profile_stage("读取顶点"):
+                co = np.empty(vert_count * 3, dtype=np.float32)
+                mesh.vertices.foreach_get("co", co)
+                co = co.reshape(-1, 3)
+                normals = np.empty(vert_count * 3, dtype=np.float32)
+                mesh.vertex_normals.foreach_get("vector", normals)
+                normals = normals.reshape(-1, 3)
+            with profile_stage("描边"):
+                edge = compute_edge_strength_windowed(mesh, np.radians(props.sharp_angle), window)
+
+            ao = np.ones(vert_count, dtype=np.float32)
+            rays = 0
+            for start in range(0, vert_count, window):
+                end = min(start + window, vert_count)
+                positions, world_normals = to_world_space(obj.matrix_world, co[start:end], normals[start:end])
+                sampler = make_sampler(props, end - start, start)
+                block = np.ones(end - start)
+                if props.use_adaptive:
+                    steps = iter_ao_values_adaptive(cast, positions, world_normals, sampler,
+                                                    props.adaptive_batch, props.adaptive_threshold, block)
+                else:
+                    steps = iter_ao_values(cast, positions, world_normals, sampler, block)
+                rays += yield from scale_progress(profile_steps("AO射线", steps),
+                                                  (done + start) / work, (end - start) / work)
+                ao[start:end] = block
+            del co, normals
+
+            done += vert_count
+            pending.append((mesh, ao, edge, window))
+            summary.append({
+                "name": obj.name,
+                "vertices": vert_count,
+                "seconds": time.perf_counter() - t0,
+                "rays": rays,
+                "recomputed": vert_count,
+                "sampled": vert_count,
+                "cache": 'OFF',
+            })
+    finally:
+        cast.close()
+
+    # 写回之间没有 yield，不会被取消打断
+    for item, (mesh, ao, edge, window) in zip(summary[-len(pending):], pending):
+        t0 = time.perf_counter()
+        with profile_stage("混色写回"):
+            write_stream_colors(mesh, props, ao, edge, window)
+        item["seconds"] += time.perf_counter() - t0
+# endregion
+
+
+# region  "高模→低模颜色传递"
+def read_surface_triangles(obj):
+    """读取对象原始网格的三角形: 返回世界空间顶点 (N,3)、三角形顶点索引 (T,3)、三角形的角索引 (T,3)"""
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+    co, normals = read_vertex_arrays(mesh)
+    positions, _ = to_world_space(obj.matrix_world, co, normals)
+    tri_count = len(mesh.loop_triangles)
+    tri_verts = np.empty(tri_count * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", tri_verts)
+    tri_loops = np.empty(tri_count * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("loops", tri_loops)
+    return positions, tri_verts.reshape(-1, 3), tri_loops.reshape(-1, 3)
+
+
+def triangle_corner_colors(mesh, color_layer, tri_verts, tri_loops):
+    """按颜色属性的域取出每个三角形三个角的颜色，返回 (T, 3, 4)"""
+    colors = np.empty(len(color_layer.data) * 4, dtype=np.float32)
+    color_layer.data.foreach_get("color", colors)
+    colors = colors.reshape(-1, 4)
+    return colors[tri_loops if color_layer.domain == 'CORNER' else tri_verts]
+
+
+def nearest_surface_points(bvh, points, max_distance=0.0):
+    """逐点查询最近表面，返回 (最近点 (N,3), 三角形索引 (N,))，超出距离的点三角形索引为 -1"""
+    locations = np.zeros((len(points), 3))
+    faces = np.full(len(points), -1, dtype=np.int64)
+    distance = max_distance if max_distance > 0 else 1.0e30
+    find_nearest = bvh.find_nearest
+    for i, point in enumerate(points.tolist()):
+        location, _, index, _ = find_nearest(point, distance)
+        if index is not None:
+            locations[i] = location
+            faces[i] = index
+    return locations, faces
+
+
+def barycentric_weights(points, a, b, c):
+    """批量计算点在三角形 (a, b, c) 上的重心坐标，返回 (N, 3)"""
+    e1 = b - a
+    e2 = c - a
+    rel = points - a
+    d11 = np.einsum('ij,ij->i', e1, e1)
+    d12 = np.einsum('ij,ij->i', e1, e2)
+    d22 = np.einsum('ij,ij->i', e2, e2)
+    r1 = np.einsum('ij,ij->i', rel, e1)
+    r2 = np.einsum('ij,ij->i', rel, e2)
+    denom = d11 * d22 - d12 * d12
+    # 退化三角形直接取第一个角
+    safe = np.abs(denom) > 1e-20
+    denom = np.where(safe, denom, 1.0)
+    v = np.where(safe, (d22 * r1 - d12 * r2) / denom, 0.0)
+    w = np.where(safe, (d11 * r2 - d12 * r1) / denom, 0.0)
+    weights = np.clip(np.stack([1.0 - v - w, v, w], axis=1), 0.0, 1.0)
+    return weights / np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+
+
+def transfer_vertex_colors(source, targets, layer_name, max_distance=0.0, domain='CORNER', data_type='FLOAT_COLOR'):
+    """把 source 上已烘焙的颜色层按最近表面 + 重心插值写到 targets
+
+    BVH 只构建一次；找不到表面的顶点（超出 max_distance）使用底色。目标颜色属性的域和类型由 domain、data_type 指定。
+    返回每个目标的 (名称, 顶点数, 未命中顶点数)，源对象缺少颜色层时返回 None
+    """
+    color_layer = source.data.color_attributes.get(layer_name)
+    if color_layer is None:
+        return None
+
+    positions, tri_verts, tri_loops = read_surface_triangles(source)
+    corner_colors = triangle_corner_colors(source.data, color_layer, tri_verts, tri_loops)
+    bvh = build_occluder_bvh(positions, tri_verts)
+    if bvh is None:
+        return None
+
+    results = []
+    for obj in targets:
+        mesh = obj.data
+        co, normals = read_vertex_arrays(mesh)
+        points, _ = to_world_space(obj.matrix_world, co, normals)
+        locations, faces = nearest_surface_points(bvh, points, max_distance)
+        hit = faces >= 0
+        colors = np.tile(np.array([1.0, 0.0, 0.0, 1.0], dtype=np.float32), (len(points), 1))
+        if hit.any():
+            tri = faces[hit]
+            corners = positions[tri_verts[tri]]
+            weights = barycentric_weights(locations[hit], corners[:, 0], corners[:, 1], corners[:, 2])
+            colors[hit] = np.einsum('ij,ijk->ik', weights, corner_colors[tri])
+        write_vertex_colors(mesh, layer_name, colors, domain, data_type)
+        # 颜色已被覆盖，旧的烘焙缓存不再对应当前颜色
+        if CACHE_META_KEY in mesh:
+            del mesh[CACHE_META_KEY]
+        results.append((obj.name, len(points), int(len(points) - hit.sum())))
+    return results
+# endregion
+
+
+# 进度条刷新的最小间隔（秒）
+PROGRESS_INTERVAL = 0.25
+
+
+def iter_bake_objects(context, objects, props, summary):
+    """按烘焙模式逐个或批量烘焙 objects，每 yield 一次进度 (0~1)
+
+    烘焙结束后更新 _bake_stats 并打印每个对象的用时
+    """
+    if objects and objects[0].mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+    start_time = time.perf_counter()
+    occluder_counts = {}
+
+    def finish():
+        update_bake_stats(summary, time.perf_counter() - start_time, props, occluder_counts)
+        print_bake_summary(props)
+
+    yield from iter_profiled(props, _iter_bake_modes(context, objects, props, summary, occluder_counts), finish)
+
+
+def _iter_bake_modes(context, objects, props, summary, occluder_counts):
+    """按 props.bake_mode 选择烘焙流程"""
+    if props.bake_mode == 'NUMPY':
+        yield from iter_bake_objects_numpy(context, objects, props, summary, occluder_counts)
+    elif props.bake_mode == 'STREAM':
+        yield from iter_bake_objects_stream(context, objects, props, summary, occluder_counts)
+    else:
+        # 每个对象的结果先留在各自的 BMesh 中，全部算完后才写回，取消时网格都不会被修改
+        results = []
+        try:
+            for i, obj in enumerate(objects):
+                t0 = time.perf_counter()
+                bm = bmesh.new()
+                results.append((obj, bm))
+                steps = iter_bake_vertex_colors_bmesh(context, obj, props, bm)
+                yield from scale_progress(steps, i / len(objects), 1.0 / len(objects))
+                summary.append({
+                    "name": obj.name,
+                    "vertices": len(obj.data.vertices),
+                    "seconds": time.perf_counter() - t0,
+                    "rays": len(obj.data.vertices) * props.ao_samples,
+                    "recomputed": len(obj.data.vertices),
+                    "sampled": len(obj.data.vertices),
+                    "cache": 'OFF',
+                })
+            for item, (obj, bm) in zip(summary[-len(results):], results):
+                t0 = time.perf_counter()
+                with profile_stage("混色写回"):
+                    write_bmesh_colors(bm, obj.data)
+                item["seconds"] += time.perf_counter() - t0
+        finally:
+            for _, bm in results:
+                bm.free()
+
+
+def update_bake_stats(summary, elapsed, props, occluder_counts, **extra):
+    """用每个对象的汇总更新 _bake_stats，extra 中的项原样写入"""
+    elapsed = max(elapsed, 1e-9)
+    vertices = sum(item["vertices"] for item in summary)
+    rays = sum(item["rays"] for item in summary)
+    recomputed = sum(item["recomputed"] for item in summary)
+    sampled = sum(item["sampled"] for item in summary)
+    _bake_stats.clear()
+    _bake_stats.update(
+        vertices=vertices,
+        seconds=elapsed,
+        rays=rays,
+        avg_rays=rays / max(recomputed, 1),
+        # 多通道输出时每条AO射线还会反向发射一条测厚度的射线
+        max_rays=props.ao_samples * (2 if props.bake_mode == 'NUMPY' and needs_extra_channels(props) else 1),
+        recomputed=recomputed,
+        sampled=sampled,
+        objects=list(summary),
+    )
+    if occluder_counts:
+        _bake_stats.update(occluders_kept=occluder_counts["kept"],
+                           occluders_culled=occluder_counts["culled"])
+    _bake_stats.update(extra)
+
+
+def print_bake_summary(props):
+    """在控制台打印上次烘焙的汇总和每个对象的用时"""
+    stats = _bake_stats
+    elapsed = max(stats["seconds"], 1e-9)
+    print(f"烘焙结束: {len(stats['objects'])} 个对象, {stats['vertices']} 个顶点, 用时 {elapsed:.2f}s, "
+          f"{stats['vertices'] / elapsed:.0f} 顶点/秒, 平均 {stats['avg_rays']:.1f} 射线/顶点 "
+          f"(AO引擎: {props.ao_engine}, 模式: {props.bake_mode})")
+    if 'frames' in stats:
+        print(f"  逐帧: {stats['frames']} 帧, {stats['frames_per_second']:.2f} 帧/秒")
+    if stats['sampled'] < stats['recomputed']:
+        print(f"  稀疏采样: {stats['recomputed']} 个重算顶点中实际发射射线 {stats['sampled']} 个")
+    if 'occluders_kept' in stats:
+        print(f"  遮挡物: 保留 {stats['occluders_kept']}, 剔除 {stats['occluders_culled']}")
+    for item in sorted(stats["objects"], key=lambda item: item["seconds"], reverse=True):
+        print(f"  {item['name']:<32} {item['vertices']:>9} 顶点  {item['seconds']:>8.2f}s  "
+              f"重算 {item['recomputed']:>9}  缓存: {item['cache']}")
+
+
+def run_bake_steps(context, steps):
+    """同步执行烘焙生成器，按固定频率刷新进度条"""
+    wm = context.window_manager
+    wm.progress_begin(0, 100)
+    last_update = 0.0
+    try:
+        for progress in steps:
+            now = time.perf_counter()
+            if now - last_update >= PROGRESS_INTERVAL:
+                wm.progress_update(int(progress * 100))
+                last_update = now
+    finally:
+        wm.progress_end()
+
+
+def bake_objects(context, objects, props):
+    """同步烘焙多个对象，返回每个对象的用时汇总"""
+    summary = []
+    run_bake_steps(context, iter_bake_objects(context, objects, props, summary))
+    return summary
 
+
+def bake_vertex_colors(context, obj, props):
+    """主烘焙函数（同步执行，单个对象）"""
+    return bake_objects(context, [obj], props)
+
+
+# region  "逐帧动画烘焙"
+def read_evaluated_vertices(obj, depsgraph):
+    """读取对象在当前帧求值后的顶点，返回 (世界坐标, 世界法线, 拓扑哈希)"""
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = obj_eval.to_mesh()
+    try:
+        co, normals = read_vertex_arrays(mesh)
+        loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loop_verts)
+        topology = hash_arrays(np.array([len(co)]), loop_verts)
+    finally:
+        obj_eval.to_mesh_clear()
+    positions, world_normals = to_world_space(obj_eval.matrix_world, co, normals)
+    return positions, world_normals, topology
+
+
+def animation_frame_range(scene, props):
+    """要烘焙的帧范围"""
+    if props.anim_use_scene_range:
+        return range(scene.frame_start, scene.frame_end + 1)
+    return range(props.anim_frame_start, max(props.anim_frame_start, props.anim_frame_end) + 1)
+
+
+def animation_file_path(props, obj, frames):
+    """逐帧AO文件路径: <目录>/<对象名>_<起始帧>_<结束帧>.npy"""
+    directory = bpy.path.abspath(props.anim_directory)
+    return os.path.join(directory, f"{bpy.path.clean_name(obj.name)}_{frames[0]}_{frames[-1]}.npy")
+
+
+def iter_bake_animation(context, objects, props, summary):
+    """逐帧烘焙 objects 的AO，按 props.use_profiling 记录性能，见 _iter_bake_animation_steps"""
+    steps = _iter_bake_animation_steps(context, objects, props, summary)
+    yield from iter_profiled(props, steps, lambda: print_bake_summary(props))
+
+
+def _iter_bake_animation_steps(context, objects, props, summary):
+    """逐帧烘焙 objects 的AO
+
+    每帧只重新读取求值后的顶点位置；拓扑（顶点数和面）必须保持不变。求交结构分两部分：
+    从第一帧起几何与变换都没变过的遮挡物只建一次，其余（变形或移动的目标和遮挡物）在它们变化的帧重建。
+    每帧仍要收集并哈希全部遮挡物。SCENE 引擎每帧重建。
+    结果: FILE 模式写 float16 的 (帧数, 顶点数) .npy（先写入 .part，完成后改名）；
+    ATTRIBUTES 模式在全部帧完成后写入每帧一个点属性。
+    生成器: 每帧 yield 进度 (0~1)，结束后恢复原来的当前帧并更新 _bake_stats
+    """
+    scene = context.scene
+    frames = animation_frame_range(scene, props)
+    original_frame = scene.frame_current
+    start_time = time.perf_counter()
+    channels = {obj.name: None for obj in objects}
+    topologies = {}
+    vert_counts = {}
+    samplers = {}
+    seconds = {obj.name: 0.0 for obj in objects}
+    rays = {obj.name: 0 for obj in objects}
+    sampled = {obj.name: 0 for obj in objects}
+    counts = {"kept": 0, "culled": 0}
+    cast = None
+    static_cast = dynamic_cast = None
+    static_keys = None
+    previous_digests = {}
+    previous_dynamic = set()
+    finished = False
+    try:
+        for frame_index, frame in enumerate(frames):
+            scene.frame_set(frame)
+            depsgraph = context.evaluated_depsgraph_get()
+
+            plans = []
+            for obj in objects:
+                t0 = time.perf_counter()
+                with profile_stage("读取顶点"):
+                    positions, normals, topology = read_evaluated_vertices(obj, depsgraph)
+                if topologies.setdefault(obj.name, topology) != topology:
+                    raise RuntimeError(f"{obj.name} 在第 {frame} 帧拓扑改变，无法逐帧烘焙")
+                if channels[obj.name] is None:
+                    if props.anim_output == 'ATTRIBUTES' and len(positions) != len(obj.data.vertices):
+                        raise RuntimeError(f"{obj.name} 的修改器改变了顶点数，只能输出到文件")
+                    if props.anim_output == 'FILE':
+                        path = animation_file_path(props, obj, frames)
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        channels[obj.name] = np.lib.format.open_memmap(
+                            path + ".part", mode='w+', dtype=np.float16, shape=(len(frames), len(positions)))
+                    else:
+                        channels[obj.name] = np.empty((len(frames), len(positions)), dtype=np.float16)
+                    samplers[obj.name] = make_sampler(props, len(positions))
+                    vert_counts[obj.name] = len(positions)
+                plan = {
+                    "obj": obj,
+                    "positions": positions,
+                    "normals": normals,
+                    "indices": np.arange(len(positions)),
+                    "ao": np.ones(len(positions)),
+                    "thickness": None,
+                    "bent": None,
+                }
+                plans.append(plan)
+                seconds[obj.name] += time.perf_counter() - t0
+
+            # 求交结构分为两部分: 从第一帧起一直没变的遮挡物只建一次，变化过的遮挡物在它们变化的帧重建
+            t0 = time.perf_counter()
+            regions = [(plan["positions"].min(axis=0), plan["positions"].max(axis=0))
+                       for plan in plans if len(plan["positions"])]
+            frame_counts = {"kept": 0, "culled": 0}
+            accept = make_occluder_filter(props, objects, regions, frame_counts)
+            bounds = None
+            if regions:
+                bounds = (np.min([r[0] for r in regions], axis=0), np.max([r[1] for r in regions], axis=0))
+            if props.ao_engine == 'SCENE':
+                if cast is not None:
+                    cast.close()
+                cast = make_ray_caster(context, props, depsgraph)
+            else:
+                records, ranges = [], []
+                with profile_stage("收集遮挡物"):
+                    verts, tris = gather_occluder_triangles(depsgraph, records, accept, ranges)
+                digests = {record[0]: record[1] for record in records}
+                changed = {key for key, digest in digests.items() if previous_digests.get(key) != digest}
+                if static_keys is None:
+                    static_keys = set(digests)
+                    rebuild_static = True
+                else:
+                    stale = (static_keys & changed) | (static_keys - digests.keys())
+                    static_keys -= stale
+                    rebuild_static = bool(stale)
+                dynamic_keys = digests.keys() - static_keys
+                rebuild_dynamic = bool(changed & dynamic_keys) or dynamic_keys != previous_dynamic
+                with profile_stage("构建求交结构"):
+                    if rebuild_static:
+                        if static_cast is not None:
+                            static_cast.close()
+                        # 静态部分跨帧复用，目标可能移动，不按当前帧的目标范围裁剪
+                        static_cast = make_ray_caster(context, props, depsgraph, None,
+                                                      select_occluders(verts, tris, records, ranges, static_keys))
+                    if rebuild_dynamic:
+                        if dynamic_cast is not None:
+                            dynamic_cast.close()
+                        dynamic_cast = None
+                        if dynamic_keys:
+                            dynamic_cast = make_ray_caster(context, props, depsgraph, bounds,
+                                                           select_occluders(verts, tris, records, ranges, dynamic_keys))
+                del verts, tris
+                previous_digests = digests
+                previous_dynamic = dynamic_keys
+                cast = CombinedRayCaster([static_cast, dynamic_cast])
+            counts = frame_counts
+            build_time = (time.perf_counter() - t0) / len(plans)
+
+            for i, plan in enumerate(plans):
+                t0 = time.perf_counter()
+                name = plan["obj"].name
+                steps = profile_steps("AO射线", iter_plan_ao(cast, plan, props, samplers[name]))
+                yield from scale_progress(steps, (frame_index + i / len(plans)) / len(frames),
+                                          1.0 / (len(frames) * len(plans)))
+                channels[name][frame_index] = plan["ao"]
+                rays[name] += plan["rays"]
+                sampled[name] += plan["sampled"]
+                seconds[name] += time.perf_counter() - t0 + build_time
+
+        for obj in objects:
+            t0 = time.perf_counter()
+            with profile_stage("写出结果"):
+                values = channels[obj.name]
+                if props.anim_output == 'FILE':
+                    path = animation_file_path(props, obj, frames)
+                    values.flush()
+                    del values
+                    channels[obj.name] = None
+                    os.replace(path + ".part", path)
+                else:
+                    for frame_index, frame in enumerate(frames):
+                        _write_point_values(obj.data, f"{props.color_layer_name}_AO_{frame:04d}", values[frame_index])
+                    obj.data.update()
+            seconds[obj.name] += time.perf_counter() - t0
+        finished = True
+    finally:
+        for caster in (cast, static_cast, dynamic_cast):
+            if caster is not None:
+                caster.close()
+        if not finished and props.anim_output == 'FILE':
+            # 取消或出错时删除未完成的文件
+            for obj in objects:
+                if channels.get(obj.name) is not None:
+                    channels[obj.name] = None
+                    path = animation_file_path(props, obj, frames) + ".part"
+                    if os.path.exists(path):
+                        os.remove(path)
+        scene.frame_set(original_frame)
+
+    frame_count = len(frames)
+    for obj in objects:
+        vertices = vert_counts.get(obj.name, 0)
+        summary.append({
+            "name": obj.name,
+            "vertices": vertices * frame_count,
+            "seconds": seconds[obj.name],
+            "rays": rays[obj.name],
+            "recomputed": vertices * frame_count,
+            "sampled": sampled[obj.name],
+            "cache": 'OFF',
+        })
+    elapsed = time.perf_counter() - start_time
+    update_bake_stats(summary, elapsed, props, counts,
+                      frames=frame_count, frames_per_second=frame_count / max(elapsed, 1e-9))
+# endregion
+
+
+def iter_bake_vertex_colors_bmesh(context, obj, props, bm=None):
+    """逐顶点的 BMesh 烘焙（旧方式）
+
+    生成器: 每处理一批顶点 yield 一次进度 (0~1)；中途关闭时释放 BMesh，不修改网格。
+    传入 bm 时结果只写入 bm，由调用方用 write_bmesh_colors 写回网格并释放
+    """
     # 确保在编辑模式前切换到对象模式
     if obj.mode != 'OBJECT':
         bpy.ops.object.mode_set(mode='OBJECT')
 
+    if bm is not None:
+        yield from _bake_bmesh_steps(context, obj, props, bm)
+        return
     # 创建BMesh实例
     bm = bmesh.new()
-    bm.from_mesh(mesh)
-    bm.verts.ensure_lookup_table()
-    bm.edges.ensure_lookup_table()
-    bm.faces.ensure_lookup_table()
+    try:
+        yield from _bake_bmesh_steps(context, obj, props, bm)
+        with profile_stage("混色写回"):
+            write_bmesh_colors(bm, obj.data)
+    finally:
+        bm.free()
+
+
+def write_bmesh_colors(bm, mesh):
+    """把烘焙完的 BMesh 应用回网格"""
+    bm.to_mesh(mesh)
+    mesh.update()
+
+
+def _bake_bmesh_steps(context, obj, props, bm):
+    """BMesh 烘焙的具体步骤，bm 由调用方创建和释放"""
+    mesh = obj.data
+    with profile_stage("BMesh复制"):
+        bm.from_mesh(mesh)
+        bm.verts.ensure_lookup_table()
+        bm.edges.ensure_lookup_table()
+        bm.faces.ensure_lookup_table()
 
     # 获取或创建颜色层
     color_layer = bm.loops.layers.color.get(props.color_layer_name)
     if not color_layer:
         color_layer = bm.loops.layers.color.new(props.color_layer_name)
 
-    # 计算边角度
-    edge_angles = {}
-    for edge in bm.edges:
-        if len(edge.link_faces) == 2:
-            try:
-                angle = edge.link_faces[0].normal.angle(
-                    edge.link_faces[1].normal)
-                edge_angles[edge.index] = angle
-            except ValueError:
-                edge_angles[edge.index] = 0.0
-
-    # 顶点边映射
-    vertex_edges = {}
-    for edge in bm.edges:
-        for v in edge.verts:
-            vertex_edges.setdefault(v.index, []).append(edge)
+    with profile_stage("描边"):
+        # 计算边角度
+        edge_angles = {}
+        for edge in bm.edges:
+            if len(edge.link_faces) == 2:
+                try:
+                    angle = edge.link_faces[0].normal.angle(
+                        edge.link_faces[1].normal)
+                    edge_angles[edge.index] = angle
+                except ValueError:
+                    edge_angles[edge.index] = 0.0
+
+        # 顶点边映射
+        vertex_edges = {}
+        for edge in bm.edges:
+            for v in edge.verts:
+                vertex_edges.setdefault(v.index, []).append(edge)
 
     sharp_angle = np.radians(props.sharp_angle)
     matrix_world = obj.matrix_world
 
+    # 求值依赖图和遮挡BVH在整个烘焙过程中只获取/构建一次
+    start_time = time.perf_counter()
+    depsgraph = context.evaluated_depsgraph_get()
+    bvh = None
+    # 多进程引擎只用于向量化模式，BMesh 模式下退回 BVH
+    if props.ao_engine != 'SCENE':
+        with profile_stage("收集遮挡物"):
+            occluders = gather_occluder_triangles(depsgraph)
+        with profile_stage("构建求交结构"):
+            bvh = build_occluder_bvh(*occluders)
+        print(f"遮挡BVH构建用时: {time.perf_counter() - start_time:.2f}s")
+
     # 获取总顶点数（在循环前计算）
     total_vertices = len(bm.verts)
-    
+    yield_every = max(1, 4096 // props.ao_samples)
+
     # 计算每个顶点的数据
     for vert in bm.verts:
+        if vert.index % yield_every == 0:
+            yield vert.index / max(total_vertices, 1)
+
         world_pos = matrix_world @ vert.co
         world_normal = (matrix_world.to_3x3() @ vert.normal).normalized()
 
@@ -225,13 +2939,17 @@ def bake_vertex_colors(context, obj, props):
                 len(vertex_edges.get(vert.index, []))
 
         # 计算AO值
+        ao_start = time.perf_counter()
         ao_val = calculate_ao_for_vertex_world(
             context, obj, world_pos, world_normal,
             samples=props.ao_samples, 
             distance=props.ao_distance,
-            vertex_index=vert.index,  # Pass the index number instead of the BMVert object
-            total_vertices=total_vertices
+            depsgraph=depsgraph,
+            bvh=bvh,
+            use_bvh=props.ao_engine != 'SCENE'
         )
+        if _profiler is not None:
+            _profiler.add("AO射线", time.perf_counter() - ao_start)
 
         # 应用到所有关联的loop
         for face in vert.link_faces:
@@ -260,74 +2978,103 @@ def bake_vertex_colors(context, obj, props):
 
                     loop[color_layer] = (*final_color, 1.0)
 
-    # 应用回网格
-    bm.to_mesh(mesh)
-    bm.free()
-    mesh.update()
-
-    print(f"\n烘焙结束")
+    elapsed = max(time.perf_counter() - start_time, 1e-9)
+    print(f"烘焙结束: {total_vertices} 个顶点, 用时 {elapsed:.2f}s, "
+          f"{total_vertices / elapsed:.0f} 顶点/秒 (AO引擎: {props.ao_engine})")
     # 添加模糊效果
-    # blur_vertex_colors(mesh, props.color_layer_name, iterations=props.blurIerations)
+    if props.blur_iterations > 0:
+        blur_vertex_colors(mesh, props.color_layer_name, iterations=props.blur_iterations)
 
 
 def calculate_ao_for_vertex_world(context, obj, vert_world_pos, vert_normal, 
                                 samples=32, distance=1.0, 
-                                vertex_index=0, total_vertices=1):
+                                depsgraph=None, bvh=None, use_bvh=False):
     ao = 0.0
-    depsgraph = context.evaluated_depsgraph_get()
+    # depsgraph 应由调用方获取一次后传入，这里仅作兼容
+    if depsgraph is None:
+        depsgraph = context.evaluated_depsgraph_get()
     #obj_eval = obj.evaluated_get(depsgraph)
-    
-    # 初始化进度（存储到 window_manager）
-    if vertex_index == 0:
-        context.window_manager.progress_begin(0, 100)  # 替代 bpy.ops.wm.progress_begin
 
     for i in range(samples):
         sample_dir = vert_normal + Vector(np.random.uniform(-1, 1, 3))
         sample_dir.normalize()
         origin = vert_world_pos + vert_normal * 0.01
-        hit, *_ = context.scene.ray_cast(depsgraph, origin, sample_dir, distance=distance)
+        if use_bvh:
+            # 场景中没有遮挡几何体时 bvh 为 None，所有射线都未命中
+            hit = bvh is not None and bvh.ray_cast(origin, sample_dir, distance)[0] is not None
+        else:
+            hit, *_ = context.scene.ray_cast(depsgraph, origin, sample_dir, distance=distance)
         if hit:
             ao += 1.0
-            
-    # 只在每个顶点完成后更新一次进度（避免频繁更新）
-    vertex_progress = (vertex_index + 1) / total_vertices * 100  # +1 确保从 1% 开始
-    vertex_progress_int = int(vertex_progress)  # 转为整数（直接截断小数部分）
-    print(f"整体烘焙进度: {vertex_progress_int}%", end="\r")
-    #vertex_progress = min(100, vertex_progress)  # 确保不超过 100%
-    context.window_manager.progress_update(vertex_progress_int)
-
-    # 仅在最后一个顶点完成时结束进度条
-    if vertex_index == total_vertices - 1:
-        context.window_manager.progress_end()
-    
+
     return 1.0 - (ao / samples)
 
+
+# 模态烘焙每次计时器触发时最多占用的时间（秒）
+MODAL_TIME_BUDGET = 0.1
+
+
+def switch_viewport_to_vertex_colors():
+    """3D视图切换为 平面光照 + 属性颜色"""
+    for area in bpy.context.screen.areas:
+        if area.type == 'VIEW_3D':
+            for space in area.spaces:
+                if space.type == 'VIEW_3D':
+                    space.shading.light = 'FLAT'
+                    space.shading.color_type = 'VERTEX'
+
+
 class OBJECT_OT_bake_ao_edge_vertex_colors(Operator):
     bl_idname = "object.bake_ao_edge_vertex_colors"
     bl_label = "!!!烘焙!!!"
     bl_options = {'REGISTER', 'UNDO'}
-    bl_description = "将AO和描边信息烘焙到顶点色"
+    bl_description = "将AO和描边信息烘焙到所有选中网格的顶点色（从面板点击时在后台分块执行，Esc 取消）"
+
+    _timer = None
+    _steps = None
 
     @classmethod
     def poll(cls, context):
-        return context.active_object and context.active_object.type == 'MESH'
+        return ((context.active_object and context.active_object.type == 'MESH')
+                or any(obj.type == 'MESH' for obj in context.selected_objects))
+
+    def _collect_targets(self, context):
+        """选中的网格（没有选中时用活动对象），共享网格数据的对象去重"""
+        objects = [obj for obj in context.selected_objects if obj.type == 'MESH']
+        if not objects and context.active_object and context.active_object.type == 'MESH':
+            objects = [context.active_object]
+        targets, skipped, conflicts = dedupe_bake_targets(objects)
+        if skipped:
+            print(f"共享网格数据，跳过 {len(skipped)} 个对象: {', '.join(o.name for o in skipped)}")
+        if conflicts:
+            self.report({'WARNING'}, f"以下网格被多个不同变换的对象共用，只按第一个对象烘焙: {', '.join(conflicts)}")
+        return targets
+
+    def _report_done(self, summary):
+        seconds = sum(item["seconds"] for item in summary)
+        self.report({'INFO'}, f"烘焙完成!! {len(summary)} 个对象, 用时 {seconds:.2f}s, 查找颜色属性")
+
+    def _report_cancelled(self, reason):
+        """各烘焙模式都在全部对象算完后才一起写回（写回期间不会 yield），所以取消时网格都没有被修改"""
+        self.report({'WARNING'}, f"{reason}，网格未修改")
+
+    def _make_steps(self, context, props):
+        """创建烘焙生成器，结果汇总写入 self._summary"""
+        return iter_bake_objects(context, self._objects, props, self._summary)
 
     def execute(self, context):
         
         props = context.scene.vertex_color_baker_props
         # 获取3D视图并设置着色模式
         if props.autoJump:
-            for area in bpy.context.screen.areas:
-                if area.type == 'VIEW_3D':
-                    for space in area.spaces:
-                        if space.type == 'VIEW_3D':
-                            space.shading.light = 'FLAT'
-                            space.shading.color_type = 'VERTEX'
+            switch_viewport_to_vertex_colors()
 
         try:
-            bake_vertex_colors(context, context.active_object, props)
-            
-            self.report({'INFO'}, "烘焙完成!!查找颜色属性")
+            self._objects = self._collect_targets(context)
+            self._summary = []
+            run_bake_steps(context, self._make_steps(context, props))
+
+            self._report_done(self._summary)
             return {'FINISHED'}
         except Exception as e:
             self.report({'ERROR'}, f"报错: {str(e)}")
@@ -335,6 +3082,132 @@ class OBJECT_OT_bake_ao_edge_vertex_colors(Operator):
             return {'CANCELLED'}
             # return {'FINISHED'}
 
+    def invoke(self, context, event):
+        """以模态方式启动: 计时器驱动分块烘焙，界面保持响应"""
+        props = context.scene.vertex_color_baker_props
+        self._objects = self._collect_targets(context)
+        self._summary = []
+        try:
+            self._steps = self._make_steps(context, props)
+        except Exception as e:
+            self.report({'ERROR'}, f"报错: {str(e)}")
+            return {'CANCELLED'}
+
+        wm = context.window_manager
+        self._last_update = 0.0
+        wm.progress_begin(0, 100)
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self._finish(context, cancel=True)
+            self._report_cancelled("烘焙已取消")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        # 烘焙对象被删除或进入编辑模式时放弃本次烘焙
+        try:
+            valid = all(obj.mode == 'OBJECT' for obj in self._objects)
+        except ReferenceError:
+            valid = False
+        if not valid:
+            self._finish(context, cancel=True)
+            self._report_cancelled("烘焙对象已改变，烘焙已取消")
+            return {'CANCELLED'}
+
+        deadline = time.perf_counter() + MODAL_TIME_BUDGET
+        progress = None
+        try:
+            while time.perf_counter() < deadline:
+                progress = next(self._steps)
+        except StopIteration:
+            self._finish(context)
+            if context.scene.vertex_color_baker_props.autoJump:
+                switch_viewport_to_vertex_colors()
+            self._report_done(self._summary)
+            return {'FINISHED'}
+        except Exception as e:
+            self._finish(context, cancel=True)
+            self.report({'ERROR'}, f"报错: {str(e)}")
+            return {'CANCELLED'}
+
+        # 进度条按固定频率刷新
+        now = time.perf_counter()
+        if progress is not None and now - self._last_update >= PROGRESS_INTERVAL:
+            context.window_manager.progress_update(int(progress * 100))
+            context.workspace.status_text_set(f"顶点色烘焙中: {progress * 100:.0f}%  (Esc 取消)")
+            self._last_update = now
+        return {'RUNNING_MODAL'}
+
+    def _finish(self, context, cancel=False):
+        """移除计时器并结束进度条；取消时关闭生成器，由其 finally 释放资源"""
+        wm = context.window_manager
+        if self._timer is not None:
+            wm.event_timer_remove(self._timer)
+            self._timer = None
+        if cancel and self._steps is not None:
+            self._steps.close()
+        self._steps = None
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+
+class OBJECT_OT_bake_ao_animation(OBJECT_OT_bake_ao_edge_vertex_colors):
+    bl_idname = "object.bake_ao_animation"
+    bl_label = "逐帧烘焙AO"
+    bl_options = {'REGISTER'}
+    bl_description = "在帧范围内逐帧烘焙选中网格的AO（拓扑须不变），结果写入 float16 文件或每帧一个点属性（Esc 取消）"
+
+    def _report_done(self, summary):
+        stats = _bake_stats
+        self.report({'INFO'}, f"逐帧烘焙完成!! {len(summary)} 个对象, {stats['frames']} 帧, "
+                              f"{stats['frames_per_second']:.2f} 帧/秒")
+
+    def _make_steps(self, context, props):
+        if props.anim_output == 'FILE' and props.anim_directory.startswith("//") and not bpy.data.filepath:
+            raise RuntimeError("请先保存 .blend 文件，或为逐帧AO设置绝对目录")
+        return iter_bake_animation(context, self._objects, props, self._summary)
+
+
+# 红黑→灰度: 红色通道复制到 RGB
+RED_TO_GRAY = np.array([
+    [1.0, 1.0, 1.0],
+    [0.0, 0.0, 0.0],
+    [0.0, 0.0, 0.0],
+])
+# 灰度→红黑: 亮度（CIE 标准权重）写入红色通道
+GRAY_TO_RED = np.array([
+    [0.299, 0.0, 0.0],
+    [0.587, 0.0, 0.0],
+    [0.114, 0.0, 0.0],
+])
+
+
+def toggle_vertex_color_blackwhite(mesh, color_layer_name):
+    """在红黑与灰度之间切换颜色层，一次读取、一次矩阵乘法、一次写回
+
+    G、B 通道全部不超过 0.01 视为红黑模式，转换为灰度，否则转换为红黑。
+    返回转换后的模式 'GRAY' / 'RED'，找不到颜色层时返回 None
+    """
+    color_layer = mesh.color_attributes.get(color_layer_name)
+    if color_layer is None:
+        return None
+
+    colors = np.empty(len(color_layer.data) * 4, dtype=np.float32)
+    color_layer.data.foreach_get("color", colors)
+    colors = colors.reshape(-1, 4)
+
+    is_red_black = not np.any(colors[:, 1:3] > 0.01)
+    colors[:, :3] = colors[:, :3] @ (RED_TO_GRAY if is_red_black else GRAY_TO_RED)
+    colors[:, 3] = 1.0
+    color_layer.data.foreach_set("color", colors.ravel())
+    mesh.update()
+    return 'GRAY' if is_red_black else 'RED'
+
 
 class OBJECT_OT_convert_vertex_color_blackwhite(Operator):
     bl_idname = "object.convert_vertex_color_blackwhite"
@@ -349,52 +3222,113 @@ class OBJECT_OT_convert_vertex_color_blackwhite(Operator):
         if bpy.context.active_object and bpy.context.active_object.mode != 'OBJECT':
             bpy.ops.object.mode_set(mode='OBJECT')
 
+        # 每个对象独立判断当前模式，共享网格的对象只转换一次
+        modes = {}
+        missing = []
+        converted = set()
         for obj in context.selected_objects:
-            if obj.type != 'MESH':
+            if obj.type != 'MESH' or obj.data in converted:
                 continue
+            converted.add(obj.data)
+            mode = toggle_vertex_color_blackwhite(obj.data, props.color_layer_name)
+            if mode is None:
+                missing.append(obj.name)
+            else:
+                modes[obj.name] = mode
+
+        if missing:
+            self.report({'WARNING'}, f"找不到颜色层 {props.color_layer_name}: {', '.join(missing)}")
+        if not modes:
+            return {'CANCELLED'}
+
+        gray = sum(1 for mode in modes.values() if mode == 'GRAY')
+        if len(modes) == 1:
+            self.report({'INFO'}, f"已转换为{'灰度' if gray else '红黑'}模式")
+        else:
+            self.report({'INFO'}, f"已转换 {len(modes)} 个对象: 灰度 {gray} 个, 红黑 {len(modes) - gray} 个")
+        return {'FINISHED'}
 
-            # 关键修改1：使用BMesh确保获取最新颜色数据
-            bm = bmesh.new()
-            bm.from_mesh(obj.data)
-            color_layer = bm.loops.layers.color.get(props.color_layer_name)
 
-            if not color_layer:
-                self.report({'WARNING'}, f"找不到颜色层: {props.color_layer_name}")
-                bm.free()
+class OBJECT_OT_blur_vertex_colors(Operator):
+    bl_idname = "object.blur_vertex_colors"
+    bl_label = "顶点色模糊"
+    bl_description = "对选中对象的颜色层做邻域平均模糊"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    iterations: bpy.props.IntProperty(
+        name="迭代次数",
+        default=1,
+        min=1,
+        max=100,
+    )
+
+    def execute(self, context):
+        props = context.scene.vertex_color_baker_props
+
+        if context.active_object and context.active_object.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+
+        count = 0
+        for obj in context.selected_objects:
+            if obj.type != 'MESH':
                 continue
+            if blur_vertex_colors(obj.data, props.color_layer_name, self.iterations):
+                count += 1
 
-            # 关键修改2：全新的智能颜色转换逻辑
-            is_red_black = True  # 先检测当前模式
-
-            for face in bm.faces:
-                for loop in face.loops:
-                    r, g, b = loop[color_layer][0], loop[color_layer][1], loop[color_layer][2]
-                    if g > 0.01 or b > 0.01:  # 如果发现非红黑色
-                        is_red_black = False
-                        break
-                if not is_red_black:
-                    break
-
-            # 执行转换
-            for face in bm.faces:
-                for loop in face.loops:
-                    if is_red_black:
-                        # 红黑→灰度：取红色通道作为灰度值
-                        gray = loop[color_layer][0]
-                        loop[color_layer] = (gray, gray, gray, 1.0)
-                    else:
-                        # 灰度→红黑：取亮度作为红色通道
-                        r, g, b = loop[color_layer][0], loop[color_layer][1], loop[color_layer][2]
-                        # 使用更精确的亮度转换（CIE标准）
-                        brightness = 0.299 * r + 0.587 * g + 0.114 * b
-                        loop[color_layer] = (brightness, 0.0, 0.0, 1.0)
-
-            # 关键修改3：确保数据写回
-            bm.to_mesh(obj.data)
-            bm.free()
-            obj.data.update()  # 强制更新显示
-
-        self.report({'INFO'}, f"已转换为{'灰度' if is_red_black else '红黑'}模式")
+        if count == 0:
+            self.report({'WARNING'}, f"找不到颜色层: {props.color_layer_name}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"已模糊 {count} 个对象的顶点色")
+        return {'FINISHED'}
+
+
+class OBJECT_OT_transfer_vertex_colors(Operator):
+    bl_idname = "object.transfer_vertex_colors"
+    bl_label = "传递顶点色到低模"
+    bl_description = "把活动对象（已烘焙的高模）的颜色层按最近表面插值传递到其他选中的网格（如各级LOD）"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    max_distance: bpy.props.FloatProperty(
+        name="最大距离",
+        default=0.0,
+        min=0.0,
+        description="超过该距离找不到高模表面的顶点使用底色，0 表示不限制"
+    )
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return (obj is not None and obj.type == 'MESH'
+                and any(o.type == 'MESH' and o != obj for o in context.selected_objects))
+
+    def execute(self, context):
+        props = context.scene.vertex_color_baker_props
+        source = context.active_object
+        if source.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+
+        # 共享网格的目标只写一次，也不能写回源网格本身
+        targets, _, _ = dedupe_bake_targets(
+            [o for o in context.selected_objects if o.type == 'MESH' and o.data != source.data])
+        if not targets:
+            self.report({'WARNING'}, "没有可传递的目标网格")
+            return {'CANCELLED'}
+
+        t0 = time.perf_counter()
+        results = transfer_vertex_colors(source, targets, props.color_layer_name, self.max_distance,
+                                         props.color_domain, props.color_type)
+        if results is None:
+            self.report({'ERROR'}, f"源对象缺少颜色层或几何体: {props.color_layer_name}")
+            return {'CANCELLED'}
+
+        elapsed = time.perf_counter() - t0
+        for name, count, missed in results:
+            print(f"  传递到 {name:<32} {count:>9} 顶点  未命中 {missed}")
+        missed = sum(item[2] for item in results)
+        message = f"已传递到 {len(results)} 个对象，用时 {elapsed:.2f}s"
+        if missed:
+            message += f"，{missed} 个顶点超出最大距离"
+        self.report({'INFO'}, message)
         return {'FINISHED'}
 
 
@@ -402,6 +3336,9 @@ def register():
     bpy.utils.register_class(VertexColorBakerProps)
     bpy.utils.register_class(OBJECT_OT_convert_vertex_color_blackwhite)
     bpy.utils.register_class(OBJECT_OT_bake_ao_edge_vertex_colors)
+    bpy.utils.register_class(OBJECT_OT_bake_ao_animation)
+    bpy.utils.register_class(OBJECT_OT_blur_vertex_colors)
+    bpy.utils.register_class(OBJECT_OT_transfer_vertex_colors)
     bpy.utils.register_class(BAKETOOLS_PT_vertex_color_baker)
     bpy.types.Scene.vertex_color_baker_props = bpy.props.PointerProperty(
         type=VertexColorBakerProps)
@@ -409,8 +3346,11 @@ def register():
 
 def unregister():
     bpy.utils.unregister_class(VertexColorBakerProps)
-    bpy.utils.register_class(OBJECT_OT_convert_vertex_color_blackwhite)
+    bpy.utils.unregister_class(OBJECT_OT_convert_vertex_color_blackwhite)
     bpy.utils.unregister_class(OBJECT_OT_bake_ao_edge_vertex_colors)
+    bpy.utils.unregister_class(OBJECT_OT_bake_ao_animation)
+    bpy.utils.unregister_class(OBJECT_OT_blur_vertex_colors)
+    bpy.utils.unregister_class(OBJECT_OT_transfer_vertex_colors)
     bpy.utils.unregister_class(BAKETOOLS_PT_vertex_color_baker)
     del bpy.types.Scene.vertex_color_baker_props
 
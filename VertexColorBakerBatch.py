@@ -0,0 +1,337 @@
+"""顶点色批量烘焙（命令行，无界面）
+
+在农场机器上用后台 Blender 批量烘焙 .blend / .glb 文件:
+
+    blender -b --python VertexColorBakerBatch.py -- --input <目录或清单.json> --output <输出目录> [选项]
+
+也可以直接用系统 Python 运行调度部分（需要 --blender 指定 Blender 可执行文件）:
+
+    python VertexColorBakerBatch.py --input scenes/ --output baked/ --workers 8 --blender /opt/blender/blender
+
+选项:
+    --settings settings.json   烘焙参数，键与 VertexColorBakerProps 的属性名相同
+    --set ao_samples=32        单独覆盖某个参数，可重复
+    --workers N                同时运行的后台 Blender 进程数，默认 CPU 核数
+    --report report.json       报告路径，默认 <输出目录>/bake_report.json
+    --timeout 秒               单个文件的超时时间
+    --force                    忽略已有结果，全部重新烘焙
+
+清单为 JSON 列表，元素是输入路径字符串或 {"input": ..., "output": ...}，相对路径相对清单所在目录。
+每个输出文件旁会写一个 <输出>.vcb.json，记录输入文件哈希和参数哈希；再次运行时两者都相同的文件会被跳过，
+因此中断后直接重跑同一条命令即可继续。
+"""
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import argparse
+import tempfile
+import hashlib
+import json
+import time
+import sys
+import os
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+# 支持的输入格式
+INPUT_EXTENSIONS = {".blend", ".glb", ".gltf"}
+# 结果旁的状态文件后缀
+STATE_SUFFIX = ".vcb.json"
+# 失败时报告中保留的日志行数
+LOG_TAIL_LINES = 40
+
+
+def script_arguments(argv):
+    """取出 "--" 之后的参数；直接用 Python 运行时取全部参数"""
+    if "--" in argv:
+        return argv[argv.index("--") + 1:]
+    return [] if bpy is not None else argv[1:]
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(prog="VertexColorBakerBatch.py", description="顶点色批量烘焙")
+    parser.add_argument("--input", help="输入目录或清单 JSON")
+    parser.add_argument("--output", help="输出目录")
+    parser.add_argument("--settings", help="烘焙参数 JSON 文件")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="覆盖单个烘焙参数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="后台 Blender 进程数")
+    parser.add_argument("--blender", help="Blender 可执行文件，默认使用当前运行的 Blender")
+    parser.add_argument("--report", help="报告 JSON 路径")
+    parser.add_argument("--timeout", type=float, default=None, help="单个文件的超时时间（秒）")
+    parser.add_argument("--force", action="store_true", help="忽略已有结果")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def load_settings(args):
+    """合并参数文件和 --set 覆盖项，值按 JSON 解析，解析失败时当作字符串"""
+    settings = {}
+    if args.settings:
+        with open(args.settings, encoding="utf-8") as f:
+            settings.update(json.load(f))
+    for item in args.set:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"--set 参数格式应为 KEY=VALUE: {item}")
+        try:
+            settings[key] = json.loads(value)
+        except ValueError:
+            settings[key] = value
+    # 无界面时不需要切换视口
+    settings["autoJump"] = False
+    return settings
+
+
+def hash_settings(settings):
+    return hashlib.blake2b(json.dumps(settings, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def collect_jobs(input_path, output_dir):
+    """返回 [(输入路径, 输出路径)]；目录会递归查找，输出保持相对目录结构"""
+    input_path = os.path.abspath(input_path)
+    output_dir = os.path.abspath(output_dir)
+    jobs = []
+    if os.path.isdir(input_path):
+        for root, _dirs, files in os.walk(input_path):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in INPUT_EXTENSIONS:
+                    source = os.path.join(root, name)
+                    relative = os.path.relpath(source, input_path)
+                    jobs.append((source, os.path.join(output_dir, relative)))
+        return sorted(jobs)
+
+    base = os.path.dirname(input_path)
+    with open(input_path, encoding="utf-8") as f:
+        entries = json.load(f)
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"input": entry}
+        source = os.path.join(base, entry["input"])
+        target = entry.get("output") or os.path.basename(source)
+        jobs.append((os.path.abspath(source), os.path.join(output_dir, target)))
+    return jobs
+
+
+def output_path_for(source, target):
+    """.gltf 输入导出为 .glb，其余保持原格式"""
+    root, ext = os.path.splitext(target)
+    return root + ".glb" if ext.lower() == ".gltf" else target
+
+
+def is_up_to_date(target, input_hash, settings_hash):
+    """输出存在且状态文件中的输入哈希、参数哈希都相同"""
+    if not os.path.exists(target):
+        return False
+    try:
+        with open(target + STATE_SUFFIX, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return state.get("input_hash") == input_hash and state.get("settings_hash") == settings_hash
+
+
+def run_job(blender, script, source, target, settings, settings_hash, timeout, force):
+    """在一个后台 Blender 进程中烘焙一个文件，返回报告条目"""
+    entry = {"input": source, "output": target, "status": "failed", "seconds": 0.0}
+    try:
+        input_hash = hash_file(source)
+    except OSError as e:
+        entry["error"] = f"无法读取输入: {e}"
+        return entry
+    if not force and is_up_to_date(target, input_hash, settings_hash):
+        entry["status"] = "skipped"
+        return entry
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="vcb_batch_") as tmp:
+        job_path = os.path.join(tmp, "job.json")
+        result_path = os.path.join(tmp, "result.json")
+        with open(job_path, "w", encoding="utf-8") as f:
+            json.dump({"input": source, "output": target, "settings": settings, "result": result_path}, f)
+
+        command = [blender, "-b"]
+        if source.lower().endswith(".blend"):
+            command.append(source)
+        else:
+            command.append("--factory-startup")
+        command += ["--python-exit-code", "1", "--python", script, "--", "--worker", job_path]
+
+        t0 = time.perf_counter()
+        try:
+            process = subprocess.run(command, capture_output=True, text=True, errors="replace", timeout=timeout)
+            output = process.stdout + process.stderr
+            return_code = process.returncode
+        except subprocess.TimeoutExpired as e:
+            output = e.stdout.decode(errors="replace") if isinstance(e.stdout, bytes) else (e.stdout or "")
+            return_code = None
+        entry["seconds"] = time.perf_counter() - t0
+
+        result = {}
+        if os.path.exists(result_path):
+            with open(result_path, encoding="utf-8") as f:
+                result = json.load(f)
+        entry.update({key: value for key, value in result.items() if key != "ok"})
+
+        if return_code is None:
+            entry["error"] = f"超时（{timeout}s）"
+        elif return_code != 0 or not result.get("ok"):
+            entry.setdefault("error", f"Blender 退出码 {return_code}")
+        else:
+            entry["status"] = "baked"
+            with open(target + STATE_SUFFIX, "w", encoding="utf-8") as f:
+                json.dump({"input_hash": input_hash, "settings_hash": settings_hash,
+                           "seconds": entry["seconds"]}, f)
+        if entry["status"] == "failed":
+            entry["log"] = output.splitlines()[-LOG_TAIL_LINES:]
+    return entry
+
+
+def run_batch(args):
+    """调度: 把文件分发给多个后台 Blender 进程并写报告"""
+    if not args.input or not args.output:
+        raise SystemExit("需要 --input 和 --output")
+    blender = args.blender or (bpy.app.binary_path if bpy is not None else None)
+    if not blender:
+        raise SystemExit("直接用 Python 运行时需要 --blender 指定 Blender 可执行文件")
+
+    settings = load_settings(args)
+    settings_hash = hash_settings(settings)
+    jobs = [(source, output_path_for(source, target)) for source, target in collect_jobs(args.input, args.output)]
+    script = os.path.abspath(__file__)
+    report_path = args.report or os.path.join(os.path.abspath(args.output), "bake_report.json")
+    print(f"顶点色批量烘焙: {len(jobs)} 个文件, {args.workers} 个进程")
+
+    started = time.time()
+    entries = []
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(run_job, blender, script, source, target, settings, settings_hash,
+                               args.timeout, args.force) for source, target in jobs]
+        for future in futures:
+            entry = future.result()
+            entries.append(entry)
+            print(f"  [{entry['status']}] {entry['input']}  {entry['seconds']:.1f}s"
+                  + (f"  {entry['error']}" if entry.get("error") else ""))
+
+    counts = {status: sum(1 for e in entries if e["status"] == status) for status in ("baked", "skipped", "failed")}
+    report = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "seconds": time.time() - started,
+        "blender": blender,
+        "workers": args.workers,
+        "settings": settings,
+        "settings_hash": settings_hash,
+        **counts,
+        "files": entries,
+    }
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"完成: 烘焙 {counts['baked']}, 跳过 {counts['skipped']}, 失败 {counts['failed']}，报告: {report_path}")
+    return 1 if counts["failed"] else 0
+
+
+# ---------------------------------------------------------
+# 后台 Blender 进程内执行
+# ---------------------------------------------------------
+def load_baker():
+    """导入同目录下的 VertexColorBaker 并注册（已注册时跳过）"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import VertexColorBaker
+    if not hasattr(bpy.types.Scene, "vertex_color_baker_props"):
+        VertexColorBaker.register()
+    return VertexColorBaker
+
+
+def apply_settings(props, settings):
+    """把参数写入场景的 VertexColorBakerProps，未知的参数名直接报错"""
+    known = set(type(props).__annotations__)
+    for key, value in settings.items():
+        if key not in known:
+            raise ValueError(f"未知的烘焙参数: {key}")
+        setattr(props, key, value)
+
+
+def export_glb(path, layer_name):
+    """导出 GLB，并把烘焙的颜色层设为导出的顶点色"""
+    for obj in bpy.context.scene.objects:
+        if obj.type == 'MESH' and layer_name in obj.data.color_attributes:
+            obj.data.color_attributes.active_color_name = layer_name
+    args = {"filepath": path, "export_format": 'GLB', "export_attributes": True}
+    try:
+        # Blender 4.2 起顶点色导出改为枚举
+        bpy.ops.export_scene.gltf(**args, export_vertex_color='ACTIVE')
+    except TypeError:
+        bpy.ops.export_scene.gltf(**args, export_colors=True)
+
+
+def run_worker(job_path):
+    """烘焙一个文件: 已打开的 .blend 或导入的 glTF，保存/导出结果并写出结果 JSON"""
+    with open(job_path, encoding="utf-8") as f:
+        job = json.load(f)
+    result = {"ok": False}
+    try:
+        gltf = not job["input"].lower().endswith(".blend")
+        if gltf:
+            # --factory-startup 的默认场景带有立方体、灯光和相机，先清空，否则它们会被烘焙、遮挡并一起导出
+            bpy.ops.wm.read_factory_settings(use_empty=True)
+        baker = load_baker()
+        if gltf:
+            bpy.ops.import_scene.gltf(filepath=job["input"])
+
+        context = bpy.context
+        props = context.scene.vertex_color_baker_props
+        apply_settings(props, job["settings"])
+        objects = [obj for obj in context.scene.objects if obj.type == 'MESH' and obj.visible_get()]
+        targets, skipped, _ = baker.dedupe_bake_targets(objects)
+
+        t0 = time.perf_counter()
+        summary = baker.bake_objects(context, targets, props) if targets else []
+        result.update(
+            bake_seconds=time.perf_counter() - t0,
+            objects=len(targets),
+            shared=len(skipped),
+            vertices=sum(item["vertices"] for item in summary),
+            rays=sum(item["rays"] for item in summary),
+        )
+        if "profile" in baker._bake_stats:
+            result["profile"] = baker._bake_stats["profile"]
+
+        if job["output"].lower().endswith(".blend"):
+            bpy.ops.wm.save_as_mainfile(filepath=job["output"], copy=True)
+        else:
+            export_glb(job["output"], props.color_layer_name)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        with open(job["result"], "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+
+
+def main(argv):
+    args = parse_arguments(script_arguments(argv))
+    if args.worker:
+        if bpy is None:
+            raise SystemExit("--worker 只能在 Blender 中运行")
+        run_worker(args.worker)
+        return 0
+    return run_batch(args)
+
+
+if __name__ == "__main__":
+    code = main(sys.argv)
+    # 在 Blender 中成功时不主动退出，让 -b 按正常流程结束
+    if code or bpy is None:
+        sys.exit(code)
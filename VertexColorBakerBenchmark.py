@@ -0,0 +1,306 @@
+"""顶点色烘焙性能基准
+
+在后台 Blender 中生成确定的合成场景，按烘焙模式和采样数逐个计时:
+
+    blender -b --factory-startup --python VertexColorBakerBenchmark.py -- [选项]
+
+场景:
+    ico    起伏的细分球（自遮挡）
+    grid   正弦高度场网格
+    kit    少量套件网格的大量独立副本（各自一份网格数据），考察遮挡物收集与求交
+
+选项:
+    --scenes ico,grid,kit       要测的场景
+    --sizes 1k,10k,100k,1m      目标顶点数（实际顶点数按场景生成方式取最接近的值）
+    --modes NUMPY,STREAM,BMESH  烘焙模式
+    --samples 16,64             AO采样数
+    --engine BVH                AO引擎
+    --repeat N                  每项重复次数，取最快一次
+    --bmesh-limit N             BMesh 模式只测顶点数不超过 N 的场景（逐顶点循环很慢）
+    --output results.json       结果路径，默认 benchmark_results.json
+    --baseline baseline.json    与基准对比，顶点/秒 低于基准 (1 - threshold) 倍或校验和变化时以退出码 1 结束
+    --threshold 0.1             允许的性能下降比例
+    --update-baseline           把本次结果写入 --baseline 指定的文件
+
+每项结果记录 去重后的烘焙目标数、顶点/秒、射线/秒 和颜色层的校验和（量化到 8 位后的哈希），用来确认提速没有改变烘焙结果。
+"""
+import argparse
+import platform
+import hashlib
+import json
+import math
+import time
+import sys
+import os
+
+import numpy as np
+import bmesh
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from VertexColorBakerBatch import load_baker, script_arguments
+
+
+SCENES = ("ico", "grid", "kit")
+# 套件场景中每个套件网格的细分级数和实例间距
+KIT_SUBDIVISIONS = (2, 3, 4)
+KIT_SPACING = 1.6
+# 合成场景的随机种子，保证每次生成的场景相同
+SCENE_SEED = 20240601
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1m' -> 1000000"""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(prog="VertexColorBakerBenchmark.py", description="顶点色烘焙性能基准")
+    parser.add_argument("--scenes", default=",".join(SCENES))
+    parser.add_argument("--sizes", default="1k,10k,100k,1m")
+    parser.add_argument("--modes", default="NUMPY,STREAM,BMESH")
+    parser.add_argument("--samples", default="16,64")
+    parser.add_argument("--engine", default="BVH")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--bmesh-limit", type=int, default=20_000)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--update-baseline", action="store_true")
+    return parser.parse_args(argv)
+
+
+# ---------------------------------------------------------
+# 合成场景
+# ---------------------------------------------------------
+def clear_scene():
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj)
+    for mesh in list(bpy.data.meshes):
+        bpy.data.meshes.remove(mesh)
+
+
+def link_object(name, mesh, location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0)):
+    obj = bpy.data.objects.new(name, mesh)
+    obj.location = location
+    obj.rotation_euler = rotation
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+
+
+def mesh_from_quads(name, co, quads):
+    """用顶点坐标 (N, 3) 和四边形索引 (M, 4) 直接 foreach_set 建网格"""
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(co))
+    mesh.vertices.foreach_set("co", co.astype(np.float32).ravel())
+    mesh.loops.add(quads.size)
+    mesh.loops.foreach_set("vertex_index", quads.astype(np.int32).ravel())
+    mesh.polygons.add(len(quads))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, quads.size, 4, dtype=np.int32))
+    # 4.0 之前 loop_total 需要手动写入
+    if not mesh.polygons.bl_rna.properties["loop_total"].is_readonly:
+        mesh.polygons.foreach_set("loop_total", np.full(len(quads), 4, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    mesh.validate()
+    return mesh
+
+
+def make_icosphere_mesh(name, subdivisions, bumps=5.0):
+    """细分球，半径按三角函数起伏，产生稳定的自遮挡"""
+    bm = bmesh.new()
+    bmesh.ops.create_icosphere(bm, subdivisions=subdivisions, radius=1.0)
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+    co *= (1.0 + 0.2 * np.sin(bumps * co[:, 0]) * np.sin(bumps * co[:, 1]) * np.sin(bumps * co[:, 2]))[:, None]
+    mesh.vertices.foreach_set("co", co.ravel())
+    mesh.update()
+    return mesh
+
+
+def make_grid_mesh(name, side):
+    """side x side 个顶点的正弦高度场"""
+    t = np.linspace(-1.0, 1.0, side)
+    x, y = np.meshgrid(t, t)
+    z = 0.25 * np.sin(6.0 * x) * np.cos(5.0 * y) + 0.1 * np.sin(17.0 * x * y)
+    co = np.column_stack([x.ravel(), y.ravel(), z.ravel()])
+    index = np.arange(side * side).reshape(side, side)
+    quads = np.column_stack([
+        index[:-1, :-1].ravel(), index[:-1, 1:].ravel(),
+        index[1:, 1:].ravel(), index[1:, :-1].ravel(),
+    ])
+    return mesh_from_quads(name, co, quads)
+
+
+def icosphere_subdivisions(size):
+    """顶点数最接近 size 的细分级数（bmesh 的细分级数 n 对应 10 * 4^(n-1) + 2 个顶点）"""
+    return max(1, round(math.log(max(size - 2, 10) / 10, 4))) + 1
+
+
+def build_scene(scene, size):
+    """生成场景，返回 (要烘焙的对象, 场景总顶点数)"""
+    clear_scene()
+    if scene == "ico":
+        obj = link_object("bench_ico", make_icosphere_mesh("bench_ico", icosphere_subdivisions(size)))
+        objects = [obj]
+    elif scene == "grid":
+        obj = link_object("bench_grid", make_grid_mesh("bench_grid", max(2, round(math.sqrt(size)))))
+        objects = [obj]
+    elif scene == "kit":
+        kits = [make_icosphere_mesh(f"bench_kit_{s}", s, bumps=3.0 + s) for s in KIT_SUBDIVISIONS]
+        per_instance = sum(len(mesh.vertices) for mesh in kits) / len(kits)
+        count = max(len(kits), round(size / per_instance))
+        side = math.ceil(math.sqrt(count))
+        rng = np.random.default_rng(SCENE_SEED)
+        jitter = rng.uniform(-0.3, 0.3, (count, 3))
+        angles = rng.uniform(0.0, math.tau, (count, 3))
+        objects = []
+        for i in range(count):
+            location = (KIT_SPACING * (i % side) + jitter[i, 0],
+                        KIT_SPACING * (i // side) + jitter[i, 1],
+                        jitter[i, 2])
+            # 复制网格数据而不是关联复制，否则去重后只剩每种套件一个烘焙目标
+            mesh = kits[i % len(kits)]
+            if i >= len(kits):
+                mesh = mesh.copy()
+            objects.append(link_object(f"bench_kit_{i}", mesh, location, tuple(angles[i])))
+    else:
+        raise ValueError(f"未知的场景: {scene}")
+    bpy.context.view_layer.update()
+    return objects, sum(len(obj.data.vertices) for obj in objects)
+
+
+# ---------------------------------------------------------
+# 计时
+# ---------------------------------------------------------
+def color_checksum(objects, layer_name):
+    """颜色层量化到 8 位后的哈希，忽略浮点末位的差异"""
+    digest = hashlib.blake2b(digest_size=8)
+    for obj in sorted(objects, key=lambda o: o.name):
+        attr = obj.data.color_attributes.get(layer_name)
+        if attr is None:
+            continue
+        colors = np.empty(len(attr.data) * 4, dtype=np.float32)
+        attr.data.foreach_get("color", colors)
+        digest.update(np.round(np.clip(colors, 0.0, 1.0) * 255).astype(np.uint8).tobytes())
+    return digest.hexdigest()
+
+
+def run_case(baker, objects, mode, samples, engine, repeat):
+    """烘焙 repeat 次，返回最快一次的结果"""
+    context = bpy.context
+    props = context.scene.vertex_color_baker_props
+    props.bake_mode = mode
+    props.ao_samples = samples
+    props.ao_engine = engine
+    props.use_fixed_seed = True
+    props.use_bake_cache = False
+    props.autoJump = False
+    targets, _, _ = baker.dedupe_bake_targets(objects)
+
+    best = None
+    for _ in range(repeat):
+        # 每次从零开始写颜色层；BMesh 模式使用全局随机数，先固定种子
+        for obj in targets:
+            attr = obj.data.color_attributes.get(props.color_layer_name)
+            if attr is not None:
+                obj.data.color_attributes.remove(attr)
+        np.random.seed(SCENE_SEED)
+        t0 = time.perf_counter()
+        summary = baker.bake_objects(context, targets, props)
+        seconds = time.perf_counter() - t0
+        if best is None or seconds < best["seconds"]:
+            vertices = sum(item["vertices"] for item in summary)
+            rays = sum(item["rays"] for item in summary)
+            best = {
+                "targets": len(targets),
+                "seconds": seconds,
+                "vertices": vertices,
+                "rays": int(rays),
+                "verts_per_sec": vertices / max(seconds, 1e-9),
+                "rays_per_sec": rays / max(seconds, 1e-9),
+            }
+    best["checksum"] = color_checksum(targets, props.color_layer_name)
+    return best
+
+
+def compare_baseline(results, baseline, threshold):
+    """返回 (性能下降的项, 校验和变化的项)"""
+    regressions, changed = [], []
+    for key, case in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        ratio = case["verts_per_sec"] / max(base["verts_per_sec"], 1e-9)
+        case["baseline_ratio"] = ratio
+        if ratio < 1.0 - threshold:
+            regressions.append(key)
+        if base.get("checksum") and base["checksum"] != case["checksum"]:
+            changed.append(key)
+    return regressions, changed
+
+
+def main(argv):
+    args = parse_arguments(script_arguments(argv))
+    baker = load_baker()
+    scenes = args.scenes.split(",")
+    sizes = [parse_size(text) for text in args.sizes.split(",")]
+    modes = args.modes.split(",")
+    samples_list = [int(text) for text in args.samples.split(",")]
+
+    results = {}
+    for scene in scenes:
+        for size in sizes:
+            objects, scene_vertices = build_scene(scene, size)
+            for mode in modes:
+                if mode == 'BMESH' and scene_vertices > args.bmesh_limit:
+                    continue
+                for samples in samples_list:
+                    key = f"{scene}-{size}-{mode}-s{samples}"
+                    case = run_case(baker, objects, mode, samples, args.engine, args.repeat)
+                    case.update(scene=scene, size=size, scene_vertices=scene_vertices,
+                                mode=mode, samples=samples, engine=args.engine)
+                    results[key] = case
+                    print(f"{key:<28} {case['targets']:>5} 目标 {case['vertices']:>9} 顶点  {case['seconds']:>8.2f}s  "
+                          f"{case['verts_per_sec']:>11.0f} 顶点/秒  {case['rays_per_sec']:>13.0f} 射线/秒  "
+                          f"{case['checksum']}")
+
+    exit_code = 0
+    if args.baseline and os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["cases"]
+        regressions, changed = compare_baseline(results, baseline, args.threshold)
+        for key in regressions:
+            print(f"性能下降: {key}  {results[key]['baseline_ratio']:.2f}x 基准")
+        for key in changed:
+            print(f"结果变化: {key}  校验和 {baseline[key]['checksum']} -> {results[key]['checksum']}")
+        if regressions or changed:
+            exit_code = 1
+        else:
+            print(f"与基准对比: {len(results)} 项均在 {args.threshold:.0%} 以内，结果一致")
+
+    report = {
+        "blender": bpy.app.version_string,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "cases": results,
+    }
+    paths = [args.output] + ([args.baseline] if args.update_baseline and args.baseline else [])
+    for path in paths:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入: {', '.join(paths)}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    code = main(sys.argv)
+    if code:
+        sys.exit(code)
@@ -0,0 +1,88 @@
+"""加载插件模块的共用夹具
+
+插件文件在模块顶层导入 bpy / bmesh / mathutils。没有 Blender 时只在导入期间放入占位模块，
+使纯 NumPy 的辅助函数可以直接测试；导入完成后立即移除占位模块，
+需要真实 bpy 的测试（pytest.importorskip("bpy")）仍然会被跳过。
+"""
+import importlib
+import types
+import sys
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BLENDER_MODULES = ("bpy", "bpy.types", "bpy.props", "bpy.utils", "bpy.app", "bmesh", "mathutils", "mathutils.bvhtree")
+
+
+class _Placeholder:
+    """接受任意参数、任意属性访问的占位对象，也可作为基类"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return _Placeholder()
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Placeholder()
+
+
+class _PlaceholderModule(types.ModuleType):
+    """大写开头的名称返回可继承的类（Operator、Vector 等），其余返回占位对象"""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = type(name, (_Placeholder,), {}) if name[:1].isupper() else _Placeholder()
+        setattr(self, name, value)
+        return value
+
+
+def _blender_available():
+    try:
+        import bpy  # noqa: F401  bmesh 等模块要在 bpy 之后导入
+    except ImportError:
+        return False
+    return True
+
+
+def import_addon(name):
+    """导入仓库根目录下的插件模块；没有 Blender 时临时使用占位模块"""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    if name in sys.modules or _blender_available():
+        return importlib.import_module(name)
+
+    stubs = {}
+    for module_name in BLENDER_MODULES:
+        stubs[module_name] = _PlaceholderModule(module_name)
+        parent, _, child = module_name.rpartition(".")
+        if parent:
+            setattr(stubs[parent], child, stubs[module_name])
+    sys.modules.update(stubs)
+    try:
+        return importlib.import_module(name)
+    finally:
+        for module_name in stubs:
+            sys.modules.pop(module_name, None)
+
+
+@pytest.fixture(scope="session")
+def baker():
+    return import_addon("VertexColorBaker")
+
+
+@pytest.fixture(scope="session")
+def assistant():
+    return import_addon("辅助大师AssistantMaster")
+
+
+@pytest.fixture(scope="session")
+def batch():
+    # 批量脚本本身可选导入 bpy，不需要占位模块
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    return importlib.import_module("VertexColorBakerBatch")
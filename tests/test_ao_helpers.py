@@ -0,0 +1,185 @@
+"""VertexColorBaker 中纯 NumPy 辅助函数的测试，结果与逐条计算的参考实现比较"""
+import math
+import types
+
+import numpy as np
+import pytest
+
+
+def reference_hit(origin, direction, triangles, max_dist):
+    """逐个三角形解 origin + t*d = v0 + u*e1 + v*e2，返回最近命中距离（双面），未命中为 inf"""
+    best = math.inf
+    for v0, v1, v2 in triangles:
+        e1, e2 = v1 - v0, v2 - v0
+        matrix = np.column_stack((-direction, e1, e2))
+        if abs(np.linalg.det(matrix)) < 1e-12:
+            continue
+        t, u, v = np.linalg.solve(matrix, origin - v0)
+        if u >= 0.0 and v >= 0.0 and u + v <= 1.0 and 1e-6 < t <= max_dist:
+            best = min(best, t)
+    return best
+
+
+def random_scene(rng, tri_count=150, ray_count=300, size=10.0):
+    """立方体内随机分布的小三角形，外加两个横跨整个场景的大三角形（进入网格的全局列表）"""
+    centers = rng.uniform(0.0, size, (tri_count, 1, 3))
+    verts = (centers + rng.normal(0.0, 0.4, (tri_count, 3, 3))).reshape(-1, 3)
+    big = np.array([[0.0, 0.0, 5.0], [size, 0.0, 5.0], [0.0, size, 5.0],
+                    [5.0, 0.0, 0.0], [5.0, size, 0.0], [5.0, 0.0, size]])
+    verts = np.concatenate((verts, big))
+    tris = np.arange(len(verts)).reshape(-1, 3)
+    origins = rng.uniform(0.0, size, (ray_count, 3))
+    dirs = rng.normal(size=(ray_count, 3))
+    dirs /= np.linalg.norm(dirs, axis=1, keepdims=True)
+    return verts, tris, origins, dirs
+
+
+def reference_hits(verts, tris, origins, dirs, max_dist):
+    triangles = verts[tris]
+    return np.array([reference_hit(o, d, triangles, max_dist) for o, d in zip(origins, dirs)])
+
+
+def assert_same_hits(result, expected):
+    assert np.array_equal(np.isinf(result), np.isinf(expected))
+    hit = np.isfinite(expected)
+    np.testing.assert_allclose(result[hit], expected[hit], rtol=1e-4, atol=1e-5)
+
+
+def test_nearest_hits_matches_reference(baker):
+    rng = np.random.default_rng(1)
+    verts, tris, origins, dirs = random_scene(rng, tri_count=60, ray_count=200)
+    tri_verts = verts[tris]
+    result = baker.nearest_hits(origins, dirs, tri_verts[:, 0], tri_verts[:, 1] - tri_verts[:, 0],
+                                tri_verts[:, 2] - tri_verts[:, 0], 3.0)
+    expected = reference_hits(verts, tris, origins, dirs, 3.0)
+    assert np.isfinite(expected).sum() > 10
+    assert_same_hits(result, expected)
+
+
+def test_grid_intersection_matches_brute_force(baker):
+    rng = np.random.default_rng(2)
+    verts, tris, origins, dirs = random_scene(rng)
+    distance = 1.0
+    tri_verts = verts[tris]
+    tri_min, tri_max = tri_verts.min(axis=1), tri_verts.max(axis=1)
+    lo, cell, dims, cell_start, cell_tris, big_tris = baker.build_triangle_grid(
+        tri_min, tri_max, origins.min(axis=0), origins.max(axis=0), distance)
+
+    # 单元边长不小于 AO 距离，每个三角形都登记在它包围盒覆盖的所有单元里
+    assert cell >= distance
+    assert len(big_tris) == 2
+    for t in range(len(tris)):
+        if t in big_tris:
+            continue
+        cmin = np.floor((tri_min[t] - lo) / cell).astype(int)
+        cmax = np.floor((tri_max[t] - lo) / cell).astype(int)
+        for cz in range(max(cmin[2], 0), min(cmax[2], dims[2] - 1) + 1):
+            for cy in range(max(cmin[1], 0), min(cmax[1], dims[1] - 1) + 1):
+                for cx in range(max(cmin[0], 0), min(cmax[0], dims[0] - 1) + 1):
+                    c = cx + dims[0] * (cy + dims[1] * cz)
+                    assert t in cell_tris[cell_start[c]:cell_start[c + 1]]
+
+    state = {
+        "params": (lo, cell, dims, distance),
+        "v0": tri_verts[:, 0],
+        "e1": tri_verts[:, 1] - tri_verts[:, 0],
+        "e2": tri_verts[:, 2] - tri_verts[:, 0],
+        "cell_start": cell_start,
+        "cell_tris": cell_tris,
+        "big_tris": big_tris,
+    }
+    result = baker.intersect_rays_grid(state, origins, dirs)
+    expected = reference_hits(verts, tris, origins, dirs, distance)
+    assert np.isfinite(expected).sum() > 20
+    assert_same_hits(result, expected)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_ray_caster_matches_brute_force(baker, workers):
+    rng = np.random.default_rng(3)
+    verts, tris, origins, dirs = random_scene(rng)
+    cast = baker.ParallelRayCaster(verts, tris, 1.5, workers, (origins.min(axis=0), origins.max(axis=0)))
+    try:
+        result = cast(origins, dirs)
+    finally:
+        cast.close()
+    assert_same_hits(result, reference_hits(verts, tris, origins, dirs, 1.5))
+
+
+def reference_radical_inverse(i):
+    return int(format(i, "032b")[::-1], 2) / 2.0 ** 32
+
+
+def reference_sobol_second(i):
+    """Sobol 第二维的生成矩阵是模 2 的帕斯卡矩阵: 输出第 j 位 = XOR_k C(k, j) * 索引第 k 位"""
+    bits = 0
+    for j in range(32):
+        bit = 0
+        for k in range(j, 32):
+            if (i >> k) & 1:
+                bit ^= math.comb(k, j) & 1
+        bits |= bit << (31 - j)
+    return bits / 2.0 ** 32
+
+
+@pytest.mark.parametrize("sampler", ["SOBOL", "HAMMERSLEY"])
+def test_hemisphere_table_matches_reference(baker, sampler):
+    samples = 64
+    table = baker.hemisphere_table(sampler, samples)
+    assert table.shape == (samples, 3)
+    assert not table.flags.writeable
+    assert baker.hemisphere_table(sampler, samples) is table
+
+    for i, direction in enumerate(table):
+        if sampler == "HAMMERSLEY":
+            u1, u2 = (i + 0.5) / samples, reference_radical_inverse(i)
+        else:
+            u1, u2 = reference_radical_inverse(i), reference_sobol_second(i)
+        expected = (math.sqrt(u1) * math.cos(2 * math.pi * u2), math.sqrt(u1) * math.sin(2 * math.pi * u2),
+                    math.sqrt(1.0 - u1))
+        np.testing.assert_allclose(direction, expected, atol=1e-12)
+
+    np.testing.assert_allclose(np.linalg.norm(table, axis=1), 1.0)
+    assert (table[:, 2] >= 0.0).all()
+    # 余弦加权分布下 cosθ 的期望为 2/3
+    assert abs(table[:, 2].mean() - 2.0 / 3.0) < 0.02
+
+
+class FakeEdges:
+    def __init__(self, edges):
+        self.edges = edges
+
+    def __len__(self):
+        return len(self.edges)
+
+    def foreach_get(self, name, out):
+        assert name == "vertices"
+        out[:] = np.ravel(self.edges)
+
+
+def test_smooth_vertex_values_matches_loop(baker):
+    rng = np.random.default_rng(4)
+    vert_count = 40
+    pairs = {tuple(sorted(p)) for p in rng.integers(0, vert_count - 2, (80, 2)) if p[0] != p[1]}
+    edges = sorted(pairs)
+    # 最后两个顶点没有边，应保持不变
+    mesh = types.SimpleNamespace(vertices=[None] * vert_count, edges=FakeEdges(edges))
+    adjacency = baker.build_vertex_adjacency(mesh)
+
+    neighbors = [[] for _ in range(vert_count)]
+    for a, b in edges:
+        neighbors[a].append(b)
+        neighbors[b].append(a)
+    indptr, flat = adjacency
+    for i in range(vert_count):
+        assert sorted(flat[indptr[i]:indptr[i + 1]]) == sorted(neighbors[i])
+
+    values = rng.uniform(size=(vert_count, 4))
+    expected = values.copy()
+    for _ in range(3):
+        previous = expected.copy()
+        for i in range(vert_count):
+            if neighbors[i]:
+                expected[i] = 0.5 * previous[i] + 0.5 * np.mean([previous[n] for n in neighbors[i]], axis=0)
+    np.testing.assert_allclose(baker.smooth_vertex_values(adjacency, values, 3), expected)
+    np.testing.assert_allclose(baker.smooth_vertex_values(adjacency, values[:, 0], 3), expected[:, 0])
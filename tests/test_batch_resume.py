@@ -0,0 +1,104 @@
+"""VertexColorBakerBatch 的 .vcb.json 续跑逻辑，用一个假的 Blender 可执行文件代替后台烘焙进程"""
+import json
+import os
+import sys
+
+import pytest
+
+FAKE_BLENDER = """#!{python}
+import json, sys
+job_path = sys.argv[sys.argv.index("--worker") + 1]
+with open(job_path, encoding="utf-8") as f:
+    job = json.load(f)
+with open({calls!r}, "a", encoding="utf-8") as f:
+    f.write(job["input"] + "\\n")
+ok = not job["settings"].get("fail")
+if ok:
+    with open(job["output"], "w", encoding="utf-8") as f:
+        f.write("baked")
+with open(job["result"], "w", encoding="utf-8") as f:
+    json.dump({{"ok": ok, "objects": 1}}, f)
+"""
+
+
+@pytest.fixture
+def fake_blender(tmp_path):
+    """返回 (可执行文件路径, 读取调用次数的函数)"""
+    if os.name != "posix":
+        pytest.skip("假 Blender 依赖 shebang")
+    calls = tmp_path / "calls.txt"
+    path = tmp_path / "blender"
+    path.write_text(FAKE_BLENDER.format(python=sys.executable, calls=str(calls)), encoding="utf-8")
+    path.chmod(0o755)
+    return str(path), lambda: len(calls.read_text(encoding="utf-8").splitlines()) if calls.exists() else 0
+
+
+def bake(batch, blender, source, target, settings, force=False):
+    return batch.run_job(blender, batch.__file__, str(source), str(target), settings,
+                         batch.hash_settings(settings), 60, force)
+
+
+def test_hash_settings_ignores_key_order(batch):
+    assert batch.hash_settings({"a": 1, "b": 2}) == batch.hash_settings({"b": 2, "a": 1})
+    assert batch.hash_settings({"a": 1}) != batch.hash_settings({"a": 2})
+
+
+def test_rerun_skips_only_unchanged_files(batch, fake_blender, tmp_path):
+    blender, calls = fake_blender
+    source = tmp_path / "in" / "scene.glb"
+    source.parent.mkdir()
+    source.write_bytes(b"v1")
+    target = tmp_path / "out" / "scene.glb"
+    settings = {"ao_samples": 8}
+
+    entry = bake(batch, blender, source, target, settings)
+    assert entry["status"] == "baked" and entry["objects"] == 1
+    with open(str(target) + batch.STATE_SUFFIX, encoding="utf-8") as f:
+        state = json.load(f)
+    assert state["input_hash"] == batch.hash_file(str(source))
+    assert state["settings_hash"] == batch.hash_settings(settings)
+
+    # 输入和参数都没变: 跳过，不启动进程
+    assert bake(batch, blender, source, target, {"ao_samples": 8})["status"] == "skipped"
+    assert calls() == 1
+    # 参数变化、输入变化、--force 都会重新烘焙
+    assert bake(batch, blender, source, target, {"ao_samples": 16})["status"] == "baked"
+    assert bake(batch, blender, source, target, {"ao_samples": 16})["status"] == "skipped"
+    source.write_bytes(b"v2")
+    assert bake(batch, blender, source, target, {"ao_samples": 16})["status"] == "baked"
+    assert bake(batch, blender, source, target, {"ao_samples": 16}, force=True)["status"] == "baked"
+    assert calls() == 4
+
+    # 输出被删除或状态文件损坏时不能跳过
+    target.unlink()
+    assert bake(batch, blender, source, target, {"ao_samples": 16})["status"] == "baked"
+    with open(str(target) + batch.STATE_SUFFIX, "w", encoding="utf-8") as f:
+        f.write("{")
+    assert bake(batch, blender, source, target, {"ao_samples": 16})["status"] == "baked"
+    assert calls() == 6
+
+
+def test_failed_job_is_retried(batch, fake_blender, tmp_path):
+    blender, calls = fake_blender
+    source = tmp_path / "scene.glb"
+    source.write_bytes(b"v1")
+    target = tmp_path / "out" / "scene.glb"
+
+    entry = bake(batch, blender, source, target, {"fail": True})
+    assert entry["status"] == "failed"
+    assert not os.path.exists(str(target) + batch.STATE_SUFFIX)
+    assert bake(batch, blender, source, target, {"fail": True})["status"] == "failed"
+    assert calls() == 2
+
+
+def test_collect_jobs_keeps_relative_layout(batch, tmp_path):
+    source_dir = tmp_path / "in"
+    (source_dir / "sub").mkdir(parents=True)
+    for name in ("a.blend", "sub/b.gltf", "notes.txt"):
+        (source_dir / name).write_bytes(b"")
+    jobs = [(source, batch.output_path_for(source, target))
+            for source, target in batch.collect_jobs(str(source_dir), str(tmp_path / "out"))]
+    assert jobs == [
+        (str(source_dir / "a.blend"), str(tmp_path / "out" / "a.blend")),
+        (str(source_dir / "sub" / "b.gltf"), str(tmp_path / "out" / "sub" / "b.glb")),
+    ]
@@ -0,0 +1,57 @@
+"""VertexColorBakerBatch 后台烘焙进程的测试，需要 Blender 的 bpy 模块（pip install bpy 或在 Blender 中运行 pytest）"""
+import struct
+import json
+import sys
+import os
+
+import pytest
+
+bpy = pytest.importorskip("bpy")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import VertexColorBakerBatch
+
+
+def read_glb_json(path):
+    """读取 GLB 的 JSON 块"""
+    with open(path, "rb") as f:
+        data = f.read()
+    length, chunk_type = struct.unpack_from("<II", data, 12)
+    assert chunk_type == 0x4E4F534A
+    return json.loads(data[20:20 + length])
+
+
+def export_input_glb(path, names):
+    """在空场景中为每个名称建一个网格对象，导出为 GLB"""
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    for i, name in enumerate(names):
+        mesh = bpy.data.meshes.new(name)
+        mesh.from_pydata([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)], [], [(0, 1, 2, 3)])
+        obj = bpy.data.objects.new(name, mesh)
+        obj.location = (i * 2.0, 0.0, 0.0)
+        bpy.context.scene.collection.objects.link(obj)
+    bpy.ops.export_scene.gltf(filepath=path, export_format='GLB')
+
+
+def test_glb_input_exports_only_imported_meshes(tmp_path):
+    source = str(tmp_path / "input.glb")
+    output = str(tmp_path / "output.glb")
+    export_input_glb(source, ["PlaneA", "PlaneB"])
+    # 模拟 --factory-startup：进程启动时是带立方体、灯光和相机的默认场景
+    bpy.ops.wm.read_factory_settings()
+    assert bpy.data.objects.get("Cube") is not None
+
+    job_path = str(tmp_path / "job.json")
+    result_path = str(tmp_path / "result.json")
+    with open(job_path, "w", encoding="utf-8") as f:
+        json.dump({"input": source, "output": output, "result": result_path,
+                   "settings": {"ao_samples": 4}}, f)
+    VertexColorBakerBatch.run_worker(job_path)
+
+    with open(result_path, encoding="utf-8") as f:
+        result = json.load(f)
+    assert result["ok"]
+    assert result["objects"] == 2
+    gltf = read_glb_json(output)
+    assert sorted(node["name"] for node in gltf["nodes"]) == ["PlaneA", "PlaneB"]
+    assert len(gltf["meshes"]) == 2
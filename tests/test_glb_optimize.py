@@ -0,0 +1,186 @@
+"""辅助大师中顶点缓存优化和 GLB 后处理的测试，不需要 Blender"""
+from collections import deque
+
+import numpy as np
+import pytest
+
+
+def grid_triangles(size, rng=None):
+    """size x size 个四边形的网格，每个四边形两个三角形；给出 rng 时打乱三角形顺序"""
+    tris = []
+    for y in range(size):
+        for x in range(size):
+            a = y * (size + 1) + x
+            b, c, d = a + 1, a + size + 1, a + size + 2
+            tris += [(a, b, d), (a, d, c)]
+    tris = np.array(tris, dtype=np.int64)
+    if rng is not None:
+        tris = tris[rng.permutation(len(tris))]
+    return tris, (size + 1) ** 2
+
+
+def reference_acmr(tris, cache_size):
+    """用 FIFO 队列逐个顶点模拟缓存"""
+    cache = deque(maxlen=cache_size)
+    misses = 0
+    for v in np.ravel(tris):
+        if v not in cache:
+            cache.append(v)
+            misses += 1
+    return misses / len(tris)
+
+
+def triangle_set(tris, *attributes):
+    """每个三角形按顶点顺序展开成属性行，整体排序后返回，用于比较与存储顺序无关的几何"""
+    rows = np.concatenate([attribute[tris].reshape(len(tris), -1) for attribute in attributes], axis=1)
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+@pytest.mark.parametrize("cache_size", [4, 16, 32])
+def test_simulate_acmr_matches_fifo_reference(assistant, cache_size):
+    tris, _ = grid_triangles(12, np.random.default_rng(5))
+    assert assistant.simulate_acmr(tris, cache_size) == pytest.approx(reference_acmr(tris, cache_size))
+    assert assistant.simulate_acmr(np.empty((0, 3), dtype=np.int64), cache_size) == 0.0
+
+
+def test_tipsify_keeps_triangles_and_lowers_acmr(assistant):
+    tris, vert_count = grid_triangles(30, np.random.default_rng(6))
+    order = assistant.tipsify(tris, vert_count)
+    assert sorted(order.tolist()) == list(range(len(tris)))
+    before = reference_acmr(tris, assistant.VERTEX_CACHE_SIZE)
+    after = reference_acmr(tris[order], assistant.VERTEX_CACHE_SIZE)
+    assert after < 0.8 * before
+    # 规则网格上 Tipsify 应接近每个三角形一个未命中
+    assert after < 1.0
+
+
+def test_first_occurrence_order(assistant):
+    rank = assistant.first_occurrence_order(np.array([4, 2, 4, 0, 2]), 6)
+    assert rank.tolist() == [2, 3, 1, 4, 0, 5]
+
+
+def build_glb(assistant, path, rng, size=8):
+    """两个网格使用内容相同但各自独立的缓冲视图；第二个节点带旋转和缩放。返回每个网格的原始数据"""
+    tris, vert_count = grid_triangles(size, rng)
+    side = np.arange(size + 1, dtype=np.float32)
+    x, y = np.meshgrid(side, side)
+    positions = np.stack((x.ravel(), y.ravel(), np.sin(x.ravel()) * 0.5), axis=1).astype(np.float32) * 0.25 - 1.0
+    normals = rng.normal(size=(vert_count, 3)).astype(np.float32)
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    uvs = (positions[:, :2] - positions[:, :2].min()) / np.ptp(positions[:, :2])
+
+    gltf = {"asset": {"version": "2.0"}, "buffers": [{}], "meshes": [], "scene": 0, "scenes": [{"nodes": [0, 1]}],
+            "nodes": [{"mesh": 0, "translation": [1.0, 2.0, 3.0]},
+                      {"mesh": 1, "rotation": [0.0, 0.0, 0.38268343, 0.92387953], "scale": [2.0, 2.0, 2.0]}]}
+    views = []
+    for name in ("A", "B"):
+        attributes = {
+            "POSITION": assistant.add_accessor(gltf, views, positions, "VEC3", assistant.GLTF_ARRAY_BUFFER,
+                                               stride=12, bounds=True),
+            "NORMAL": assistant.add_accessor(gltf, views, normals, "VEC3", assistant.GLTF_ARRAY_BUFFER, stride=12),
+            "TEXCOORD_0": assistant.add_accessor(gltf, views, uvs.astype(np.float32), "VEC2",
+                                                 assistant.GLTF_ARRAY_BUFFER, stride=8),
+        }
+        indices = assistant.add_accessor(gltf, views, tris.ravel().astype(np.uint32), "SCALAR",
+                                         assistant.GLTF_ELEMENT_ARRAY_BUFFER)
+        gltf["meshes"].append({"name": name, "primitives": [{"attributes": attributes, "indices": indices}]})
+    assistant.write_glb(str(path), gltf, assistant.pack_buffer_views(gltf, views))
+    return tris, positions, normals, uvs
+
+
+def node_matrix(assistant, node):
+    if "matrix" in node:
+        return np.array(node["matrix"]).reshape(4, 4).T
+    matrix = np.eye(4)
+    rotation = assistant.quaternion_matrix(*node.get("rotation", [0.0, 0.0, 0.0, 1.0]))
+    matrix[:3, :3] = rotation * np.array(node.get("scale", [1.0, 1.0, 1.0]))
+    matrix[:3, 3] = node.get("translation", [0.0, 0.0, 0.0])
+    return matrix
+
+
+def load_primitive(assistant, path, mesh_index):
+    """读回网格的 (三角形, 世界空间位置, 法线, UV)，按访问器声明做归一化反算"""
+    gltf, binary = assistant.read_glb(str(path))
+    views = assistant.split_buffer_views(gltf, binary)
+    prim = gltf["meshes"][mesh_index]["primitives"][0]
+
+    def read(index):
+        accessor = gltf["accessors"][index]
+        values = assistant.read_accessor(gltf, views, index).astype(np.float64)
+        if accessor.get("normalized"):
+            values /= np.iinfo(assistant.GLTF_COMPONENT_DTYPES[accessor["componentType"]]).max
+        return values
+
+    node = next(node for node in gltf["nodes"] if node.get("mesh") == mesh_index)
+    local = read(prim["attributes"]["POSITION"])
+    world = (node_matrix(assistant, node) @ np.column_stack((local, np.ones(len(local)))).T).T[:, :3]
+    tris = read(prim["indices"]).astype(np.int64).reshape(-1, 3)
+    return gltf, tris, world, read(prim["attributes"]["NORMAL"]), read(prim["attributes"]["TEXCOORD_0"])
+
+
+def test_optimize_glb_round_trip(assistant, tmp_path):
+    path = tmp_path / "model.glb"
+    tris, positions, normals, uvs = build_glb(assistant, path, np.random.default_rng(7))
+    original_size = path.stat().st_size
+    original = [load_primitive(assistant, path, i) for i in range(2)]
+
+    stats = assistant.optimize_glb(str(path))
+    assert stats["总计"] == original_size - path.stat().st_size
+    assert stats["去重"] > 0 and stats["量化"] > 0 and stats["索引压缩"] > 0
+
+    extent = np.ptp(positions, axis=0).max()
+    for mesh_index, (_, _, world, _, _) in enumerate(original):
+        gltf, new_tris, new_world, new_normals, new_uvs = load_primitive(assistant, path, mesh_index)
+        # 去重、量化和索引压缩都不改变顶点和三角形的顺序
+        assert np.array_equal(new_tris, tris)
+        scale = 2.0 if mesh_index else 1.0
+        np.testing.assert_allclose(new_world, world, atol=scale * extent / 65535 + 1e-6)
+        np.testing.assert_allclose(new_normals, normals, atol=1.0 / 127 + 1e-6)
+        np.testing.assert_allclose(new_uvs, uvs, atol=1.0 / 65535 + 1e-6)
+    assert "KHR_mesh_quantization" in gltf["extensionsRequired"]
+    accessors = gltf["accessors"]
+    prims = [mesh["primitives"][0] for mesh in gltf["meshes"]]
+    # 两个网格的法线、UV 和索引合并成同一份数据；位置各自带着节点变换，也共用同一份量化结果
+    for key in ("NORMAL", "TEXCOORD_0", "POSITION"):
+        assert prims[0]["attributes"][key] == prims[1]["attributes"][key]
+    assert prims[0]["indices"] == prims[1]["indices"]
+    assert accessors[prims[0]["indices"]]["componentType"] == 5123
+    assert len(gltf["bufferViews"]) == 4
+
+    # 再次优化没有可节省的内容
+    stats = assistant.optimize_glb(str(path))
+    assert stats["总计"] == 0
+
+
+def test_reorder_glb_vertex_cache_keeps_geometry(assistant, tmp_path):
+    path = tmp_path / "model.glb"
+    tris, positions, normals, uvs = build_glb(assistant, path, np.random.default_rng(8), size=20)
+    before = triangle_set(tris, positions.astype(np.float64), normals.astype(np.float64), uvs.astype(np.float64))
+
+    stats = assistant.optimize_glb(str(path), optimize=False, reorder=True)
+    assert [name for name, _, _ in stats["ACMR"]] == ["A", "B"]
+    for _, acmr_before, acmr_after in stats["ACMR"]:
+        assert acmr_after < 0.8 * acmr_before
+
+    gltf, binary = assistant.read_glb(str(path))
+    views = assistant.split_buffer_views(gltf, binary)
+    for mesh in gltf["meshes"]:
+        prim = mesh["primitives"][0]
+        new_tris = assistant.read_accessor(gltf, views, prim["indices"]).astype(np.int64).reshape(-1, 3)
+        attributes = [assistant.read_accessor(gltf, views, prim["attributes"][key]).astype(np.float64)
+                      for key in ("POSITION", "NORMAL", "TEXCOORD_0")]
+        assert np.array_equal(triangle_set(new_tris, *attributes), before)
+        # 顶点按首次引用排列
+        assert assistant.first_occurrence_order(new_tris.ravel(), len(attributes[0])).tolist() \
+            == list(range(len(attributes[0])))
+        cache_size = assistant.VERTEX_CACHE_SIZE
+        assert reference_acmr(new_tris, cache_size) < 0.8 * reference_acmr(tris, cache_size)
+
+
+def test_optimize_glb_skips_compressed_files(assistant, tmp_path):
+    path = tmp_path / "draco.glb"
+    assistant.write_glb(str(path), {"asset": {"version": "2.0"},
+                                    "extensionsUsed": ["KHR_draco_mesh_compression"]}, b"")
+    data = path.read_bytes()
+    assert assistant.optimize_glb(str(path)) is None
+    assert path.read_bytes() == data
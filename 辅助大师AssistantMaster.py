@@ -11,6 +11,14 @@ bl_info = {
 import bpy
 import bmesh
 import os
+import subprocess
+import tempfile
+import shutil
+import json
+import time
+import hashlib
+
+import numpy as np
 
 
 # ---------------------------------------------------------
@@ -117,6 +125,176 @@ class OBJECT_OT_add_weighted_normal(bpy.types.Operator):
         return {'FINISHED'}
 
 
+# ---------------------------------------------------------
+# 对象模式：顶点缓存优化 (Tipsify)
+# ---------------------------------------------------------
+VERTEX_CACHE_SIZE = 16
+# 新顺序的 ACMR 至少降低这个比例才写回网格，避免重复导出时反复改动顶点顺序
+VERTEX_CACHE_MIN_GAIN = 0.01
+
+
+def read_mesh_triangles(mesh):
+    """返回 (三角形顶点索引 (T, 3), 每个三角形所属的面)"""
+    mesh.calc_loop_triangles()
+    count = len(mesh.loop_triangles)
+    tris = np.empty(count * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", tris)
+    polys = np.empty(count, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("polygon_index", polys)
+    return tris.reshape(-1, 3), polys
+
+
+def simulate_acmr(tris, cache_size=VERTEX_CACHE_SIZE):
+    """FIFO 顶点缓存下每个三角形的平均缓存未命中数 (ACMR)"""
+    if not len(tris):
+        return 0.0
+    stamps = [-cache_size - 1] * (int(tris.max()) + 1)
+    misses = 0
+    for v in tris.ravel().tolist():
+        if misses - stamps[v] > cache_size:
+            stamps[v] = misses
+            misses += 1
+    return misses / len(tris)
+
+
+def tipsify(tris, vert_count, cache_size=VERTEX_CACHE_SIZE):
+    """Tipsify 三角形排序 (Sander 等, 2007)，返回新的三角形顺序
+
+    顶点到三角形的邻接表用 NumPy 构建；扇形遍历本身是顺序的，用列表循环完成
+    """
+    flat = tris.ravel()
+    order = np.argsort(flat, kind="stable")
+    offsets = np.zeros(vert_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(flat, minlength=vert_count), out=offsets[1:])
+    adjacency = (order // 3).tolist()
+    offsets = offsets.tolist()
+    tri_list = tris.tolist()
+    live = np.bincount(flat, minlength=vert_count).tolist()
+    cache_time = [-cache_size - 1] * vert_count
+    emitted = [False] * len(tri_list)
+    dead_end = []
+    output = []
+    time_stamp = 0
+    cursor = 0
+    fanning = int(flat[0]) if len(flat) else -1
+
+    while fanning >= 0:
+        candidates = []
+        for t in adjacency[offsets[fanning]:offsets[fanning + 1]]:
+            if emitted[t]:
+                continue
+            for v in tri_list[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if time_stamp - cache_time[v] > cache_size:
+                    cache_time[v] = time_stamp
+                    time_stamp += 1
+            emitted[t] = True
+            output.append(t)
+
+        # 下一个扇形中心: 仍有未输出三角形、且扇开后仍留在缓存中的候选顶点里最早进入缓存的
+        fanning, best = -1, -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = 0
+                if time_stamp - cache_time[v] + 2 * live[v] <= cache_size:
+                    priority = time_stamp - cache_time[v]
+                if priority > best:
+                    fanning, best = v, priority
+        if fanning < 0:
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fanning = v
+                    break
+        while fanning < 0 and cursor < vert_count:
+            if live[cursor] > 0:
+                fanning = cursor
+            cursor += 1
+    return np.array(output, dtype=np.int64)
+
+
+def first_occurrence_order(values, count):
+    """按在 values 中第一次出现的先后给 0..count-1 排名；没有出现的排在最后"""
+    unique, first = np.unique(values, return_index=True)
+    rank = np.full(count, count, dtype=np.int64)
+    rank[unique[np.argsort(first)]] = np.arange(len(unique))
+    missing = rank == count
+    rank[missing] = len(unique) + np.arange(missing.sum())
+    return rank
+
+
+def optimize_mesh_vertex_cache(mesh, cache_size=VERTEX_CACHE_SIZE):
+    """按 Tipsify 顺序重排网格的面，再按首次引用重排顶点；返回 (优化前 ACMR, 优化后 ACMR)
+
+    只改变面和顶点的存储顺序，不三角化、不改变几何；没有明显改善时网格保持不变
+    """
+    tris, polys = read_mesh_triangles(mesh)
+    before = simulate_acmr(tris, cache_size)
+    if not len(tris):
+        return before, before
+
+    tri_order = tipsify(tris, len(mesh.vertices), cache_size)
+    # 导出时每个面的三角形是连续的，所以按三角形新顺序中面第一次出现的先后排面
+    face_rank = first_occurrence_order(polys[tri_order], len(mesh.polygons))
+    tri_by_face = np.argsort(face_rank[polys], kind="stable")
+    if simulate_acmr(tris[tri_by_face], cache_size) > before * (1.0 - VERTEX_CACHE_MIN_GAIN):
+        return before, before
+    vert_rank = first_occurrence_order(tris[tri_by_face].ravel(), len(mesh.vertices))
+
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bm.faces.sort(key=lambda f: face_rank[f.index])
+    bm.verts.sort(key=lambda v: vert_rank[v.index])
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.update()
+
+    tris, _ = read_mesh_triangles(mesh)
+    return before, simulate_acmr(tris, cache_size)
+
+
+def optimize_objects_vertex_cache(objects, cache_size=VERTEX_CACHE_SIZE):
+    """优化对象的网格（共享的网格只处理一次），返回 [(网格名, 优化前 ACMR, 优化后 ACMR)] 并打印到控制台"""
+    results = []
+    meshes = {obj.data for obj in objects if obj.type == 'MESH'}
+    for mesh in sorted(meshes, key=lambda m: m.name):
+        before, after = optimize_mesh_vertex_cache(mesh, cache_size)
+        results.append((mesh.name, before, after))
+        print(f"顶点缓存优化: {mesh.name:<32} ACMR {before:.3f} -> {after:.3f}")
+    return results
+
+
+class OBJECT_OT_optimize_vertex_cache(bpy.types.Operator):
+    """按顶点缓存局部性重排所选网格的面和顶点顺序 (Tipsify)，报告优化前后的 ACMR"""
+    bl_idname = "object.optimize_vertex_cache"
+    bl_label = "优化顶点缓存"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    cache_size: bpy.props.IntProperty(
+        name="缓存大小",
+        min=4, max=64, default=VERTEX_CACHE_SIZE,
+        description="模拟的 GPU 顶点缓存条目数"
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'OBJECT'
+
+    def execute(self, context):
+        selected_objs = [obj for obj in context.selected_editable_objects if obj.type == 'MESH']
+        if not selected_objs:
+            self.report({'WARNING'}, "未选择任何网格对象")
+            return {'CANCELLED'}
+
+        results = optimize_objects_vertex_cache(selected_objs, self.cache_size)
+        before = sum(r[1] for r in results) / len(results)
+        after = sum(r[2] for r in results) / len(results)
+        self.report({'INFO'}, f"已优化 {len(results)} 个网格, 平均 ACMR {before:.3f} -> {after:.3f}（详见控制台）")
+        return {'FINISHED'}
+
+
 # ---------------------------------------------------------
 # 对象模式：GLB 导出器 (智能路径修复版)
 # ---------------------------------------------------------
@@ -134,24 +312,8 @@ class OBJECT_OT_export_selected_glb(bpy.types.Operator):
         scn = context.scene
         props = scn.modeling_assistant_props
 
-        # 1. 确定文件名
-        target_name = props.export_custom_name if props.use_custom_name else context.selected_objects[0].name
-        safe_name = "".join(c for c in target_name if c.isalnum() or c in (' ', '_', '-')).strip() or "export"
-
-        # 2. 确定文件夹路径 (核心修改)
-        blend_path = bpy.data.filepath
-        if props.use_custom_path:
-            export_dir = props.export_custom_path
-        else:
-            if not blend_path:
-                # 如果 .blend 文件未保存，使用桌面/文档作为 fallback 并自动创建文件夹
-                fallback_dir = os.path.join(os.path.expanduser("~"), "Documents", "Blender_Exports")
-                export_dir = fallback_dir
-            else:
-                # 默认在 .blend 文件旁新建 "Exports" 文件夹
-                export_dir = os.path.join(os.path.dirname(blend_path), "Exports")
-
-        # 确保文件夹存在
+        # 1. 确定文件夹路径并确保存在
+        export_dir = resolve_export_dir(props)
         if not os.path.exists(export_dir):
             try:
                 os.makedirs(export_dir)
@@ -159,57 +321,21 @@ class OBJECT_OT_export_selected_glb(bpy.types.Operator):
                 self.report({'ERROR'}, f"无法创建文件夹: {export_dir}\n{e}")
                 return {'CANCELLED'}
 
-        # 3. 组合最终完整路径
-        final_path = os.path.join(export_dir, f"{safe_name}.glb")
-
-        # 4. 构建导出参数字典 (保持稳定)
-        export_args = {
-            'filepath': final_path,
-            'export_format': 'GLB',
-            'use_selection': True,
-
-            # --- 几何体 (Meshes) ---
-            'export_apply': props.export_apply_transforms,
-            'export_morph': props.export_shape_keys,
-            'export_morph_normal': props.export_shape_keys_normal,
-            'export_morph_tangent': props.export_shape_keys_tangent,
-            'export_attributes': props.export_custom_attributes,
-
-            # --- 拓扑与压缩 ---
-            'export_draco_mesh_compression_enable': props.export_draco,
-
-            # --- 材质与纹理 ---
-            'export_image_format': props.export_image_format,
-            'export_materials': props.export_materials_mode,
-            'export_texcoords': props.export_uvs,
-            'export_normals': props.export_normals,
-            'export_tangents': props.export_tangents,
-
-            # --- 动画 (Animations) ---
-            'export_animations': props.export_animations,
-            'export_animation_mode': props.export_animation_mode,
-            'export_force_sampling': props.export_force_sampling,
-            'export_nla_strips': props.export_nla_strips,
-
-            # --- 动画优化 ---
-            'export_optimize_animation_size': props.export_optimize_animation_size,
-            'export_anim_single_armature': props.export_anim_single_armature,
-            'export_reset_pose_bones': props.export_reset_pose_bones,
-
-            # --- 骨骼 (Skinning) ---
-            'export_skins': props.export_skins,
-            'export_all_influences': props.export_all_influences,
-
-            # --- 场景 ---
-            'export_cameras': props.export_cameras,
-            'export_lights': props.export_lights,
-            'export_extras': props.export_extras,
-            'export_yup': True,
-        }
-
-        # 5. 执行导出
+        # 2. 确定每个文件的名称和参数，增量导出时跳过内容没有变化的文件
+        jobs, skipped = self.collect_jobs(context, props, export_dir)
+        if not jobs:
+            self.report({'INFO'}, f"内容未改变，跳过 {skipped} 个文件")
+            return {'FINISHED'}
+
+        # 3. 执行导出
+        if props.export_background:
+            return self.execute_background(jobs, skipped, props.export_workers)
+        if props.export_split_mode != 'NONE':
+            return self.execute_split(jobs, skipped, props.export_workers)
+
+        job = jobs[0]
         try:
-            bpy.ops.export_scene.gltf(**export_args)
+            bpy.ops.export_scene.gltf(**job["args"])
         except TypeError as e:
             self.report({'ERROR'}, f"参数错误: {str(e)}\n建议检查导出器版本或手动导出。")
             return {'CANCELLED'}
@@ -217,10 +343,1195 @@ class OBJECT_OT_export_selected_glb(bpy.types.Operator):
             self.report({'ERROR'}, f"导出失败: {str(e)}")
             return {'CANCELLED'}
 
-        self.report({'INFO'}, f"GLB 导出成功: {final_path}")
+        message = f"GLB 导出成功: {job['args']['filepath']}"
+        try:
+            stats = finish_export_job(job)
+        except (OSError, ValueError) as e:
+            self.report({'WARNING'}, f"{message}，但 GLB 优化失败: {e}")
+            return {'FINISHED'}
+        if stats:
+            message += f"，优化节省 {stats['总计'] / 1024:.1f} KB（详见控制台）"
+        self.report({'INFO'}, message)
+        return {'FINISHED'}
+
+    def collect_jobs(self, context, props, export_dir):
+        """返回 (导出任务列表, 因内容未改变而跳过的数量)
+
+        拆分导出时每个资产一个任务，否则所有选中对象一个任务；增量导出时任务带有内容哈希
+        """
+        if props.export_split_mode != 'NONE':
+            groups = group_export_targets(context.selected_objects, props.export_split_mode)
+        else:
+            target_name = props.export_custom_name if props.use_custom_name else context.selected_objects[0].name
+            groups = {target_name: list(context.selected_objects)}
+
+        manifest = load_export_manifest(export_dir) if props.export_incremental else None
+        jobs = []
+        skipped = 0
+        used_names = set()
+        for name, objects in groups.items():
+            file_name = unique_file_name(safe_file_name(name), used_names)
+            filepath = os.path.join(export_dir, f"{file_name}.glb")
+            job = {"name": name, "objects": [obj.name for obj in objects],
+                   "args": build_export_args(props, filepath),
+                   "optimize": props.export_optimize_glb,
+                   "reorder": props.export_optimize_vertex_cache}
+            if manifest is not None:
+                job["hash"] = asset_content_hash(context, objects, {**job["args"], "optimize": job["optimize"],
+                                                                    "reorder": job["reorder"]})
+                if is_export_unchanged(manifest, filepath, job["hash"]):
+                    skipped += 1
+                    continue
+            jobs.append(job)
+        return jobs, skipped
+
+    def execute_split(self, jobs, skipped, workers):
+        t0 = time.perf_counter()
+        try:
+            results = run_split_export(jobs, workers)
+        except (OSError, RuntimeError) as e:
+            self.report({'ERROR'}, f"拆分导出失败: {e}")
+            return {'CANCELLED'}
+        elapsed = time.perf_counter() - t0
+
+        jobs_by_path = {job["args"]["filepath"]: job for job in jobs}
+        for r in results:
+            if not r["error"]:
+                try:
+                    finish_export_job(jobs_by_path[r["filepath"]])
+                except (OSError, ValueError) as e:
+                    r["error"] = f"GLB 优化失败: {e}"
+                r["size"] = os.path.getsize(r["filepath"])
+
+        print_export_summary(results, elapsed)
+        failed = [r for r in results if r["error"]]
+        total_size = sum(r["size"] for r in results)
+        message = (f"拆分导出完成: {len(results) - len(failed)} 个文件, 共 {total_size / 1048576:.2f} MB, "
+                   f"用时 {elapsed:.1f}s")
+        if skipped:
+            message += f", 跳过 {skipped} 个（未改变）"
+        if failed:
+            self.report({'WARNING'}, f"{message}, 失败 {len(failed)} 个（详见控制台）")
+        else:
+            self.report({'INFO'}, message)
+        return {'FINISHED'}
+
+    def execute_background(self, jobs, skipped, workers):
+        try:
+            replaced = enqueue_export_jobs(jobs, workers)
+        except (OSError, RuntimeError) as e:
+            self.report({'ERROR'}, f"无法保存导出快照: {e}")
+            return {'CANCELLED'}
+        message = f"已加入后台导出队列: {len(jobs)} 个文件"
+        if replaced:
+            message += f", 替换 {replaced} 个排队中的旧任务"
+        if skipped:
+            message += f", 跳过 {skipped} 个（未改变）"
+        self.report({'INFO'}, message)
+        return {'FINISHED'}
+
+
+# ---------------------------------------------------------
+# GLB 导出: 路径、参数与拆分导出
+# ---------------------------------------------------------
+def resolve_export_dir(props):
+    """自定义路径，或 .blend 旁的 "Exports" 文件夹；未保存时用 文档/Blender_Exports"""
+    if props.use_custom_path:
+        return bpy.path.abspath(props.export_custom_path)
+    blend_path = bpy.data.filepath
+    if not blend_path:
+        return os.path.join(os.path.expanduser("~"), "Documents", "Blender_Exports")
+    return os.path.join(os.path.dirname(blend_path), "Exports")
+
+
+def safe_file_name(name):
+    return "".join(c for c in name if c.isalnum() or c in (' ', '_', '-')).strip() or "export"
+
+
+def unique_file_name(name, used_names):
+    """拆分导出时避免不同资产清洗后重名"""
+    candidate, index = name, 1
+    while candidate.lower() in used_names:
+        index += 1
+        candidate = f"{name}_{index}"
+    used_names.add(candidate.lower())
+    return candidate
+
+
+def build_export_args(props, filepath):
+    """按面板设置构建 export_scene.gltf 的参数字典 (保持稳定)"""
+    return {
+        'filepath': filepath,
+        'export_format': 'GLB',
+        'use_selection': True,
+
+        # --- 几何体 (Meshes) ---
+        'export_apply': props.export_apply_transforms,
+        'export_morph': props.export_shape_keys,
+        'export_morph_normal': props.export_shape_keys_normal,
+        'export_morph_tangent': props.export_shape_keys_tangent,
+        'export_attributes': props.export_custom_attributes,
+
+        # --- 拓扑与压缩 ---
+        'export_draco_mesh_compression_enable': props.export_draco,
+
+        # --- 材质与纹理 ---
+        'export_image_format': props.export_image_format,
+        'export_materials': props.export_materials_mode,
+        'export_texcoords': props.export_uvs,
+        'export_normals': props.export_normals,
+        'export_tangents': props.export_tangents,
+
+        # --- 动画 (Animations) ---
+        'export_animations': props.export_animations,
+        'export_animation_mode': props.export_animation_mode,
+        'export_force_sampling': props.export_force_sampling,
+        'export_nla_strips': props.export_nla_strips,
+
+        # --- 动画优化 ---
+        'export_optimize_animation_size': props.export_optimize_animation_size,
+        'export_anim_single_armature': props.export_anim_single_armature,
+        'export_reset_pose_bones': props.export_reset_pose_bones,
+
+        # --- 骨骼 (Skinning) ---
+        'export_skins': props.export_skins,
+        'export_all_influences': props.export_all_influences,
+
+        # --- 场景 ---
+        'export_cameras': props.export_cameras,
+        'export_lights': props.export_lights,
+        'export_extras': props.export_extras,
+        'export_yup': True,
+    }
+
+
+def top_level_parent(obj):
+    while obj.parent:
+        obj = obj.parent
+    return obj
+
+
+def group_export_targets(objects, mode):
+    """按拆分方式把选中对象分组，返回 {资产名: [对象]}
+
+    OBJECT: 每个选中对象单独一个文件
+    PARENT: 按最顶层父级分组，整个层级（父级和全部子级）导出到一个文件
+    COLLECTION: 按对象所在的第一个集合分组，只包含选中的对象
+    """
+    groups = {}
+    for obj in objects:
+        if mode == 'OBJECT':
+            groups[obj.name] = [obj]
+        elif mode == 'PARENT':
+            root = top_level_parent(obj)
+            if root.name not in groups:
+                groups[root.name] = [root] + list(root.children_recursive)
+        elif mode == 'COLLECTION':
+            collection = obj.users_collection[0] if obj.users_collection else None
+            name = collection.name if collection else "Scene"
+            groups.setdefault(name, []).append(obj)
+    return groups
+
+
+def write_export_snapshot(directory):
+    """把当前状态（含未保存的修改）另存为临时 .blend，供后台进程读取"""
+    path = os.path.join(directory, "export_snapshot.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=path, copy=True)
+    return path
+
+
+# 后台进程执行的脚本: 读取任务列表，逐个选中对象并导出，把每个任务的用时和错误写入结果文件
+EXPORT_WORKER_EXPR = """
+import bpy, json, sys, time
+job_path, result_path = sys.argv[sys.argv.index("--") + 1:][:2]
+with open(job_path, encoding="utf-8") as f:
+    jobs = json.load(f)
+results = []
+for job in jobs:
+    t0 = time.perf_counter()
+    error = None
+    try:
+        for obj in bpy.context.view_layer.objects:
+            obj.select_set(False)
+        for name in job["objects"]:
+            bpy.data.objects[name].select_set(True)
+        bpy.ops.export_scene.gltf(**job["args"])
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    results.append({"name": job["name"], "seconds": time.perf_counter() - t0, "error": error})
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False)
+"""
+
+
+def start_export_worker(snapshot, jobs, directory, index):
+    """启动一个后台 Blender 进程处理 jobs，返回 (进程, 结果文件路径, 日志路径)"""
+    job_path = os.path.join(directory, f"jobs_{index}.json")
+    result_path = os.path.join(directory, f"result_{index}.json")
+    log_path = os.path.join(directory, f"worker_{index}.log")
+    with open(job_path, "w", encoding="utf-8") as f:
+        json.dump(jobs, f, ensure_ascii=False)
+    command = [bpy.app.binary_path, "-b", snapshot, "--factory-startup",
+               "--python-expr", EXPORT_WORKER_EXPR, "--", job_path, result_path]
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    return process, result_path, log_path
+
+
+def read_worker_results(jobs, result_path, log_path):
+    """读取进程结果；进程崩溃时没有结果的任务记为失败，并附上日志末尾"""
+    results = {}
+    if os.path.exists(result_path):
+        with open(result_path, encoding="utf-8") as f:
+            results = {r["name"]: r for r in json.load(f)}
+    log_tail = ""
+    if len(results) < len(jobs) and os.path.exists(log_path):
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            log_tail = "".join(f.readlines()[-10:])
+    merged = []
+    for job in jobs:
+        result = results.get(job["name"]) or {"name": job["name"], "seconds": 0.0,
+                                              "error": f"后台进程异常退出\n{log_tail}"}
+        path = job["args"]["filepath"]
+        result["filepath"] = path
+        result["size"] = os.path.getsize(path) if not result["error"] and os.path.exists(path) else 0
+        merged.append(result)
+    return merged
+
+
+def run_split_export(jobs, workers):
+    """保存快照，把任务平均分给多个后台进程并等待全部完成，返回每个文件的结果"""
+    if not jobs:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    directory = tempfile.mkdtemp(prefix="glb_export_")
+    try:
+        snapshot = write_export_snapshot(directory)
+        chunks = [jobs[i::workers] for i in range(workers)]
+        running = [(chunk, *start_export_worker(snapshot, chunk, directory, i)) for i, chunk in enumerate(chunks)]
+        results = []
+        for chunk, process, result_path, log_path in running:
+            process.wait()
+            results.extend(read_worker_results(chunk, result_path, log_path))
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def print_export_summary(results, elapsed):
+    """在控制台打印每个文件的大小和用时"""
+    print(f"GLB 拆分导出: {len(results)} 个文件, 用时 {elapsed:.1f}s")
+    for r in sorted(results, key=lambda r: r["seconds"], reverse=True):
+        status = f"失败: {r['error']}" if r["error"] else f"{r['size'] / 1024:>10.1f} KB"
+        print(f"  {os.path.basename(r['filepath']):<40} {r['seconds']:>7.2f}s  {status}")
+
+
+# ---------------------------------------------------------
+# GLB 导出: 后台队列
+# ---------------------------------------------------------
+# 队列中的任务: 名称、参数、状态 (QUEUED / RUNNING / DONE / FAILED)、进程、用时和文件大小
+_export_queue = []
+_export_queue_state = {"workers": 1, "next_id": 0}
+
+EXPORT_QUEUE_POLL_INTERVAL = 0.5
+EXPORT_QUEUE_ICONS = {'QUEUED': 'TIME', 'RUNNING': 'PLAY', 'DONE': 'CHECKMARK', 'FAILED': 'ERROR'}
+
+
+def enqueue_export_jobs(jobs, workers):
+    """保存当前状态的快照并把任务加入队列，返回被替换的排队中旧任务数量
+
+    同一输出文件还在排队的旧任务直接移除；已经在运行的不受影响，新任务等它结束后才启动并覆盖输出
+    """
+    directory = tempfile.mkdtemp(prefix="glb_export_")
+    try:
+        snapshot = write_export_snapshot(directory)
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    targets = {job["args"]["filepath"] for job in jobs}
+    stale = [entry for entry in _export_queue if entry["status"] == 'QUEUED' and entry["filepath"] in targets]
+    for entry in stale:
+        _export_queue.remove(entry)
+
+    for job in jobs:
+        _export_queue.append({
+            "job": job,
+            "name": job["name"],
+            "filepath": job["args"]["filepath"],
+            "status": 'QUEUED',
+            "snapshot": snapshot,
+            "directory": directory,
+            "process": None,
+            "started": 0.0,
+            "seconds": 0.0,
+            "size": 0,
+            "error": None,
+        })
+    _export_queue_state["workers"] = workers or os.cpu_count() or 1
+    release_export_snapshots(stale)
+    if not bpy.app.timers.is_registered(poll_export_queue):
+        # persistent: 打开其他文件后队列继续运行，否则排队的任务永远不会启动
+        bpy.app.timers.register(poll_export_queue, first_interval=0.1, persistent=True)
+    return len(stale)
+
+
+def finish_export_entry(entry):
+    job = entry["job"]
+    result = read_worker_results([job], entry["result_path"], entry["log_path"])[0]
+    entry["process"] = None
+    entry["seconds"] = time.perf_counter() - entry["started"]
+    entry["error"] = result["error"]
+    if not entry["error"]:
+        try:
+            finish_export_job(job)
+        except (OSError, ValueError) as e:
+            entry["error"] = f"GLB 优化失败: {e}"
+    entry["size"] = os.path.getsize(entry["filepath"]) if os.path.exists(entry["filepath"]) else 0
+    entry["status"] = 'FAILED' if entry["error"] else 'DONE'
+    if entry["error"]:
+        print(f"GLB 后台导出失败: {entry['filepath']}\n{entry['error']}")
+
+
+def release_export_snapshots(removed=()):
+    """删除已经没有排队或运行中任务引用的快照目录，removed 为刚从队列中移除的任务"""
+    active = {entry["directory"] for entry in _export_queue if entry["status"] in {'QUEUED', 'RUNNING'}}
+    for entry in [*_export_queue, *removed]:
+        if entry["directory"] not in active and os.path.isdir(entry["directory"]):
+            shutil.rmtree(entry["directory"], ignore_errors=True)
+
+
+def redraw_view3d():
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+
+def poll_export_queue():
+    """定时器回调: 收集结束的进程，按进程数上限启动排队中的任务；队列空闲后停止"""
+    for entry in _export_queue:
+        if entry["status"] == 'RUNNING' and entry["process"].poll() is not None:
+            finish_export_entry(entry)
+
+    busy = {entry["filepath"] for entry in _export_queue if entry["status"] == 'RUNNING'}
+    for entry in _export_queue:
+        if len(busy) >= _export_queue_state["workers"]:
+            break
+        # 同一输出文件的上一个导出还在运行时先等它结束，避免两个进程同时写一个文件
+        if entry["status"] != 'QUEUED' or entry["filepath"] in busy:
+            continue
+        index = _export_queue_state["next_id"]
+        _export_queue_state["next_id"] += 1
+        try:
+            entry["process"], entry["result_path"], entry["log_path"] = start_export_worker(
+                entry["snapshot"], [entry["job"]], entry["directory"], index)
+        except OSError as e:
+            entry["status"] = 'FAILED'
+            entry["error"] = f"无法启动后台进程: {e}"
+            continue
+        entry["status"] = 'RUNNING'
+        entry["started"] = time.perf_counter()
+        busy.add(entry["filepath"])
+
+    release_export_snapshots()
+    redraw_view3d()
+    if any(entry["status"] in {'QUEUED', 'RUNNING'} for entry in _export_queue):
+        return EXPORT_QUEUE_POLL_INTERVAL
+    return None
+
+
+def stop_export_queue():
+    """注销插件时停止定时器并结束运行中的进程"""
+    if bpy.app.timers.is_registered(poll_export_queue):
+        bpy.app.timers.unregister(poll_export_queue)
+    for entry in _export_queue:
+        if entry["status"] == 'RUNNING':
+            entry["process"].terminate()
+            entry["process"].wait()
+        entry["status"] = 'FAILED' if entry["status"] in {'QUEUED', 'RUNNING'} else entry["status"]
+    release_export_snapshots()
+    _export_queue.clear()
+
+
+class OBJECT_OT_clear_glb_export_queue(bpy.types.Operator):
+    """从后台导出队列中移除已完成和失败的任务"""
+    bl_idname = "object.clear_glb_export_queue"
+    bl_label = "清除已完成"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        _export_queue[:] = [entry for entry in _export_queue if entry["status"] in {'QUEUED', 'RUNNING'}]
         return {'FINISHED'}
 
 
+# ---------------------------------------------------------
+# GLB 导出: 增量导出（内容哈希清单）
+# ---------------------------------------------------------
+EXPORT_MANIFEST_NAME = "export_manifest.json"
+
+# 属性数据类型 -> (foreach 字段名, 分量数, numpy 类型)
+ATTRIBUTE_FIELDS = {
+    'FLOAT': ("value", 1, np.float32),
+    'INT': ("value", 1, np.int32),
+    'INT8': ("value", 1, np.int8),
+    'BOOLEAN': ("value", 1, np.bool_),
+    'FLOAT2': ("vector", 2, np.float32),
+    'INT32_2D': ("value", 2, np.int32),
+    'FLOAT_VECTOR': ("vector", 3, np.float32),
+    'FLOAT_COLOR': ("color", 4, np.float32),
+    'BYTE_COLOR': ("color", 4, np.float32),
+    'QUATERNION': ("value", 4, np.float32),
+}
+
+# 不影响导出结果的属性: 引用计数、GPU 句柄、节点在编辑器里的位置和选择状态等；pixels 太大，图片另行处理
+RNA_HASH_SKIP = {
+    "rna_type", "name_full", "users", "use_fake_user", "use_extra_user", "tag", "is_evaluated",
+    "session_uid", "is_runtime_data", "is_missing", "bindcode", "pixels", "is_dirty",
+    "location", "location_absolute", "select", "width", "width_hidden", "height", "dimensions",
+    "hide", "show_options", "show_preview", "show_texture", "use_custom_color",
+}
+
+
+def load_export_manifest(export_dir):
+    """读取导出目录中的清单 {文件名: 内容哈希}，不存在或损坏时返回空清单"""
+    try:
+        with open(os.path.join(export_dir, EXPORT_MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_export_manifest(export_dir, manifest):
+    with open(os.path.join(export_dir, EXPORT_MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+
+def is_export_unchanged(manifest, filepath, content_hash):
+    return manifest.get(os.path.basename(filepath)) == content_hash and os.path.exists(filepath)
+
+
+def finish_export_job(job):
+    """导出成功后的收尾: 按需优化 GLB，再记录内容哈希；返回优化的统计（未优化时为 None）"""
+    stats = None
+    if job.get("optimize") or job.get("reorder"):
+        stats = optimize_glb(job["args"]["filepath"], job.get("optimize", False), job.get("reorder", False))
+        print_optimize_stats(job["args"]["filepath"], stats)
+    record_export_hash(job)
+    return stats
+
+
+def record_export_hash(job):
+    """导出成功后把任务的内容哈希写入清单（非增量导出的任务没有哈希）"""
+    if "hash" not in job:
+        return
+    filepath = job["args"]["filepath"]
+    export_dir = os.path.dirname(filepath)
+    manifest = load_export_manifest(export_dir)
+    manifest[os.path.basename(filepath)] = job["hash"]
+    save_export_manifest(export_dir, manifest)
+
+
+def hash_foreach(digest, collection, field, count, dtype):
+    """用 foreach_get 读出 collection 的 field 并写入 digest"""
+    values = np.empty(len(collection) * count, dtype=dtype)
+    try:
+        collection.foreach_get(field, values)
+    except (TypeError, RuntimeError):
+        values = [0] * (len(collection) * count)
+        collection.foreach_get(field, values)
+        values = np.asarray(values, dtype=dtype)
+    digest.update(values.tobytes())
+
+
+def hash_rna_properties(digest, data):
+    """把 data 的简单属性（布尔、数值、字符串、枚举）写入 digest，跳过界面状态和运行时信息"""
+    for prop in data.bl_rna.properties:
+        if prop.type in {'POINTER', 'COLLECTION'} or prop.identifier in RNA_HASH_SKIP:
+            continue
+        value = getattr(data, prop.identifier, None)
+        if hasattr(value, "__len__") and not isinstance(value, str):
+            value = tuple(value)
+        digest.update(f"{prop.identifier}={value!r};".encode())
+
+
+def hash_mesh(digest, mesh):
+    """拓扑、全部属性（位置、UV、颜色、材质索引等）和面拐法线"""
+    hash_foreach(digest, mesh.loops, "vertex_index", 1, np.int32)
+    hash_foreach(digest, mesh.polygons, "loop_start", 1, np.int32)
+    for attr in sorted(mesh.attributes, key=lambda a: a.name):
+        digest.update(f"{attr.name}:{attr.domain}:{attr.data_type};".encode())
+        field = ATTRIBUTE_FIELDS.get(attr.data_type)
+        if field:
+            hash_foreach(digest, attr.data, *field)
+    normals = getattr(mesh, "corner_normals", None)
+    if normals is not None:
+        hash_foreach(digest, normals, "vector", 3, np.float32)
+
+
+def hash_vertex_groups(digest, obj, mesh):
+    """顶点组名称和每个顶点的组权重（导出蒙皮权重时用到）"""
+    digest.update(("groups:" + "|".join(group.name for group in obj.vertex_groups) + ";").encode())
+    if not len(obj.vertex_groups):
+        return
+    # 每个顶点的组数不定，没有 foreach 接口，只能逐个读取
+    weights = [(vert.index, element.group, element.weight) for vert in mesh.vertices for element in vert.groups]
+    digest.update(np.array(weights, dtype=np.float64).tobytes())
+
+
+def id_property_value(value):
+    """自定义属性转为可 JSON 序列化的值（IDPropertyGroup / IDPropertyArray 的 repr 带内存地址，每次都不同）"""
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if hasattr(value, "to_list"):
+        return value.to_list()
+    return value
+
+
+def hash_custom_properties(digest, data):
+    values = {key: id_property_value(data[key]) for key in data.keys()}
+    # 引用其他数据块的属性用数据块名称
+    digest.update(json.dumps(values, sort_keys=True,
+                             default=lambda value: getattr(value, "name_full", str(value))).encode())
+
+
+def hash_node_tree(digest, tree, seen):
+    """节点、输入默认值、连线、引用的图片和节点组"""
+    if tree is None or tree.name in seen:
+        return
+    seen.add(tree.name)
+    for node in sorted(tree.nodes, key=lambda n: n.name):
+        digest.update(f"{node.name}:{node.bl_idname};".encode())
+        hash_rna_properties(digest, node)
+        for socket in node.inputs:
+            value = getattr(socket, "default_value", None)
+            if hasattr(value, "__len__") and not isinstance(value, str):
+                value = tuple(value)
+            digest.update(f"{socket.identifier}={value!r};".encode())
+        if getattr(node, "image", None):
+            hash_image(digest, node.image)
+        if getattr(node, "node_tree", None):
+            hash_node_tree(digest, node.node_tree, seen)
+    for link in tree.links:
+        digest.update(f"{link.from_node.name}.{link.from_socket.identifier}>"
+                      f"{link.to_node.name}.{link.to_socket.identifier};".encode())
+
+
+def hash_image(digest, image):
+    """打包的图片哈希数据本身；外部文件用路径、大小和修改时间；有未保存修改时总是视为改变
+
+    不用 hash_rna_properties: has_data、size 等取决于图片是否已经加载，同一张图片前后两次哈希会不同
+    """
+    digest.update(f"image:{image.name}:{image.source}:{image.filepath}:{image.file_format}:{image.alpha_mode}:"
+                  f"{image.colorspace_settings.name};".encode())
+    if image.source == 'GENERATED':
+        digest.update(f"{image.generated_type}:{image.generated_width}:{image.generated_height}:"
+                      f"{tuple(image.generated_color)};".encode())
+    if image.packed_file:
+        digest.update(image.packed_file.data)
+    else:
+        path = bpy.path.abspath(image.filepath_raw)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns};".encode())
+    if image.is_dirty:
+        digest.update(str(time.time()).encode())
+
+
+def iter_action_fcurves(action):
+    """分层动作（4.4+）遍历所有通道包，旧版动作直接用 fcurves"""
+    layers = getattr(action, "layers", None)
+    if layers:
+        for layer in layers:
+            for strip in layer.strips:
+                for channelbag in getattr(strip, "channelbags", ()):
+                    yield from channelbag.fcurves
+    else:
+        yield from action.fcurves
+
+
+def hash_fcurve(digest, fcurve):
+    digest.update(f"{fcurve.data_path}[{fcurve.array_index}];".encode())
+    points = fcurve.keyframe_points
+    for field in ("co", "handle_left", "handle_right"):
+        hash_foreach(digest, points, field, 2, np.float32)
+    digest.update("".join(k.interpolation for k in points).encode())
+
+
+def hash_drivers(digest, anim):
+    """驱动器的表达式、变量和目标（以及驱动曲线本身）"""
+    for fcurve in anim.drivers:
+        driver = fcurve.driver
+        digest.update(f"driver:{driver.type}:{driver.expression}:{driver.use_self};".encode())
+        hash_fcurve(digest, fcurve)
+        for variable in driver.variables:
+            digest.update(f"var:{variable.name}:{variable.type};".encode())
+            for target in variable.targets:
+                digest.update(f"{target.id.name_full if target.id else ''}:{target.data_path}:{target.bone_target}:"
+                              f"{target.transform_type}:{target.transform_space}:{target.rotation_mode};".encode())
+
+
+def hash_animation(digest, id_data):
+    """动作的关键帧、NLA 轨道和驱动器"""
+    anim = getattr(id_data, "animation_data", None) if id_data else None
+    if anim is None:
+        return
+    hash_drivers(digest, anim)
+    actions = [anim.action] if anim.action else []
+    for track in anim.nla_tracks:
+        digest.update(f"track:{track.name}:{track.mute};".encode())
+        for strip in track.strips:
+            digest.update(f"{strip.name}:{strip.frame_start}:{strip.frame_end}:{strip.blend_type}:{strip.mute};".encode())
+            if strip.action:
+                actions.append(strip.action)
+    for action in actions:
+        digest.update(f"action:{action.name};".encode())
+        for fcurve in iter_action_fcurves(action):
+            hash_fcurve(digest, fcurve)
+
+
+def asset_content_hash(context, objects, export_args):
+    """一个资产的内容哈希: 求值后的网格与顶点组权重、材质与图片、变换、动画与驱动器、
+    对象和数据的自定义属性以及导出参数（不含输出路径）
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    settings = {key: value for key, value in export_args.items() if key != 'filepath'}
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    if export_args.get('export_animations'):
+        scene = context.scene
+        digest.update(f"frames:{scene.frame_start}:{scene.frame_end}:{scene.render.fps};".encode())
+
+    depsgraph = context.evaluated_depsgraph_get()
+    seen_trees = set()
+    for obj in sorted(objects, key=lambda o: o.name):
+        digest.update(f"object:{obj.name}:{obj.type}:{obj.parent.name if obj.parent else ''};".encode())
+        digest.update(np.array(obj.matrix_world, dtype=np.float32).tobytes())
+        hash_custom_properties(digest, obj)
+        if obj.data is not None:
+            hash_custom_properties(digest, obj.data)
+        hash_animation(digest, obj)
+        hash_animation(digest, obj.data)
+
+        if obj.type == 'MESH' and obj.data.shape_keys:
+            hash_animation(digest, obj.data.shape_keys)
+            for key_block in obj.data.shape_keys.key_blocks:
+                digest.update(f"shape:{key_block.name}:{key_block.value};".encode())
+                hash_foreach(digest, key_block.data, "co", 3, np.float32)
+        if obj.type == 'ARMATURE':
+            for bone in obj.data.bones:
+                digest.update(f"bone:{bone.name}:{bone.parent.name if bone.parent else ''};".encode())
+                digest.update(np.array(bone.matrix_local, dtype=np.float32).tobytes())
+            for pose_bone in obj.pose.bones:
+                digest.update(np.array(pose_bone.matrix_basis, dtype=np.float32).tobytes())
+        elif obj.type in {'LIGHT', 'CAMERA'}:
+            hash_rna_properties(digest, obj.data)
+
+        if obj.type in {'MESH', 'CURVE', 'SURFACE', 'META', 'FONT'}:
+            obj_eval = obj.evaluated_get(depsgraph)
+            mesh = obj_eval.to_mesh()
+            try:
+                if mesh is not None:
+                    hash_mesh(digest, mesh)
+                    hash_vertex_groups(digest, obj, mesh)
+            finally:
+                obj_eval.to_mesh_clear()
+
+        for slot in obj.material_slots:
+            material = slot.material
+            digest.update(f"material:{material.name if material else ''};".encode())
+            if material:
+                hash_rna_properties(digest, material)
+                if material.use_nodes:
+                    hash_node_tree(digest, material.node_tree, seen_trees)
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------
+# GLB 导出: 后处理优化（纯 NumPy）
+# ---------------------------------------------------------
+GLB_MAGIC = 0x46546C67
+GLB_CHUNK_JSON = 0x4E4F534A
+GLB_CHUNK_BIN = 0x004E4942
+
+# 组件类型 <-> numpy 类型（glTF 为小端序）
+GLTF_COMPONENT_DTYPES = {
+    5120: np.dtype("<i1"),
+    5121: np.dtype("<u1"),
+    5122: np.dtype("<i2"),
+    5123: np.dtype("<u2"),
+    5125: np.dtype("<u4"),
+    5126: np.dtype("<f4"),
+}
+GLTF_DTYPE_COMPONENTS = {dtype: component for component, dtype in GLTF_COMPONENT_DTYPES.items()}
+GLTF_TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+GLTF_ARRAY_BUFFER = 34962
+GLTF_ELEMENT_ARRAY_BUFFER = 34963
+
+# 已经压缩过的文件不再处理
+GLB_COMPRESSION_EXTENSIONS = {"KHR_draco_mesh_compression", "EXT_meshopt_compression"}
+
+
+def read_glb(path):
+    """返回 (glTF JSON, BIN 块)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, length = np.frombuffer(data, dtype="<u4", count=3)
+    if magic != GLB_MAGIC or version != 2:
+        raise ValueError(f"不是 glTF 2.0 二进制文件: {path}")
+    gltf, binary = None, b""
+    offset = 12
+    while offset < length:
+        chunk_length, chunk_type = np.frombuffer(data, dtype="<u4", count=2, offset=offset)
+        chunk = data[offset + 8:offset + 8 + int(chunk_length)]
+        if chunk_type == GLB_CHUNK_JSON:
+            gltf = json.loads(chunk.decode("utf-8"))
+        elif chunk_type == GLB_CHUNK_BIN:
+            binary = chunk
+        offset += 8 + int(chunk_length)
+    if gltf is None:
+        raise ValueError(f"缺少 JSON 块: {path}")
+    return gltf, binary
+
+
+def write_glb(path, gltf, binary):
+    """写出 GLB（先写临时文件再替换，中途失败不会损坏原文件）"""
+    json_chunk = json.dumps(gltf, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    binary += b"\0" * (-len(binary) % 4)
+    chunks = [np.array([len(json_chunk), GLB_CHUNK_JSON], dtype="<u4").tobytes(), json_chunk]
+    if binary:
+        chunks += [np.array([len(binary), GLB_CHUNK_BIN], dtype="<u4").tobytes(), binary]
+    body = b"".join(chunks)
+    header = np.array([GLB_MAGIC, 2, 12 + len(body)], dtype="<u4").tobytes()
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header + body)
+    os.replace(temp_path, path)
+
+
+def iter_accessor_refs(gltf):
+    """遍历所有引用访问器的位置，产出 (容器, 键)"""
+    for mesh in gltf.get("meshes", []):
+        for prim in mesh["primitives"]:
+            for key in prim["attributes"]:
+                yield prim["attributes"], key
+            if "indices" in prim:
+                yield prim, "indices"
+            for target in prim.get("targets", []):
+                for key in target:
+                    yield target, key
+    for skin in gltf.get("skins", []):
+        if "inverseBindMatrices" in skin:
+            yield skin, "inverseBindMatrices"
+    for animation in gltf.get("animations", []):
+        for sampler in animation["samplers"]:
+            yield sampler, "input"
+            yield sampler, "output"
+    for node in gltf.get("nodes", []):
+        instancing = node.get("extensions", {}).get("EXT_mesh_gpu_instancing")
+        if instancing:
+            for key in instancing["attributes"]:
+                yield instancing["attributes"], key
+
+
+def iter_view_refs(gltf):
+    """遍历所有引用缓冲视图的位置，产出 (容器, 键)"""
+    for accessor in gltf.get("accessors", []):
+        if "bufferView" in accessor:
+            yield accessor, "bufferView"
+        sparse = accessor.get("sparse")
+        if sparse:
+            yield sparse["indices"], "bufferView"
+            yield sparse["values"], "bufferView"
+    for image in gltf.get("images", []):
+        if "bufferView" in image:
+            yield image, "bufferView"
+
+
+def split_buffer_views(gltf, binary):
+    """把每个缓冲视图的数据切成独立的 bytes，便于替换和重新打包"""
+    views = []
+    for view in gltf.get("bufferViews", []):
+        offset = view.pop("byteOffset", 0)
+        views.append(binary[offset:offset + view["byteLength"]])
+    return views
+
+
+def pack_buffer_views(gltf, views):
+    """按 4 字节对齐重新拼接缓冲视图，返回新的 BIN 块"""
+    out = bytearray()
+    for view, data in zip(gltf.get("bufferViews", []), views):
+        out += b"\0" * (-len(out) % 4)
+        view.update(buffer=0, byteOffset=len(out), byteLength=len(data))
+        out += data
+    out += b"\0" * (-len(out) % 4)
+    if gltf.get("buffers"):
+        gltf["buffers"] = [{**gltf["buffers"][0], "byteLength": len(out)}]
+    return bytes(out)
+
+
+def compact_gltf(gltf, views):
+    """删除没有被引用的访问器和缓冲视图，返回保留下来的视图数据"""
+    accessors = gltf.get("accessors", [])
+    used = sorted({container[key] for container, key in iter_accessor_refs(gltf)})
+    remap = {old: new for new, old in enumerate(used)}
+    for container, key in iter_accessor_refs(gltf):
+        container[key] = remap[container[key]]
+    gltf["accessors"] = [accessors[i] for i in used]
+
+    buffer_views = gltf.get("bufferViews", [])
+    used = sorted({container[key] for container, key in iter_view_refs(gltf)})
+    remap = {old: new for new, old in enumerate(used)}
+    for container, key in iter_view_refs(gltf):
+        container[key] = remap[container[key]]
+    gltf["bufferViews"] = [buffer_views[i] for i in used]
+    return [views[i] for i in used]
+
+
+def packed_size(views):
+    return sum(len(data) + (-len(data) % 4) for data in views)
+
+
+def read_accessor(gltf, views, index):
+    """读出访问器为 (count, 分量数) 数组；稀疏访问器返回 None"""
+    accessor = gltf["accessors"][index]
+    if "sparse" in accessor or "bufferView" not in accessor:
+        return None
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    dtype = GLTF_COMPONENT_DTYPES[accessor["componentType"]]
+    components = GLTF_TYPE_SIZES[accessor["type"]]
+    item_size = dtype.itemsize * components
+    stride = view.get("byteStride", item_size)
+    count = accessor["count"]
+    data = np.frombuffer(views[accessor["bufferView"]], dtype=np.uint8)
+    offset = accessor.get("byteOffset", 0)
+    rows = np.lib.stride_tricks.as_strided(data[offset:], shape=(count, item_size), strides=(stride, 1))
+    return np.ascontiguousarray(rows).view(dtype).reshape(count, components)
+
+
+def add_accessor(gltf, views, values, accessor_type, target, normalized=False, stride=None, bounds=False):
+    """把 values 写入新的缓冲视图并添加访问器，返回访问器索引
+
+    stride 大于元素大小时每个元素后补零（顶点属性要求每个元素 4 字节对齐）
+    """
+    values = np.ascontiguousarray(values)
+    count = len(values)
+    item_size = values.dtype.itemsize * GLTF_TYPE_SIZES[accessor_type]
+    raw = values.view(np.uint8).reshape(count, item_size)
+    if stride and stride > item_size:
+        padded = np.zeros((count, stride), dtype=np.uint8)
+        padded[:, :item_size] = raw
+        raw = padded
+    views.append(raw.tobytes())
+    view = {"buffer": 0, "byteLength": len(views[-1]), "target": target}
+    if stride:
+        view["byteStride"] = stride
+    gltf.setdefault("bufferViews", []).append(view)
+    accessor = {
+        "bufferView": len(gltf["bufferViews"]) - 1,
+        "componentType": GLTF_DTYPE_COMPONENTS[values.dtype.newbyteorder("<")],
+        "count": count,
+        "type": accessor_type,
+    }
+    if normalized:
+        accessor["normalized"] = True
+    if bounds:
+        accessor["min"] = values.min(axis=0).tolist()
+        accessor["max"] = values.max(axis=0).tolist()
+    gltf.setdefault("accessors", []).append(accessor)
+    return len(gltf["accessors"]) - 1
+
+
+def dedupe_glb(gltf, views):
+    """合并内容相同的缓冲视图，再合并描述相同的访问器"""
+    seen = {}
+    view_remap = {}
+    for i, view in enumerate(gltf.get("bufferViews", [])):
+        key = (views[i], view.get("byteStride"), view.get("target"))
+        view_remap[i] = seen.setdefault(key, i)
+    for container, key in iter_view_refs(gltf):
+        container[key] = view_remap[container[key]]
+
+    seen = {}
+    accessor_remap = {}
+    for i, accessor in enumerate(gltf.get("accessors", [])):
+        key = json.dumps({k: v for k, v in accessor.items() if k != "name"}, sort_keys=True)
+        accessor_remap[i] = seen.setdefault(key, i)
+    for container, key in iter_accessor_refs(gltf):
+        container[key] = accessor_remap[container[key]]
+
+
+def normalize_to_int(values, dtype):
+    """[-1, 1] 或 [0, 1] 的浮点数转为归一化整数"""
+    info = np.iinfo(dtype)
+    low = -info.max if info.min < 0 else 0
+    return np.clip(np.round(values * info.max), low, info.max).astype(dtype)
+
+
+def quantize_attribute(gltf, views, name, index):
+    """按 KHR_mesh_quantization 量化一个顶点属性，返回新访问器索引；不适合量化时返回 None
+
+    NORMAL / TANGENT -> 归一化 int8；范围在 [0, 1] 内的 TEXCOORD / COLOR -> 归一化 uint16
+    """
+    accessor = gltf["accessors"][index]
+    if accessor["componentType"] != 5126:
+        return None
+    values = read_accessor(gltf, views, index)
+    if values is None:
+        return None
+    semantic = name.split("_")[0]
+    if semantic in {"NORMAL", "TANGENT"}:
+        quantized = normalize_to_int(values, np.int8)
+        return add_accessor(gltf, views, quantized, accessor["type"], GLTF_ARRAY_BUFFER, normalized=True, stride=4)
+    if semantic in {"TEXCOORD", "COLOR"} and len(values) and values.min() >= 0.0 and values.max() <= 1.0:
+        quantized = normalize_to_int(values, np.uint16)
+        stride = 4 if accessor["type"] == "VEC2" else 8
+        return add_accessor(gltf, views, quantized, accessor["type"], GLTF_ARRAY_BUFFER, normalized=True, stride=stride)
+    return None
+
+
+def position_quantizable_nodes(gltf, mesh_index, animated_nodes):
+    """返回引用该网格的节点；任一节点有子级、蒙皮、相机、扩展或变换动画时返回 None
+
+    位置量化要把反量化的缩放和平移写进节点变换，这些情况下会影响到网格以外的东西
+    """
+    nodes = [i for i, node in enumerate(gltf.get("nodes", [])) if node.get("mesh") == mesh_index]
+    for i in nodes:
+        node = gltf["nodes"][i]
+        if i in animated_nodes or any(key in node for key in ("children", "skin", "camera", "extensions")):
+            return None
+    return nodes or None
+
+
+def quaternion_matrix(x, y, z, w):
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+
+
+def apply_dequantization(node, offset, scale):
+    """节点变换右乘 平移(offset) * 均匀缩放(scale)"""
+    if "matrix" in node:
+        matrix = np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T
+        dequant = np.diag([scale, scale, scale, 1.0])
+        dequant[:3, 3] = offset
+        node["matrix"] = (matrix @ dequant).T.ravel().tolist()
+        return
+    translation = np.array(node.get("translation", [0.0, 0.0, 0.0]))
+    rotation = quaternion_matrix(*node.get("rotation", [0.0, 0.0, 0.0, 1.0]))
+    node_scale = np.array(node.get("scale", [1.0, 1.0, 1.0]))
+    node["translation"] = (translation + rotation @ (node_scale * offset)).tolist()
+    node["scale"] = (node_scale * scale).tolist()
+
+
+def quantize_mesh_positions(gltf, views, mesh_index, nodes, converted):
+    """把网格全部图元的 POSITION 量化为 uint16（共用一组包围盒），反量化写入节点变换
+
+    converted 记录已量化的 (访问器, 包围盒)，多个网格共用同一份位置数据时只生成一次
+    """
+    mesh = gltf["meshes"][mesh_index]
+    prims = mesh["primitives"]
+    if any("targets" in prim or "POSITION" not in prim["attributes"] for prim in prims):
+        return False
+    positions = []
+    for prim in prims:
+        index = prim["attributes"]["POSITION"]
+        if gltf["accessors"][index]["componentType"] != 5126:
+            return False
+        values = read_accessor(gltf, views, index)
+        if values is None or not len(values):
+            return False
+        positions.append(values.astype(np.float64))
+    low = np.min([p.min(axis=0) for p in positions], axis=0)
+    high = np.max([p.max(axis=0) for p in positions], axis=0)
+    scale = float((high - low).max()) / 65535.0 or 1.0
+    for prim, values in zip(prims, positions):
+        key = ("POSITION", prim["attributes"]["POSITION"], tuple(low), scale)
+        if key not in converted:
+            quantized = np.clip(np.round((values - low) / scale), 0, 65535).astype(np.uint16)
+            converted[key] = add_accessor(gltf, views, quantized, "VEC3", GLTF_ARRAY_BUFFER, stride=8, bounds=True)
+        prim["attributes"]["POSITION"] = converted[key]
+    for i in nodes:
+        apply_dequantization(gltf["nodes"][i], low, scale)
+    return True
+
+
+def quantize_glb(gltf, views):
+    """量化法线、切线、UV、颜色和位置，并声明 KHR_mesh_quantization"""
+    animated_nodes = {channel["target"].get("node") for animation in gltf.get("animations", [])
+                      for channel in animation["channels"]
+                      if channel["target"].get("path") in {"translation", "rotation", "scale"}}
+    converted = {}
+    changed = False
+    for mesh_index, mesh in enumerate(gltf.get("meshes", [])):
+        for prim in mesh["primitives"]:
+            attributes = prim["attributes"]
+            for name, index in list(attributes.items()):
+                if name == "POSITION":
+                    continue
+                key = (name.split("_")[0], index)
+                if key not in converted:
+                    converted[key] = quantize_attribute(gltf, views, name, index)
+                if converted[key] is not None:
+                    attributes[name] = converted[key]
+                    changed = True
+        nodes = position_quantizable_nodes(gltf, mesh_index, animated_nodes)
+        if nodes and quantize_mesh_positions(gltf, views, mesh_index, nodes, converted):
+            changed = True
+    if changed:
+        for key in ("extensionsUsed", "extensionsRequired"):
+            extensions = gltf.setdefault(key, [])
+            if "KHR_mesh_quantization" not in extensions:
+                extensions.append("KHR_mesh_quantization")
+
+
+def compact_glb_indices(gltf, views):
+    """最大索引小于 65535 的 uint32 索引缓冲改为 uint16"""
+    converted = {}
+    for mesh in gltf.get("meshes", []):
+        for prim in mesh["primitives"]:
+            index = prim.get("indices")
+            if index is None or gltf["accessors"][index]["componentType"] != 5125:
+                continue
+            if index not in converted:
+                converted[index] = None
+                values = read_accessor(gltf, views, index)
+                if values is not None and (not len(values) or values.max() < 65535):
+                    converted[index] = add_accessor(
+                        gltf, views, values.astype(np.uint16), "SCALAR", GLTF_ELEMENT_ARRAY_BUFFER)
+            if converted[index] is not None:
+                prim["indices"] = converted[index]
+
+
+def iter_vertex_accessor_refs(prim):
+    """遍历图元中逐顶点的访问器引用（属性和形态目标），产出 (容器, 键)"""
+    for key in prim["attributes"]:
+        yield prim["attributes"], key
+    for target in prim.get("targets", []):
+        for key in target:
+            yield target, key
+
+
+def permute_accessor(gltf, views, index, order):
+    """按 order 重排访问器的元素，写入新访问器并返回其索引；稀疏访问器返回 None"""
+    values = read_accessor(gltf, views, index)
+    if values is None:
+        return None
+    accessor = gltf["accessors"][index]
+    item_size = values.dtype.itemsize * values.shape[1]
+    new = add_accessor(gltf, views, values[order], accessor["type"], GLTF_ARRAY_BUFFER,
+                       normalized=accessor.get("normalized", False), stride=item_size + (-item_size % 4))
+    for key in ("min", "max"):
+        if key in accessor:
+            gltf["accessors"][new][key] = accessor[key]
+    return new
+
+
+def reorder_glb_vertex_cache(gltf, views, cache_size=VERTEX_CACHE_SIZE):
+    """按 Tipsify 重排三角形图元的索引，再按首次引用重排其顶点属性；返回 [(网格名, 优化前 ACMR, 优化后 ACMR)]
+
+    只改导出的文件，场景中的网格不变。顶点属性被多个图元共用或无法读取时只重排三角形
+    """
+    users = {}
+    for mesh in gltf.get("meshes", []):
+        for prim in mesh["primitives"]:
+            for container, key in iter_vertex_accessor_refs(prim):
+                users[container[key]] = users.get(container[key], 0) + 1
+
+    results = []
+    for mesh_index, mesh in enumerate(gltf.get("meshes", [])):
+        tri_total, before_misses, after_misses = 0, 0.0, 0.0
+        for prim in mesh["primitives"]:
+            if prim.get("mode", 4) != 4 or "indices" not in prim:
+                continue
+            accessor = gltf["accessors"][prim["indices"]]
+            indices = read_accessor(gltf, views, prim["indices"])
+            if indices is None or not len(indices) or len(indices) % 3:
+                continue
+            tris = indices.reshape(-1, 3).astype(np.int64)
+            position = prim["attributes"].get("POSITION")
+            vert_count = gltf["accessors"][position]["count"] if position is not None else int(tris.max()) + 1
+            before = simulate_acmr(tris, cache_size)
+            tris = tris[tipsify(tris, vert_count, cache_size)]
+            after = simulate_acmr(tris, cache_size)
+            tri_total += len(tris)
+            before_misses += before * len(tris)
+            if after > before * (1.0 - VERTEX_CACHE_MIN_GAIN):
+                after_misses += before * len(tris)
+                continue
+            after_misses += after * len(tris)
+
+            refs = list(iter_vertex_accessor_refs(prim))
+            if all(users[container[key]] == 1 for container, key in refs):
+                rank = first_occurrence_order(tris.ravel(), vert_count)
+                order = np.argsort(rank)
+                permuted = [permute_accessor(gltf, views, container[key], order) for container, key in refs]
+                if None not in permuted:
+                    for (container, key), index in zip(refs, permuted):
+                        container[key] = index
+                    tris = rank[tris]
+            dtype = GLTF_COMPONENT_DTYPES[accessor["componentType"]]
+            prim["indices"] = add_accessor(gltf, views, tris.ravel().astype(dtype), "SCALAR",
+                                           GLTF_ELEMENT_ARRAY_BUFFER)
+        if tri_total:
+            results.append((mesh.get("name", f"mesh_{mesh_index}"), before_misses / tri_total, after_misses / tri_total))
+    return results
+
+
+GLB_OPTIMIZE_STAGES = (
+    ("去重", dedupe_glb),
+    ("量化", quantize_glb),
+    ("索引压缩", compact_glb_indices),
+)
+
+
+def optimize_glb(path, optimize=True, reorder=False):
+    """原地优化 GLB，返回每个阶段节省的字节数 {阶段: 字节, "总计": 文件节省字节}
+
+    reorder 为真时先按顶点缓存重排，统计中另有 "ACMR": [(网格名, 优化前, 优化后)]；
+    optimize 为假时只重排。已用 Draco / meshopt 压缩或引用外部缓冲的文件不处理，返回 None
+    """
+    gltf, binary = read_glb(path)
+    extensions = set(gltf.get("extensionsUsed", []))
+    buffers = gltf.get("buffers", [])
+    if extensions & GLB_COMPRESSION_EXTENSIONS or len(buffers) > 1 or any("uri" in b for b in buffers):
+        return None
+
+    views = compact_gltf(gltf, split_buffer_views(gltf, binary))
+    stats = {}
+    acmr = None
+    if reorder:
+        # 先于去重，此时每个图元的顶点属性通常还是独立的，可以连顶点一起重排
+        acmr = reorder_glb_vertex_cache(gltf, views)
+        views = compact_gltf(gltf, views)
+    size = packed_size(views)
+    for label, stage in GLB_OPTIMIZE_STAGES if optimize else ():
+        stage(gltf, views)
+        views = compact_gltf(gltf, views)
+        stats[label] = size - packed_size(views)
+        size = packed_size(views)
+
+    original_size = os.path.getsize(path)
+    write_glb(path, gltf, pack_buffer_views(gltf, views))
+    stats["总计"] = original_size - os.path.getsize(path)
+    if acmr is not None:
+        stats["ACMR"] = acmr
+    return stats
+
+
+def print_optimize_stats(path, stats):
+    if stats is None:
+        print(f"GLB 优化跳过（已压缩或使用外部缓冲）: {path}")
+        return
+    stages = ", ".join(f"{label} {saved / 1024:.1f} KB" for label, saved in stats.items()
+                       if label not in {"总计", "ACMR"})
+    print(f"GLB 优化: {os.path.basename(path)}  节省 {stats['总计'] / 1024:.1f} KB" + (f" ({stages})" if stages else ""))
+    for name, before, after in stats.get("ACMR", []):
+        print(f"顶点缓存优化: {name:<32} ACMR {before:.3f} -> {after:.3f}")
+
+
 # ---------------------------------------------------------
 # UI 面板定义
 # ---------------------------------------------------------
@@ -262,6 +1573,8 @@ class VIEW3D_PT_modeling_assist_panel(bpy.types.Panel):
         col.operator("object.add_decimate_modifier", text="一键精简")
         col.separator()
         col.operator("object.add_weighted_normal", text="一键法线加权")
+        col.separator()
+        col.operator("object.optimize_vertex_cache", text="优化顶点缓存", icon='SORTSIZE')
 
         layout.separator()
 
@@ -309,9 +1622,17 @@ class VIEW3D_PT_glb_exporter(bpy.types.Panel):
         col = box.column(align=True)
         row = col.row()
         row.prop(props, "use_custom_name", text="自定义文件名")
-        if props.use_custom_name:
+        row.enabled = props.export_split_mode == 'NONE'
+        if props.use_custom_name and props.export_split_mode == 'NONE':
             col.prop(props, "export_custom_name", text="")
 
+        # --- 拆分导出 ---
+        col = box.column(align=True)
+        col.prop(props, "export_split_mode", text="拆分")
+        col.prop(props, "export_incremental")
+        if props.export_split_mode != 'NONE' or props.export_background:
+            col.prop(props, "export_workers")
+
         # --- 网格 & 几何体 ---
         box = layout.box()
         box.label(text="1. 网格 & 几何体", icon='MESH_DATA')
@@ -328,6 +1649,7 @@ class VIEW3D_PT_glb_exporter(bpy.types.Panel):
 
         # 压缩
         box.prop(props, "export_draco", text="Draco 压缩")
+        box.prop(props, "export_optimize_vertex_cache", text="导出时优化顶点缓存")
 
         # --- 材质 & 纹理 ---
         box = layout.box()
@@ -375,14 +1697,34 @@ class VIEW3D_PT_glb_exporter(bpy.types.Panel):
         col.prop(props, "export_cameras", text="相机")
         col.prop(props, "export_lights", text="灯光")
         col.prop(props, "export_extras", text="自定义属性 (Extras)")
+        col.prop(props, "export_optimize_glb", text="导出后优化 GLB")
 
         col.separator()
         col.label(text="* 坐标系: 强制 Y-Up", icon='INFO')
 
         # --- 执行按钮 ---
         layout.separator()
+        layout.prop(props, "export_background")
         layout.operator("object.export_selected_glb", text="执行导出 (GLB)", icon='FILE_TICK')
 
+        # --- 后台导出队列 ---
+        if _export_queue:
+            box = layout.box()
+            box.label(text="后台导出队列", icon='SORTTIME')
+            col = box.column(align=True)
+            for entry in _export_queue:
+                row = col.row()
+                row.label(text=entry["name"], icon=EXPORT_QUEUE_ICONS[entry["status"]])
+                if entry["status"] == 'RUNNING':
+                    row.label(text=f"{time.perf_counter() - entry['started']:.1f}s")
+                elif entry["status"] == 'DONE':
+                    row.label(text=f"{entry['seconds']:.1f}s  {entry['size'] / 1024:.0f} KB")
+                elif entry["status"] == 'FAILED':
+                    row.label(text="失败（详见控制台）")
+                else:
+                    row.label(text="排队中")
+            box.operator("object.clear_glb_export_queue", icon='TRASH')
+
 
 # ---------------------------------------------------------
 # 属性组
@@ -396,6 +1738,30 @@ class ModelingAssistantProperties(bpy.types.PropertyGroup):
     use_custom_name: bpy.props.BoolProperty(name="自定义名称", default=False)
     export_custom_name: bpy.props.StringProperty(name="导出文件名", default="MyModel")
 
+    # --- 拆分导出 ---
+    export_split_mode: bpy.props.EnumProperty(
+        name="拆分导出",
+        items=[
+            ('NONE', "单个文件", "所有选中对象导出到一个 GLB"),
+            ('OBJECT', "按对象", "每个选中对象导出一个 GLB"),
+            ('PARENT', "按顶层父级", "每个顶层父级及其全部子级导出一个 GLB"),
+            ('COLLECTION', "按集合", "同一集合中的选中对象导出一个 GLB"),
+        ],
+        default='NONE'
+    )
+    export_incremental: bpy.props.BoolProperty(
+        name="增量导出", default=False,
+        description="在导出目录保存内容哈希清单，网格、材质、图片、变换、动画和导出设置都没变且文件仍在时跳过"
+    )
+    export_background: bpy.props.BoolProperty(
+        name="后台导出", default=False,
+        description="保存当前状态的快照后在后台 Blender 进程中导出，导出期间可以继续工作"
+    )
+    export_workers: bpy.props.IntProperty(
+        name="进程数", default=0, min=0, max=64,
+        description="拆分导出使用的后台 Blender 进程数，0 = CPU核心数"
+    )
+
     # --- 网格 & 几何体 ---
     export_apply_transforms: bpy.props.BoolProperty(name="应用变换", default=True)
     export_custom_attributes: bpy.props.BoolProperty(name="自定义属性", default=False)
@@ -405,6 +1771,10 @@ class ModelingAssistantProperties(bpy.types.PropertyGroup):
     export_shape_keys_tangent: bpy.props.BoolProperty(name="形态键切线", default=False)
 
     export_draco: bpy.props.BoolProperty(name="Draco 压缩", default=False)
+    export_optimize_vertex_cache: bpy.props.BoolProperty(
+        name="导出时优化顶点缓存", default=False,
+        description="导出后按 Tipsify 重排 GLB 中的三角形和顶点顺序（只改导出的文件，场景中的网格不变；Draco 压缩时不生效）"
+    )
 
     # --- 材质 & 纹理 ---
     export_materials_mode: bpy.props.EnumProperty(
@@ -453,6 +1823,10 @@ class ModelingAssistantProperties(bpy.types.PropertyGroup):
     export_cameras: bpy.props.BoolProperty(name="导出相机", default=False)
     export_lights: bpy.props.BoolProperty(name="导出灯光", default=False)
     export_extras: bpy.props.BoolProperty(name="导出自定义属性 (Extras)", default=False)
+    export_optimize_glb: bpy.props.BoolProperty(
+        name="导出后优化 GLB", default=False,
+        description="导出后合并重复数据，按 KHR_mesh_quantization 量化位置/法线/UV/颜色，索引尽量改为 16 位（Draco 压缩时跳过）"
+    )
 
 
 # ---------------------------------------------------------
@@ -464,7 +1838,9 @@ classes = (
     VIEW3D_PT_bevel_weight_panel,
     OBJECT_OT_add_decimate_modifier,
     OBJECT_OT_add_weighted_normal,
+    OBJECT_OT_optimize_vertex_cache,
     OBJECT_OT_export_selected_glb,
+    OBJECT_OT_clear_glb_export_queue,
     VIEW3D_PT_modeling_assist_panel,
     VIEW3D_PT_glb_exporter,
 )
@@ -480,6 +1856,7 @@ def register():
 
 
 def unregister():
+    stop_export_queue()
     for c in reversed(classes):
         bpy.utils.unregister_class(c)
     del bpy.types.Scene.modeling_assistant_props